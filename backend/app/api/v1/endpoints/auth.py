@@ -1,23 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.schemas.token import Token
 from app.schemas.user import User, UserCreate
 from app.services.auth_service import (
     authenticate_user, authenticate_user_fallback, create_access_token, 
     create_refresh_token, get_current_user, create_user, get_user_by_username, 
-    get_user_by_email, fake_user_db
+    get_user_by_email, fake_user_db, rotate_refresh_token, revoke_refresh_token
 )
 from app.core.database import get_db
+from app.core.password_pool import PasswordPoolFull, get_password_pool
 from app.models.user import User as UserModel
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _too_many_requests() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many concurrent requests, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # Try database authentication first
-    user = authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password, db)
+    except PasswordPoolFull:
+        raise _too_many_requests()
     if not user:
         # Fallback to demo user
         user = authenticate_user_fallback(form_data.username, form_data.password)
@@ -25,38 +37,59 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
     
     access_token = create_access_token(user.username)
-    refresh_token = create_refresh_token(user.username)
+    # Registering the jti is a blocking Redis write: kept off the event loop
+    refresh_token = await run_in_threadpool(create_refresh_token, user.username)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/refresh", response_model=Token)
 def refresh_token(refresh_token: str):
-    # Here you should validate the refresh_token and issue a new one
-    # Simplified logic for example
-    username = "demo_user"  # Extract from refresh_token in real implementation
+    # Refresh tokens are single use: the presented token is revoked and a new one issued
+    rotated = rotate_refresh_token(refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or revoked refresh token")
+    username, new_refresh_token = rotated
     access_token = create_access_token(username)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    return {"access_token": access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
+
+@router.post("/logout")
+def logout(refresh_token: str):
+    revoke_refresh_token(refresh_token)
+    return {"message": "Logged out"}
 
 @router.get("/me", response_model=User)
 def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
-@router.post("/signup", response_model=User)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+def _signup_conflict(db: Session, user_data: UserCreate) -> Optional[str]:
+    """Why the user can't be registered, or None (runs in the threadpool: sync DB queries)."""
     # Check if user already exists in database
     if get_user_by_username(db, user_data.username):
-        raise HTTPException(status_code=400, detail="Username already registered")
+        return "Username already registered"
     
     if get_user_by_email(db, user_data.email):
-        raise HTTPException(status_code=400, detail="Email already registered")
+        return "Email already registered"
     
     # Check if user exists in fake_user_db (for demo user)
     if user_data.username in fake_user_db:
-        raise HTTPException(status_code=400, detail="Username already exists")
+        return "Username already exists"
+    return None
+
+@router.post("/signup", response_model=User)
+async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+    # The route is async to await the password pool; DB work stays in the threadpool
+    conflict = await run_in_threadpool(_signup_conflict, db, user_data)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
     
-    # Create new user in database
-    db_user = create_user(db, user_data)
+    # Create new user in database (bcrypt runs in the password process pool)
+    try:
+        hashed_password = await get_password_pool().hash(user_data.password)
+    except PasswordPoolFull:
+        raise _too_many_requests()
+    db_user = await run_in_threadpool(create_user, db, user_data, hashed_password=hashed_password)
     
     return User(
+        id=db_user.id,
         username=db_user.username,
         full_name=db_user.full_name,
         email=db_user.email,
@@ -71,6 +104,7 @@ def list_users(current_user: User = Depends(get_current_user), db: Session = Dep
     
     for db_user in db_users:
         users.append(User(
+            id=db_user.id,
             username=db_user.username,
             full_name=db_user.full_name,
             email=db_user.email,
@@ -11,6 +11,7 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 @router.get("/models")
 async def get_available_models():
     """Get available models and default model."""
+    await chat_service.initialize()
     return {
         "available_models": chat_service.get_available_models(),
         "default_model": chat_service.get_default_model()
@@ -24,8 +25,7 @@ async def send_message(
 ):
     """Send a chat message and get a response."""
     try:
-        user_id = 1  # For demo purposes, using a fixed user_id
-        response = await chat_service.process_chat_message(request, user_id, db)
+        response = await chat_service.process_chat_message(request, current_user.id, db, current_user.username)
         return response
     except Exception as e:
         raise HTTPException(
@@ -33,11 +33,22 @@ async def send_message(
             detail=f"Error processing message: {str(e)}"
         )
 
+@router.get("/stats")
+async def get_conversation_stats(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get conversation statistics (global, current user and per model)."""
+    try:
+        return chat_service.get_conversation_stats(db, current_user.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving conversation stats: {str(e)}"
+        )
+
 @router.get("/conversations")
 async def get_conversations(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get all conversations for the current user."""
     try:
-        user_id = 1  # For demo purposes
+        user_id = current_user.id
         conversations = chat_service.get_user_conversations(user_id, db)
         return {"conversations": conversations}
     except Exception as e:
@@ -70,7 +81,7 @@ async def delete_conversation(
 ):
     """Delete a conversation."""
     try:
-        user_id = 1  # For demo purposes
+        user_id = current_user.id
         success = chat_service.delete_conversation(conversation_id, user_id, db)
         if not success:
             raise HTTPException(
@@ -95,7 +106,7 @@ async def rename_conversation(
 ):
     """Rename a conversation."""
     try:
-        user_id = 1  # For demo purposes
+        user_id = current_user.id
         success = chat_service.rename_conversation(conversation_id, user_id, new_title, db)
         if not success:
             raise HTTPException(
@@ -0,0 +1,91 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from app.schemas.data import DataAnalysisRequest, DataAnalysisResponse, AnalysisHistory, DataUploadResponse, DataPreview
+from app.schemas.user import User
+from app.core.analysis_pool import AnalysisPoolFull, AnalysisTimeoutError
+from app.services.auth_service import get_current_user
+from app.services.data_service import data_service, UploadTooLargeError
+
+router = APIRouter(prefix="/data", tags=["data"])
+
+@router.post("/analyze", response_model=DataAnalysisResponse)
+async def analyze_data(request: DataAnalysisRequest, current_user: User = Depends(get_current_user)):
+    """Run a data analysis (REST equivalent of "analyze" on /ws/data, without progress frames)."""
+    try:
+        return await data_service.process_data_analysis(request)
+    except AnalysisPoolFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except AnalysisTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except ValueError as e:
+        # e.g. parameters.columns naming columns the data source doesn't have
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing analysis: {str(e)}"
+        )
+
+@router.post("/upload", response_model=DataUploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_data(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    description: Optional[str] = Query(None, max_length=500),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload a CSV, JSON, JSON Lines or Excel file sent as the raw request body, e.g.
+    curl --data-binary @sales.csv "/api/v1/data/upload?filename=sales.csv".
+    The body is streamed to disk (never fully in memory) and the returned id is the data source id.
+    """
+    content_length = request.headers.get("content-length")
+    try:
+        return await data_service.save_upload(
+            request.stream(),
+            filename,
+            description,
+            int(content_length) if content_length and content_length.isdigit() else None
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error uploading file: {str(e)}"
+        )
+
+@router.get("/analyses", response_model=AnalysisHistory)
+async def get_analysis_history(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the analysis history, most recent first."""
+    analyses = data_service.get_analysis_history()
+    start = (page - 1) * per_page
+    return AnalysisHistory(analyses=analyses[start:start + per_page], total=len(analyses), page=page, per_page=per_page)
+
+@router.get("/sources")
+async def get_data_sources(current_user: User = Depends(get_current_user)):
+    """Get the available data sources."""
+    return {"data_sources": data_service.get_data_sources()}
+
+@router.get("/sources/{data_source_id}/preview", response_model=DataPreview)
+async def get_data_preview(data_source_id: str, current_user: User = Depends(get_current_user)):
+    """First rows, column types and per-column statistics, from the source's dataset profile."""
+    try:
+        preview = await data_service.get_preview(data_source_id)
+    except AnalysisPoolFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except AnalysisTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    if preview is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data source not found or without a profile")
+    return preview
+
+@router.get("/stats")
+async def get_analysis_stats(current_user: User = Depends(get_current_user)):
+    """Get analysis statistics."""
+    return data_service.get_analysis_stats()
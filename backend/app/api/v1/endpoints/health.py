@@ -26,7 +26,8 @@ async def system_status():
             "data": manager.get_connection_count("data"),
             "notifications": manager.get_connection_count("notifications")
         },
-        "total_connections": manager.get_connection_count()
+        "total_connections": manager.get_connection_count(),
+        "websocket_queues": manager.get_queue_stats()
     }
 
 @router.get("/info")
@@ -0,0 +1,199 @@
+"""
+Process pool for data analyses (describe, corr, null counts over whole DataFrames).
+Even in a worker thread that pandas work holds the GIL long enough to slow every other
+request on the worker; in separate processes it doesn't. Jobs receive file paths and
+memory-map the data themselves (see app.services.analysis_jobs), so no DataFrame is
+pickled across the process boundary.
+Analyses of files too large to load can instead be dispatched to Celery workers.
+
+Timeouts: a job still waiting for a worker is cancelled; one already running in the
+pool can't be interrupted, its result is discarded when it finishes. Celery jobs are
+revoked, and the worker enforces its own time limits.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.utils.lazy_imports import preload_modules
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOB_LATENCY = Histogram(
+    "analysis_job_latency_seconds",
+    "Analysis job latency, including time queued for a worker",
+    ["backend"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+ANALYSIS_JOBS = Counter(
+    "analysis_jobs_total",
+    "Analysis jobs by backend and outcome (ok, error, timeout, rejected, cancelled)",
+    ["backend", "outcome"]
+)
+ANALYSIS_POOL_WORKERS = Gauge(
+    "analysis_pool_workers",
+    "Worker processes in the analysis pool"
+)
+ANALYSIS_POOL_QUEUE_DEPTH = Gauge(
+    "analysis_pool_queue_depth",
+    "Analysis jobs running or waiting in the process pool"
+)
+ANALYSIS_POOL_UTILIZATION = Gauge(
+    "analysis_pool_utilization",
+    "Fraction of analysis pool workers busy with a job"
+)
+
+CELERY_POLL_INTERVAL = 0.5
+
+class AnalysisPoolFull(Exception):
+    """Raised when the analysis pool already has `max_queue` jobs in flight."""
+
+class AnalysisTimeoutError(TimeoutError):
+    """An analysis job did not finish within its timeout."""
+
+class AnalysisPool:
+    """Runs analysis jobs in a size-bounded process pool with a bounded queue and per-job timeouts."""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0  # Jobs submitted and not finished; only touched from the event loop thread
+        ANALYSIS_POOL_WORKERS.set(max_workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    @property
+    def utilization(self) -> float:
+        return min(self._pending, self.max_workers) / self.max_workers
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe.
+            # Workers import pandas and pyarrow when they start rather than on their first job.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=preload_modules,
+                initargs=(["pandas", "pyarrow"],)
+            )
+        return self._executor
+
+    def _set_gauges(self):
+        ANALYSIS_POOL_QUEUE_DEPTH.set(self._pending)
+        ANALYSIS_POOL_UTILIZATION.set(self.utilization)
+
+    async def run(self, fn, *args, timeout: Optional[float] = None):
+        """
+        Runs fn(*args) in the pool. Raises AnalysisPoolFull when saturated and
+        AnalysisTimeoutError after `timeout` seconds (queue time included).
+        """
+        if self._pending >= self.max_queue:
+            ANALYSIS_JOBS.labels(backend="pool", outcome="rejected").inc()
+            raise AnalysisPoolFull(f"Analysis pool queue is full ({self.max_queue} jobs)")
+        self._pending += 1
+        self._set_gauges()
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        outcome = "error"
+        executor = self._get_executor()
+        try:
+            job = executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job ends, not when its caller stops waiting: a job that
+        # timed out keeps its worker busy and still counts against max_queue
+        job.add_done_callback(lambda _: self._release_threadsafe(loop))
+        try:
+            # Cancelling the wrapper cancels the job if it is still waiting for a worker
+            result = await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise AnalysisTimeoutError(f"Analysis did not finish within {timeout}s")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): every pending job fails, the next one gets a new pool.
+            # Only the broken executor is shut down, never a replacement another job already uses.
+            if self._executor is executor:
+                logger.error("Analysis pool worker died, restarting the pool")
+                self.shutdown()
+            raise
+        finally:
+            ANALYSIS_JOBS.labels(backend="pool", outcome=outcome).inc()
+            ANALYSIS_JOB_LATENCY.labels(backend="pool").observe(time.perf_counter() - start_time)
+
+    def _release(self):
+        self._pending -= 1
+        self._set_gauges()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop):
+        # Done callbacks run in the executor's management thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The event loop is already closed (shutdown)
+            pass
+
+    async def warm_up(self):
+        """Starts the worker processes now instead of on the first analysis (they take seconds to import pandas)."""
+        start_time = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self._get_executor(), os.getpid)
+        logger.info(f"Analysis pool started {self.max_workers} workers in {time.perf_counter() - start_time:.2f}s")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+async def run_celery(task, *args, timeout: Optional[float] = None):
+    """
+    Sends a Celery task and waits for its result without blocking the event loop.
+    The task is revoked if the caller is cancelled or `timeout` expires.
+    """
+    start_time = time.perf_counter()
+    async_result = await asyncio.to_thread(task.delay, *args)
+    outcome = "error"
+    try:
+        while not await asyncio.to_thread(async_result.ready):
+            if timeout is not None and time.perf_counter() - start_time > timeout:
+                outcome = "timeout"
+                raise AnalysisTimeoutError(f"Analysis did not finish within {timeout}s")
+            await asyncio.sleep(CELERY_POLL_INTERVAL)
+        result = await asyncio.to_thread(async_result.get)
+        outcome = "ok"
+        return result
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        if outcome in ("timeout", "cancelled"):
+            # revoke() sends a broker message: keep that I/O off the event loop too
+            await asyncio.to_thread(async_result.revoke, terminate=True)
+        ANALYSIS_JOBS.labels(backend="celery", outcome=outcome).inc()
+        ANALYSIS_JOB_LATENCY.labels(backend="celery").observe(time.perf_counter() - start_time)
+
+_analysis_pool: Optional[AnalysisPool] = None
+
+def get_analysis_pool() -> AnalysisPool:
+    """Returns the process-wide analysis pool, sized from settings."""
+    global _analysis_pool
+    if _analysis_pool is None:
+        from app.core.config import settings
+        _analysis_pool = AnalysisPool(
+            max_workers=settings.analysis_pool_workers,
+            max_queue=settings.analysis_pool_max_queue
+        )
+    return _analysis_pool
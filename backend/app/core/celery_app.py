@@ -0,0 +1,2 @@
+"""Celery entrypoint used by the worker, beat and flower services in docker-compose.yml."""
+from app.services.tasks import app  # noqa: F401
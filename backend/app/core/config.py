@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Dict, Optional, List
 import os
 from pydantic import SecretStr, validator
 
@@ -31,6 +31,37 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
     
+    # Verified-token and principal caches for get_current_user (per process)
+    auth_cache_size: int = 10000
+    auth_token_cache_ttl_seconds: int = 300  # Never beyond the token's own exp
+    auth_user_cache_ttl_seconds: int = 60  # Bounds staleness across workers
+    
+    # Refresh tokens: revoked jtis are mirrored in an in-process Bloom filter
+    revoked_token_bloom_capacity: int = 100000
+    revoked_token_bloom_error_rate: float = 0.001
+    
+    # bcrypt process pool (login/signup): worker processes and max jobs in flight before 429
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 64
+    
+    # Rate limiting (token buckets in Redis). Limits are "<count>/<second|minute|hour|day>".
+    # Route limits match by longest path prefix; "ws:/ws/<channel>" limits WebSocket messages.
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "120/minute"
+    rate_limit_per_ip: str = "600/minute"
+    rate_limit_routes: Dict[str, str] = {
+        "/api/v1/ai/generate": "10/minute",
+        "/api/v1/ai/chat": "10/minute",
+        "/api/v1/chat/message": "20/minute",
+        "/api/v1/data/analyze": "20/minute",
+        "/api/v1/data/upload": "10/minute",
+        "ws:/ws/chat": "30/minute",
+        "ws:/ws/data": "30/minute",
+    }
+    rate_limit_users: Dict[str, str] = {}  # Per-user overrides, e.g. {"batch-bot": "600/minute"}
+    rate_limit_lease_fraction: float = 0.1  # Share of a bucket each worker takes from Redis at once
+    rate_limit_max_local_buckets: int = 100000
+    
     # CORS configuration
     frontend_origin: Optional[str] = os.getenv('FRONTEND_ORIGIN', 'http://localhost:5173')
     allowed_origins: List[str] = []
@@ -40,15 +71,45 @@ class Settings(BaseSettings):
     # WebSocket configuration
     websocket_ping_interval: int = 20
     websocket_ping_timeout: int = 20
+    # permessage-deflate is negotiated by the server (uvicorn --ws-per-message-deflate); clients
+    # can also ask for the "msgpack" subprotocol to get binary frames instead of JSON text
+    websocket_per_message_deflate: bool = True
+    ws_send_timeout_seconds: float = 5.0  # Per-socket send timeout; slower sockets are closed with 1013
+    ws_send_queue_size: int = 256  # Outbound messages buffered per connection
+    ws_overflow_policy: str = "drop_oldest"  # When a queue is full: drop_oldest, coalesce or disconnect (1013)
+    ws_max_subscriptions_per_connection: int = 100  # Topic subscriptions (e.g. conversations) per socket
+    ws_max_analyses_per_connection: int = 4  # Data analyses in flight per /ws/data socket
+    # Cross-worker fan-out: "local" (single process) or "redis" (pub/sub, publishes batched)
+    ws_broker: str = "local"
+    ws_broker_channel: str = "ws:events"
+    ws_broker_batch_size: int = 100
+    ws_broker_flush_interval_ms: int = 5
+    ws_broker_max_pending: int = 10000  # Messages waiting to be published; the oldest are dropped beyond it
+    # Resumable streams: frames of these channels, of topics and of per-user messages carry
+    # "stream" and "seq"; clients resume from their last seq out of a bounded replay buffer.
+    # "memory" (per process) or "redis" (Redis Streams, shared). Defaults to "redis" with
+    # ws_broker=redis, which refuses "memory": each node would number frames on its own
+    ws_resumable_channels: List[str] = ["chat", "notifications"]
+    ws_replay_backend: Optional[str] = None
+    ws_replay_buffer_size: int = 500  # Frames kept per stream
+    ws_replay_max_streams: int = 10000  # Memory backend: least recently used streams are dropped
+    ws_replay_ttl_seconds: int = 86400  # Redis backend: idle streams expire
     
     # Redis configuration (for Celery and cache)
     redis_url: str = "redis://localhost:6379"
+    # DataFrames are cached as Arrow IPC ("zstd", "lz4" or "" for none), split into chunks of this size
+    cache_dataframe_compression: str = "zstd"
+    cache_chunk_size_bytes: int = 4 * 1024 * 1024
     
     # LLM configuration
     openai_api_key: Optional[str] = None
     anthropic_api_key: Optional[str] = None
     default_llm_provider: str = "openai"
     
+    # Worker startup: heavy modules to import eagerly on this worker (e.g. ["pandas"] for
+    # data-analysis workers). Everything else is imported lazily on first use.
+    preload_modules: List[str] = []
+    
     # Logging configuration
     log_level: str = "INFO"
     log_file: str = "logs/app.log"
@@ -56,6 +117,28 @@ class Settings(BaseSettings):
     # File configuration
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    # CSV / JSON Lines sources larger than this are analyzed in chunks (bounded memory)
+    analysis_chunked_threshold_bytes: int = 256 * 1024 * 1024
+    analysis_chunk_rows: int = 100000
+    analysis_sample_size: int = 100000  # Values per column kept for percentiles in chunked analyses
+    columnar_store_enabled: bool = True  # Keep a memory-mappable Arrow copy of each upload (needs pyarrow)
+    # "optimized": smallest exact dtypes, categoricals, dates parsed at load; "default": pandas defaults
+    data_loader_mode: str = "optimized"
+    data_loader_category_ratio: float = 0.5  # Text columns with at most this ratio of distinct values become categoricals
+    dataset_profiles_enabled: bool = True  # Profile each upload once (JSON sidecar) and serve analyses from it
+    # Analyses run in a process pool (pandas work off the API process); jobs over the timeout fail.
+    # With analysis_celery_enabled, chunked analyses (files above the threshold) go to Celery workers.
+    analysis_pool_enabled: bool = True
+    analysis_pool_workers: int = 2
+    analysis_pool_max_queue: int = 32
+    analysis_timeout_seconds: float = 300
+    analysis_celery_enabled: bool = False
+    # Analysis results cached by source content hash + request (in-process LRU, optional Redis tier)
+    analysis_result_cache_enabled: bool = True
+    analysis_result_cache_max_bytes: int = 64 * 1024 * 1024
+    analysis_result_cache_redis: bool = True  # Share results across workers when Redis is available
+    analysis_result_cache_ttl_seconds: int = 86400
+    analysis_history_size: int = 1000  # Analyses kept in memory for /data/analyses
     
     # Monitoring and logging
     sentry_dsn: Optional[str] = None
@@ -66,6 +149,11 @@ class Settings(BaseSettings):
     temp_dir: str = "temp"
     event_retention_days: int = 30
     
+    # Retention purge of soft-deleted conversations (Celery beat job)
+    retention_purge_batch_size: int = 500
+    retention_purge_interval_minutes: int = 60
+    retention_archive_dir: Optional[str] = None  # If set, purged rows are archived as gzip NDJSON
+    
     # LLM configuration details
     openai_model: str = "gpt-4"
     openai_max_tokens: int = 4096
@@ -84,8 +172,11 @@ class Settings(BaseSettings):
     llm_main: str = "openai"
     
     # WebSocket additional configuration
+    # Idle seconds before the server sends {"type": "ping"} to sockets connected with ?heartbeat=1
+    # (timeout: websocket_ping_timeout); other sockets rely on protocol-level pings
     ws_heartbeat_interval: int = 30
-    ws_max_connections: int = 1000
+    ws_max_connections: int = 1000  # Per process; extra connections are closed with 1013
+    ws_max_connections_per_user: int = 10  # Extra connections are closed with 1008
     
     # Redis additional configuration
     redis_host: str = "localhost"
@@ -108,6 +199,16 @@ class Settings(BaseSettings):
         """Validate that log_file is not empty."""
         return v or "logs/app.log"
 
+    @validator('ws_replay_backend', pre=True, always=True)
+    def validate_ws_replay_backend(cls, v, values):
+        """Default the replay buffer to the broker's scope; a per-node buffer can't serve a shared broker."""
+        broker = values.get('ws_broker')
+        if not v:
+            return "redis" if broker == "redis" else "memory"
+        if v == "memory" and broker == "redis":
+            raise ValueError("ws_replay_backend=memory can't be used with ws_broker=redis: seq values would collide across nodes")
+        return v
+
     @validator('upload_dir', pre=True, always=True)
     def validate_upload_dir(cls, v):
         """Validate that upload_dir is not empty."""
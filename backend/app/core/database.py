@@ -30,6 +30,7 @@ def init_db():
     from app.models.user import User
     from app.models.conversation import Conversation
     from app.models.chat_message import ChatMessage
+    from app.models.conversation_stats import ConversationStats
     from app.models.token import Token
     
     Base.metadata.create_all(bind=engine) 
\ No newline at end of file
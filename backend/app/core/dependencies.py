@@ -6,6 +6,7 @@ import logging
 from app.models.base import Base
 from app.models.conversation import Conversation
 from app.models.chat_message import ChatMessage
+from app.models.conversation_stats import ConversationStats
 
 # Configuración de la base de datos
 engine = create_engine(
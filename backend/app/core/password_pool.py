@@ -0,0 +1,134 @@
+"""
+Bounded process pool for bcrypt password hashing and verification.
+bcrypt is CPU-bound: run in the default threadpool, a login storm saturates it and
+starves every other sync route. A dedicated process pool escapes the GIL, and a
+queue limit sheds excess logins instead of letting them pile up.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_latency_seconds",
+    "Password hash/verify latency, including time queued for a pool worker",
+    ["operation"]
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hash/verify jobs running or waiting in the process pool"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password hash/verify jobs rejected because the pool queue was full",
+    ["operation"]
+)
+
+# Evaluated in the pool's worker processes
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _hash_password(password: str) -> str:
+    return _pwd_context.hash(password)
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _pwd_context.verify(plain_password, hashed_password)
+
+class PasswordPoolFull(Exception):
+    """Raised when the password pool already has `max_queue` jobs in flight."""
+
+class PasswordHashPool:
+    """Runs bcrypt in a size-bounded process pool with a bounded queue."""
+    
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0  # Jobs submitted and not finished; only touched from the event loop thread
+    
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    async def _run(self, operation: str, fn, *args):
+        if self._pending >= self.max_queue:
+            PASSWORD_HASH_REJECTED.labels(operation=operation).inc()
+            raise PasswordPoolFull(f"Password pool queue is full ({self.max_queue} jobs)")
+        self._pending += 1
+        PASSWORD_HASH_QUEUE_DEPTH.set(self._pending)
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            job = executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job ends, not when its caller stops waiting: a job whose
+        # request was cancelled keeps its worker busy and still counts against max_queue
+        job.add_done_callback(lambda _: self._release_threadsafe(loop))
+        try:
+            return await asyncio.wrap_future(job)
+        except BrokenProcessPool:
+            # A worker died: every pending job fails, the next one gets a new pool.
+            # Only the broken executor is shut down, never a replacement another job already uses.
+            if self._executor is executor:
+                logger.error("Password pool worker died, restarting the pool")
+                self.shutdown()
+            raise
+        finally:
+            PASSWORD_HASH_LATENCY.labels(operation=operation).observe(time.perf_counter() - start_time)
+    
+    def _release(self):
+        self._pending -= 1
+        PASSWORD_HASH_QUEUE_DEPTH.set(self._pending)
+    
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop):
+        # Done callbacks run in the executor's management thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The event loop is already closed (shutdown)
+            pass
+    
+    async def hash(self, password: str) -> str:
+        """Hashes a password in the pool. Raises PasswordPoolFull when saturated."""
+        return await self._run("hash", _hash_password, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifies a password in the pool. Raises PasswordPoolFull when saturated."""
+        return await self._run("verify", _verify_password, plain_password, hashed_password)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+_password_pool: Optional[PasswordHashPool] = None
+
+def get_password_pool() -> PasswordHashPool:
+    """Returns the process-wide password pool, sized from settings."""
+    global _password_pool
+    if _password_pool is None:
+        from app.core.config import settings
+        _password_pool = PasswordHashPool(
+            max_workers=settings.password_hash_workers,
+            max_queue=settings.password_hash_max_queue
+        )
+    return _password_pool
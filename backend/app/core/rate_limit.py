@@ -0,0 +1,341 @@
+"""
+Distributed token-bucket rate limiting for HTTP requests and WebSocket messages.
+
+Buckets live in Redis and are refilled and consumed atomically by a Lua script that
+uses the Redis clock, so every worker shares the same budget. To avoid a Redis
+round-trip per request, each process leases a small batch of tokens at a time and
+spends them locally, and remembers denials until the bucket has refilled.
+Falls back to in-process buckets when Redis is not available.
+
+Limits are strings like "10/minute" and are configured per route (longest prefix
+match, "ws:" prefix for WebSocket messages), per user and per client IP.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.websocket_manager import manager
+from app.services.auth_service import username_from_access_token
+
+# Optional Redis import for the distributed buckets
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "ratelimit:{}:{}"
+REDIS_RETRY_SECONDS = 30
+EXEMPT_PATHS = ("/metrics", "/health", "/api/v1/health", "/docs", "/redoc", "/openapi.json")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests and WebSocket messages rejected by the rate limiter",
+    ["rule", "scope"]
+)
+RATE_LIMIT_CHECKS = Counter(
+    "rate_limit_checks_total",
+    "Rate limit checks by where they were decided",
+    ["source"]
+)
+
+# KEYS[1] = bucket; ARGV[1] = capacity, ARGV[2] = refill rate (tokens/s),
+# ARGV[3] = tokens requested, ARGV[4] = key TTL. Grants up to the tokens available.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {granted, tostring(tokens)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A bucket of `capacity` tokens refilled evenly over `period` seconds."""
+    capacity: int
+    period: int
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    @property
+    def policy(self) -> str:
+        return f"{self.capacity};w={self.period}"
+
+
+def parse_limit(value: str) -> RateLimit:
+    """Parses "<count>/<second|minute|hour|day>", e.g. "10/minute"."""
+    count, _, period = value.partition("/")
+    period = period.strip().lower().rstrip("s")
+    if period not in PERIODS:
+        raise ValueError(f"Invalid rate limit '{value}'")
+    return RateLimit(capacity=int(count), period=PERIODS[period])
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: RateLimit
+    remaining: int
+    retry_after: float = 0.0
+
+    @property
+    def reset(self) -> int:
+        """Seconds until the bucket is full again."""
+        return math.ceil((self.limit.capacity - self.remaining) / self.limit.rate)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit.capacity),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+            "RateLimit-Policy": self.limit.policy,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+class _LocalBucket:
+    """Per-process view of a bucket: leased tokens and a cached denial."""
+    __slots__ = ("leased", "remaining", "blocked_until", "tokens", "updated_at")
+
+    def __init__(self, capacity: int):
+        self.leased = 0
+        self.remaining = capacity
+        self.blocked_until = 0.0
+        # Only used by the in-memory fallback
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+
+class RateLimiter:
+    """Token buckets in Redis with a local lease/denial pre-check (or in memory)."""
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT) if redis_client is not None else None
+        self._redis_down_until = 0.0
+        self._buckets: Dict[str, _LocalBucket] = {}
+
+    def _bucket(self, key: str, limit: RateLimit) -> _LocalBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= settings.rate_limit_max_local_buckets:
+                # Drop idle state; live buckets are rebuilt from Redis on next use
+                now = time.monotonic()
+                self._buckets = {k: b for k, b in self._buckets.items() if b.leased or b.blocked_until > now}
+            bucket = self._buckets[key] = _LocalBucket(limit.capacity)
+        return bucket
+
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        """Consumes one token from bucket `key`."""
+        now = time.monotonic()
+        bucket = self._bucket(key, limit)
+        if bucket.blocked_until > now:
+            RATE_LIMIT_CHECKS.labels(source="local").inc()
+            return RateLimitResult(False, limit, 0, bucket.blocked_until - now)
+        if bucket.leased > 0:
+            RATE_LIMIT_CHECKS.labels(source="local").inc()
+            bucket.leased -= 1
+            bucket.remaining = max(bucket.remaining - 1, 0)
+            return RateLimitResult(True, limit, bucket.remaining)
+
+        if self.redis_client is not None and now >= self._redis_down_until:
+            # Lease a fraction of the bucket so the next requests are decided locally
+            lease = max(1, int(limit.capacity * settings.rate_limit_lease_fraction))
+            try:
+                granted, tokens = await self._script(
+                    keys=[key], args=[limit.capacity, limit.rate, lease, limit.period * 2]
+                )
+                RATE_LIMIT_CHECKS.labels(source="redis").inc()
+                return self._settle(bucket, limit, int(granted), float(tokens), now)
+            except Exception as e:
+                logger.warning(f"Redis rate limiting unavailable, using in-memory buckets: {e}")
+                self._redis_down_until = now + REDIS_RETRY_SECONDS
+
+        RATE_LIMIT_CHECKS.labels(source="local").inc()
+        bucket.tokens = min(limit.capacity, bucket.tokens + (now - bucket.updated_at) * limit.rate)
+        bucket.updated_at = now
+        granted = 1 if bucket.tokens >= 1 else 0
+        bucket.tokens -= granted
+        return self._settle(bucket, limit, granted, bucket.tokens, now)
+
+    def _settle(self, bucket: _LocalBucket, limit: RateLimit, granted: int, tokens: float, now: float) -> RateLimitResult:
+        if granted == 0:
+            retry_after = (1 - tokens) / limit.rate
+            bucket.blocked_until = now + retry_after
+            bucket.remaining = 0
+            return RateLimitResult(False, limit, 0, retry_after)
+        bucket.leased = granted - 1
+        bucket.remaining = int(tokens) + bucket.leased
+        return RateLimitResult(True, limit, bucket.remaining)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = asyncio.Lock()
+
+
+async def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter, connecting to Redis on first use."""
+    global _limiter
+    if _limiter is None:
+        async with _limiter_lock:
+            if _limiter is None:
+                redis_client = None
+                if REDIS_AVAILABLE:
+                    try:
+                        redis_client = aioredis.Redis.from_url(settings.redis_url)
+                        await redis_client.ping()
+                        logger.info("Rate limiter using Redis")
+                    except Exception as e:
+                        logger.warning(f"Redis not available, rate limits enforced per process: {e}")
+                        redis_client = None
+                _limiter = RateLimiter(redis_client)
+    return _limiter
+
+
+_parsed_limits: Dict[str, RateLimit] = {}
+
+
+def _limit(value: str) -> RateLimit:
+    limit = _parsed_limits.get(value)
+    if limit is None:
+        limit = _parsed_limits[value] = parse_limit(value)
+    return limit
+
+
+def resolve_rule(path: str, username: Optional[str] = None) -> Tuple[str, RateLimit]:
+    """
+    Returns (rule name, limit) for `path`: the user's override if any, else the
+    longest matching prefix in rate_limit_routes, else the default limit.
+    """
+    if username and username in settings.rate_limit_users:
+        return f"user:{username}", _limit(settings.rate_limit_users[username])
+    matches = [prefix for prefix in settings.rate_limit_routes if path.startswith(prefix)]
+    if matches:
+        prefix = max(matches, key=len)
+        return prefix, _limit(settings.rate_limit_routes[prefix])
+    return "default", _limit(settings.rate_limit_default)
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token
+    return None
+
+
+def _client_ip(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _check(scope, path: str, username: Optional[str]) -> Tuple[RateLimitResult, str, str]:
+    """Checks the per-IP bucket and then the route bucket. Returns (result, rule, scope)."""
+    limiter = await get_rate_limiter()
+    ip = _client_ip(scope)
+    ip_result = await limiter.hit(BUCKET_KEY.format("ip", ip), _limit(settings.rate_limit_per_ip))
+    if not ip_result.allowed:
+        return ip_result, "ip", "ip"
+    rule, limit = resolve_rule(path, username)
+    identity = f"user:{username}" if username else f"ip:{ip}"
+    result = await limiter.hit(BUCKET_KEY.format(rule, identity), limit)
+    return result, rule, "user" if username else "ip"
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware: rejects HTTP requests over their limit with 429 and adds
+    RateLimit-* headers to every limited response. WebSocket handshakes are checked
+    against the per-IP bucket and closed with 1008 when over the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not settings.rate_limit_enabled or scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if path.startswith(EXEMPT_PATHS) or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            limiter = await get_rate_limiter()
+            result = await limiter.hit(BUCKET_KEY.format("ip", _client_ip(scope)), _limit(settings.rate_limit_per_ip))
+            if not result.allowed:
+                RATE_LIMIT_REJECTIONS.labels(rule="ip", scope="websocket").inc()
+                await send({"type": "websocket.close", "code": 1008})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        username = username_from_access_token(token) if token else None
+        result, rule, bucket_scope = await _check(scope, path, username)
+        if not result.allowed:
+            RATE_LIMIT_REJECTIONS.labels(rule=rule, scope=bucket_scope).inc()
+            body = json.dumps({"detail": "Rate limit exceeded", "retry_after": math.ceil(result.retry_after)}).encode()
+            headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+            headers += [(k.lower().encode(), v.encode()) for k, v in result.headers().items()]
+            await send({"type": "http.response.start", "status": 429, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        rate_headers = [(k.lower().encode(), v.encode()) for k, v in result.headers().items()]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + rate_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def check_websocket_message(websocket, channel: str) -> bool:
+    """
+    Rate limits one incoming WebSocket message on `channel` (rule "ws:/ws/<channel>").
+    Sends a rate_limited error frame and returns False when the message must be dropped.
+    """
+    if not settings.rate_limit_enabled:
+        return True
+    token = websocket.query_params.get("token")
+    username = username_from_access_token(token) if token else None
+    result, rule, bucket_scope = await _check(websocket.scope, f"ws:/ws/{channel}", username)
+    if result.allowed:
+        return True
+    RATE_LIMIT_REJECTIONS.labels(rule=rule, scope="websocket").inc()
+    await manager.send_personal_message({
+        "type": "error",
+        "error": "rate_limited",
+        "retry_after": round(result.retry_after, 3)
+    }, websocket)
+    return False
@@ -0,0 +1,217 @@
+"""
+Refresh-token store.
+Each issued refresh token is stored in Redis as refresh:<jti> -> username with a TTL
+equal to the token expiry. Rotation (revoke the old jti, store the new one) is a single
+Lua script, so a token can only be redeemed once even under concurrent refreshes.
+Revoked jtis are mirrored in an in-process Bloom filter (kept in sync across workers
+via pub/sub), so checking a token that was never revoked doesn't leave the process.
+When the filter fills up it is rebuilt from the live revocations in a background
+thread, sized at twice their count, and swapped in once complete.
+Falls back to an in-memory store when Redis is not available.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.bloom_filter import BloomFilter
+
+# Optional Redis import for the distributed store
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_KEY = "refresh:{}"
+REVOKED_KEY = "refresh:revoked:{}"
+REVOKED_CHANNEL = "refresh:revoked"
+
+# KEYS[1] = refresh:<old jti>, KEYS[2] = refresh:revoked:<old jti>, KEYS[3] = refresh:<new jti>
+# ARGV[1] = username, ARGV[2] = new token TTL, ARGV[3] = old jti, ARGV[4] = revocation channel
+ROTATE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local ttl = redis.call('TTL', KEYS[1])
+redis.call('DEL', KEYS[1])
+if ttl > 0 then
+    redis.call('SET', KEYS[2], '1', 'EX', ttl)
+end
+redis.call('SET', KEYS[3], ARGV[1], 'EX', ARGV[2])
+redis.call('PUBLISH', ARGV[4], ARGV[3])
+return 1
+"""
+
+# KEYS[1] = refresh:<jti>, KEYS[2] = refresh:revoked:<jti>; ARGV[1] = jti, ARGV[2] = channel
+REVOKE_SCRIPT = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], '1', 'EX', ttl)
+redis.call('PUBLISH', ARGV[2], ARGV[1])
+return 1
+"""
+
+class RefreshTokenStore:
+    """Issues, rotates and revokes refresh-token jtis (Redis, or in-memory fallback)."""
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self.revoked = BloomFilter(
+            settings.revoked_token_bloom_capacity,
+            settings.revoked_token_bloom_error_rate
+        )
+        # jtis revoked while a rebuild runs (None when there is none), added to the new filter
+        self._rebuild_pending: Optional[List[str]] = None
+        self._bloom_lock = threading.Lock()
+        # In-memory fallback: jti -> (username, expires_at) and revoked jti -> expires_at
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._revoked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._pubsub_thread = None
+
+        if self.redis_client is not None:
+            self._rotate = self.redis_client.register_script(ROTATE_SCRIPT)
+            self._revoke = self.redis_client.register_script(REVOKE_SCRIPT)
+            self._rebuild_pending = []
+            self._rebuild_bloom()
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REVOKED_CHANNEL: self._on_revoked_message})
+            self._pubsub_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_revoked_message(self, message):
+        jti = message["data"]
+        jti = jti.decode() if isinstance(jti, bytes) else jti
+        if jti not in self.revoked:  # Our own revocations are already there
+            self._add_revoked(jti)
+
+    def _add_revoked(self, jti: str):
+        with self._bloom_lock:
+            self.revoked.add(jti)
+            if self._rebuild_pending is not None:
+                self._rebuild_pending.append(jti)
+            elif self.revoked.is_full:
+                # Past capacity the false-positive rate only degrades; the rebuild runs off the request path
+                self._rebuild_pending = []
+                threading.Thread(target=self._rebuild_bloom, name="revoked-bloom-rebuild", daemon=True).start()
+
+    def _rebuild_bloom(self):
+        """
+        Builds a new Bloom filter from the live revocations (expired ones drop out) and
+        swaps it in. It is sized at twice the live count, so the next rebuild only comes
+        after as many new revocations again: a rebuild is amortized over the adds.
+        """
+        try:
+            if self.redis_client is not None:
+                prefix = REVOKED_KEY.format("")
+                live = [
+                    (key.decode() if isinstance(key, bytes) else key)[len(prefix):]
+                    for key in self.redis_client.scan_iter(match=REVOKED_KEY.format("*"), count=1000)
+                ]
+            else:
+                now = time.time()
+                with self._lock:
+                    self._revoked_until = {jti: exp for jti, exp in self._revoked_until.items() if exp > now}
+                    live = list(self._revoked_until)
+            revoked = BloomFilter(
+                max(settings.revoked_token_bloom_capacity, 2 * len(live)),
+                settings.revoked_token_bloom_error_rate
+            )
+            for jti in live:
+                revoked.add(jti)
+            with self._bloom_lock:
+                # Revocations published while scanning may be missing from the scan
+                for jti in self._rebuild_pending:
+                    revoked.add(jti)
+                self.revoked = revoked
+            logger.info(f"Rebuilt the revoked refresh-token filter: {len(live)} live, capacity {revoked.capacity}")
+        except Exception as e:
+            # The current filter stays in place (it already has every revocation)
+            logger.warning(f"Could not rebuild the revoked refresh-token filter: {e}")
+        finally:
+            with self._bloom_lock:
+                self._rebuild_pending = None
+
+    def issue(self, jti: str, username: str, ttl: int):
+        """Stores a newly issued refresh token for `ttl` seconds."""
+        if self.redis_client is not None:
+            self.redis_client.set(TOKEN_KEY.format(jti), username, ex=ttl)
+        else:
+            with self._lock:
+                self._tokens[jti] = (username, time.time() + ttl)
+
+    def is_revoked(self, jti: str) -> bool:
+        """True if `jti` was revoked. Only Bloom filter hits are confirmed against the store."""
+        if jti not in self.revoked:
+            return False
+        if self.redis_client is not None:
+            return bool(self.redis_client.exists(REVOKED_KEY.format(jti)))
+        with self._lock:
+            return self._revoked_until.get(jti, 0) > time.time()
+
+    def rotate(self, old_jti: str, new_jti: str, username: str, ttl: int) -> bool:
+        """Atomically revokes `old_jti` and stores `new_jti`. False if `old_jti` is not live."""
+        if self.redis_client is not None:
+            rotated = self._rotate(
+                keys=[TOKEN_KEY.format(old_jti), REVOKED_KEY.format(old_jti), TOKEN_KEY.format(new_jti)],
+                args=[username, ttl, old_jti, REVOKED_CHANNEL]
+            )
+            if rotated:
+                # Don't wait for our own pub/sub message
+                self._add_revoked(old_jti)
+            return bool(rotated)
+        now = time.time()
+        with self._lock:
+            owner, expires_at = self._tokens.get(old_jti, (None, 0))
+            if owner != username or expires_at <= now:
+                return False
+            del self._tokens[old_jti]
+            self._revoked_until[old_jti] = expires_at
+            self._tokens[new_jti] = (username, now + ttl)
+        self._add_revoked(old_jti)
+        return True
+
+    def revoke(self, jti: str) -> bool:
+        """Revokes a live refresh token (e.g. on logout)."""
+        if self.redis_client is not None:
+            revoked = bool(self._revoke(
+                keys=[TOKEN_KEY.format(jti), REVOKED_KEY.format(jti)],
+                args=[jti, REVOKED_CHANNEL]
+            ))
+        else:
+            with self._lock:
+                _, expires_at = self._tokens.pop(jti, (None, 0))
+                revoked = expires_at > time.time()
+                if revoked:
+                    self._revoked_until[jti] = expires_at
+        if revoked:
+            self._add_revoked(jti)
+        return revoked
+
+_store: Optional[RefreshTokenStore] = None
+_store_lock = threading.Lock()
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    """Returns the process-wide refresh-token store, connecting to Redis on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                redis_client = None
+                if REDIS_AVAILABLE:
+                    try:
+                        redis_client = redis.Redis.from_url(settings.redis_url)
+                        redis_client.ping()
+                        logger.info("Refresh-token store using Redis")
+                    except Exception as e:
+                        logger.warning(f"Redis not available, refresh tokens stored in memory: {e}")
+                        redis_client = None
+                _store = RefreshTokenStore(redis_client)
+    return _store
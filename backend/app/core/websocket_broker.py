@@ -0,0 +1,167 @@
+"""
+Brokers que reparten los mensajes WebSocket entre procesos y nodos.
+
+ConnectionManager siempre entrega primero a sus conexiones locales y después
+publica el mensaje en el broker para que el resto de nodos lo entreguen a las suyas.
+- LocalBroker: un solo proceso, no reenvía nada.
+- RedisBroker: Redis pub/sub. Las publicaciones se agrupan en lotes (un PUBLISH
+  por lote y no por mensaje) y cada nodo ignora los lotes que publicó él mismo.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from app.core.config import settings
+
+# Optional Redis import for cross-node fan-out
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY_SECONDS = 1.0
+
+WS_BROKER_MESSAGES = Counter(
+    "ws_broker_messages_total",
+    "WebSocket messages exchanged with other nodes through the broker",
+    ["direction"]
+)
+WS_BROKER_BATCH_SIZE = Histogram(
+    "ws_broker_batch_size",
+    "Messages per broker publish",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+# deliver(kind, target, text, coalesce_key): kind es "channel", "topic", "user" o "unsubscribed"
+DeliverCallback = Callable[[str, str, str, Optional[str]], None]
+
+
+class LocalBroker:
+    """Broker de un solo proceso: la entrega local del manager ya llega a todos."""
+
+    async def start(self, deliver: DeliverCallback):
+        pass
+
+    def publish(self, kind: str, target: str, text: str, coalesce_key: Optional[str] = None):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisBroker:
+    """Reenvía los mensajes al resto de nodos por Redis pub/sub, en lotes."""
+
+    def __init__(self, redis_client, channel: Optional[str] = None):
+        self.redis_client = redis_client
+        self.channel = channel or settings.ws_broker_channel
+        self.node_id = uuid.uuid4().hex
+        self.batch_size = settings.ws_broker_batch_size
+        self.flush_interval = settings.ws_broker_flush_interval_ms / 1000
+        # Acotada: si Redis no responde, los mensajes más antiguos se descartan en vez de acumularse
+        self._pending: Deque[list] = deque(maxlen=settings.ws_broker_max_pending)
+        self._dropped = 0
+        self._has_pending = asyncio.Event()
+        self._deliver: Optional[DeliverCallback] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._listen_loop())]
+        logger.info(f"Broker WebSocket Redis iniciado en el canal {self.channel} (nodo {self.node_id})")
+
+    def publish(self, kind: str, target: str, text: str, coalesce_key: Optional[str] = None):
+        """Encola el mensaje para el próximo lote; nunca bloquea al llamante."""
+        if len(self._pending) == self._pending.maxlen:
+            self._dropped += 1
+            WS_BROKER_MESSAGES.labels(direction="dropped").inc()
+        self._pending.append([kind, target, text, coalesce_key])
+        self._has_pending.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._has_pending.wait()
+            # Espera unos milisegundos para agrupar los mensajes de una ráfaga
+            await asyncio.sleep(self.flush_interval)
+            batch = list(self._pending)
+            self._pending.clear()
+            self._has_pending.clear()
+            if self._dropped:
+                logger.warning(f"Cola del broker WebSocket llena: {self._dropped} mensajes descartados sin publicar")
+                self._dropped = 0
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                try:
+                    await self.redis_client.publish(
+                        self.channel, json.dumps({"origin": self.node_id, "messages": chunk})
+                    )
+                    WS_BROKER_MESSAGES.labels(direction="published").inc(len(chunk))
+                    WS_BROKER_BATCH_SIZE.observe(len(chunk))
+                except Exception as e:
+                    logger.error(f"Error al publicar {len(chunk)} mensajes WebSocket en Redis: {e}")
+
+    async def _listen_loop(self):
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._handle_batch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Suscripción del broker WebSocket perdida, reintentando: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _handle_batch(self, data):
+        try:
+            batch = json.loads(data)
+        except ValueError:
+            logger.warning("Lote inválido recibido en el broker WebSocket")
+            return
+        if batch.get("origin") == self.node_id:
+            return
+        messages = batch.get("messages", [])
+        WS_BROKER_MESSAGES.labels(direction="received").inc(len(messages))
+        for kind, target, text, coalesce_key in messages:
+            self._deliver(kind, target, text, coalesce_key)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            await self.redis_client.aclose()
+        except Exception:
+            pass
+
+
+async def create_broker():
+    """Crea el broker configurado en ws_broker ("local" o "redis"); usa el local si Redis no responde."""
+    if settings.ws_broker == "redis":
+        if not REDIS_AVAILABLE:
+            logger.warning("redis no está instalado, los WebSockets solo llegan a este proceso")
+            return LocalBroker()
+        try:
+            redis_client = aioredis.Redis.from_url(settings.redis_url)
+            await redis_client.ping()
+            return RedisBroker(redis_client)
+        except Exception as e:
+            logger.warning(f"Redis no disponible, los WebSockets solo llegan a este proceso: {e}")
+    return LocalBroker()
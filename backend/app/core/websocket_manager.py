@@ -1,11 +1,208 @@
-from typing import Dict, List, Set
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from collections import deque
 from fastapi import WebSocket, WebSocketDisconnect
+from prometheus_client import Counter, Histogram
+from app.core.config import settings
 from app.core.security import verify_token
+from app.core.websocket_broker import LocalBroker, create_broker
+from app.core.websocket_replay import WS_REPLAY_FRAMES, WS_REPLAY_RESUMES, MemoryReplayBuffer, create_replay_buffer
+from app.utils.timing_wheel import TimingWheel
+import asyncio
 import json
 import logging
+import time
+
+# Optional msgpack import for the binary subprotocol
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
 
 logger = logging.getLogger(__name__)
 
+# Codificaciones negociadas con el subprotocolo WebSocket (Sec-WebSocket-Protocol)
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Políticas cuando la cola de salida de una conexión está llena
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_DISCONNECT = "disconnect"
+
+# Códigos de cierre: consumidor lento o servidor lleno ("Try Again Later"),
+# límite por usuario superado y peer muerto (sin respuesta al heartbeat de aplicación)
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_GOING_AWAY = 1001
+
+HEARTBEAT_TICK_SECONDS = 1.0
+PING_MESSAGE = {"type": "ping"}
+
+WS_OUTBOUND_DROPPED = Counter(
+    "ws_outbound_dropped_total",
+    "Outbound WebSocket messages dropped or coalesced because a connection queue was full",
+    ["channel", "reason"]
+)
+WS_SLOW_CONSUMERS_EVICTED = Counter(
+    "ws_slow_consumers_evicted_total",
+    "WebSocket connections closed for not keeping up with their outbound queue",
+    ["channel", "reason"]
+)
+WS_CONNECTION_LIFETIME = Histogram(
+    "ws_connection_lifetime_seconds",
+    "Lifetime of WebSocket connections",
+    ["channel"],
+    buckets=(1, 10, 30, 60, 300, 900, 1800, 3600, 4 * 3600, 12 * 3600, 24 * 3600)
+)
+WS_CONNECTIONS_REJECTED = Counter(
+    "ws_connections_rejected_total",
+    "WebSocket connections refused because of the global or per-user limit",
+    ["reason"]
+)
+WS_HEARTBEAT_REAPED = Counter(
+    "ws_heartbeat_reaped_total",
+    "WebSocket connections closed for not answering heartbeats",
+    ["channel"]
+)
+WS_CONNECTIONS_BY_ENCODING = Counter(
+    "ws_connections_by_encoding_total",
+    "WebSocket connections accepted per negotiated encoding",
+    ["encoding"]
+)
+WS_OUTBOUND_QUEUE_DEPTH = Histogram(
+    "ws_outbound_queue_depth",
+    "Outbound queue depth of a connection when a message is enqueued",
+    ["channel"],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+
+
+class EncodedMessage:
+    """
+    Un mensaje a enviar, codificado como mucho una vez por codificación (grupo de codificación):
+    en un broadcast todas las conexiones JSON comparten el texto y todas las msgpack los bytes.
+    """
+    __slots__ = ("message", "text", "packed")
+
+    def __init__(self, message: Optional[Dict[str, Any]] = None, text: Optional[str] = None):
+        self.message = message
+        self.text = text
+        self.packed: Optional[bytes] = None
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        if encoding == ENCODING_MSGPACK:
+            if self.packed is None:
+                if self.message is None:
+                    self.message = json.loads(self.text)
+                self.packed = msgpack.packb(self.message, use_bin_type=True)
+            return self.packed
+        if self.text is None:
+            self.text = json.dumps(self.message)
+        return self.text
+
+
+class OutboundQueue:
+    """
+    Cola de salida acotada de una conexión, vaciada por su propia tarea escritora.
+    Encolar nunca bloquea: un cliente lento solo llena su propia cola, y al
+    llenarse se aplica la política de desbordamiento configurada.
+    """
+    __slots__ = ("websocket", "channel", "maxsize", "policy", "queue", "dropped", "_on_evict", "_wakeup", "_task", "_closed")
+
+    def __init__(self, websocket: WebSocket, channel: str, on_evict: Callable[["OutboundQueue", str], None]):
+        self.websocket = websocket
+        self.channel = channel
+        self.maxsize = settings.ws_send_queue_size
+        self.policy = settings.ws_overflow_policy
+        self.queue: Deque[Tuple[Optional[str], Union[str, bytes]]] = deque()
+        self.dropped = 0
+        self._on_evict = on_evict
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, text: Union[str, bytes], coalesce_key: Optional[str] = None) -> bool:
+        """Encola un frame ya serializado (texto JSON o bytes msgpack). Devuelve False si la conexión fue expulsada."""
+        WS_OUTBOUND_QUEUE_DEPTH.labels(channel=self.channel).observe(len(self.queue))
+        if len(self.queue) >= self.maxsize:
+            if self.policy == OVERFLOW_DISCONNECT:
+                self._on_evict(self, "queue_full")
+                return False
+            if self.policy == OVERFLOW_COALESCE and coalesce_key is not None:
+                # Reemplaza el mensaje pendiente con la misma clave (p. ej. progreso)
+                for index, (key, _) in enumerate(self.queue):
+                    if key == coalesce_key:
+                        self.queue[index] = (coalesce_key, text)
+                        self._count_drop("coalesced")
+                        return True
+            self.queue.popleft()
+            self._count_drop("drop_oldest")
+        self.queue.append((coalesce_key, text))
+        self._wakeup.set()
+        return True
+
+    def _count_drop(self, reason: str):
+        self.dropped += 1
+        WS_OUTBOUND_DROPPED.labels(channel=self.channel, reason=reason).inc()
+
+    async def _run(self):
+        # Se comprueba _closed además de cancelar la tarea: wait_for puede tragarse
+        # una cancelación que llega justo cuando termina el envío (Python < 3.12)
+        while not self._closed:
+            if not self.queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            _, frame = self.queue.popleft()
+            send = self.websocket.send_bytes(frame) if isinstance(frame, bytes) else self.websocket.send_text(frame)
+            try:
+                await asyncio.wait_for(send, timeout=settings.ws_send_timeout_seconds)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timeout al enviar mensaje en el canal {self.channel}, se expulsa la conexión lenta")
+                self._on_evict(self, "send_timeout")
+                return
+            except Exception as e:
+                logger.error(f"Error al enviar mensaje en el canal {self.channel}: {e}")
+                self._on_evict(self, "send_error")
+                return
+
+    def close(self):
+        """Detiene la tarea escritora y descarta los mensajes pendientes."""
+        self.queue.clear()
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+class ConnectionState:
+    """Estado compacto de una conexión; también sirve de índice inverso para desconectar en O(1)."""
+    __slots__ = (
+        "websocket", "channel", "user_id", "encoding", "topics", "outbound",
+        "connected_at", "last_seen", "ping_sent_at", "heartbeat", "heartbeat_slot", "resuming"
+    )
+
+    def __init__(
+        self, websocket: WebSocket, channel: str, user_id: Optional[str], encoding: str, outbound: OutboundQueue,
+        heartbeat: bool = False
+    ):
+        self.websocket = websocket
+        self.channel = channel
+        self.user_id = user_id
+        self.encoding = encoding
+        self.topics: Set[str] = set()
+        self.outbound = outbound
+        self.connected_at = self.last_seen = time.monotonic()
+        self.ping_sent_at = 0.0
+        # Heartbeats de aplicación ({"type": "ping"}) solo si el cliente los pidió; el resto se
+        # vigila con los pings del protocolo WebSocket (uvicorn ws_ping_interval / ws_ping_timeout)
+        self.heartbeat = heartbeat
+        self.heartbeat_slot = 0
+        # Streams que se están reanudando -> frames en vivo retenidos hasta terminar la repetición
+        self.resuming: Optional[Dict[str, List[EncodedMessage]]] = None
+
+
 class ConnectionManager:
     """Gestor de conexiones WebSocket."""
     
@@ -15,91 +212,419 @@ class ConnectionManager:
             "data": set(),
             "notifications": set()
         }
-        self.user_connections: Dict[str, WebSocket] = {}
+        # Índices de suscripción: usuario -> sockets y tema (p. ej. "conversation:<id>") -> sockets
+        self.user_connections: Dict[str, Set[WebSocket]] = {}
+        self.topic_subscribers: Dict[str, Set[WebSocket]] = {}
+        # Índice inverso: socket -> su estado (canal, usuario, temas y cola de salida)
+        self.connections: Dict[WebSocket, ConnectionState] = {}
+        self.broker = LocalBroker()
+        self.replay = MemoryReplayBuffer()
+        # Heartbeats: una sola tarea recorre una rueda de temporización en vez de una tarea por socket
+        wheel_seconds = max(settings.ws_heartbeat_interval, settings.websocket_ping_timeout)
+        self._wheel = TimingWheel(HEARTBEAT_TICK_SECONDS, int(wheel_seconds / HEARTBEAT_TICK_SECONDS) + 2)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+    
+    async def start_broker(self):
+        """Arranca el broker configurado para repartir los mensajes entre nodos."""
+        self.broker = await create_broker()
+        await self.broker.start(self._deliver)
+    
+    async def stop_broker(self):
+        await self.broker.stop()
+        self.broker = LocalBroker()
+    
+    async def start_replay_buffer(self):
+        """Crea el buffer de repetición configurado para reanudar streams."""
+        # Con un broker entre nodos los seq tienen que ser compartidos
+        self.replay = await create_replay_buffer(shared_broker=not isinstance(self.broker, LocalBroker))
+    
+    async def stop_replay_buffer(self):
+        await self.replay.stop()
+        self.replay = MemoryReplayBuffer()
+    
+    def start_heartbeat(self):
+        """
+        Arranca la tarea que envía pings a los sockets inactivos que pidieron heartbeats
+        de aplicación y expulsa a los que no responden.
+        """
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
     
-    async def connect(self, websocket: WebSocket, channel: str, token: str = None):
-        """Conecta un WebSocket a un canal específico."""
+    async def stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+    
+    async def connect(self, websocket: WebSocket, channel: str, token: str = None, heartbeat: bool = False) -> bool:
+        """
+        Conecta un WebSocket a un canal específico. Devuelve False si la conexión se rechazó
+        (canal no válido, servidor lleno -> 1013, demasiadas conexiones del usuario -> 1008).
+        Con heartbeat=True el servidor envía {"type": "ping"} tras ws_heartbeat_interval sin
+        actividad y cierra el socket (1001) si no llega ningún mensaje antes de websocket_ping_timeout.
+        """
         try:
-            await websocket.accept()
+            # Subprotocolo: "msgpack" (binario) si el cliente lo pide y está disponible, si no JSON
+            requested = websocket.scope.get("subprotocols") or []
+            encoding = ENCODING_MSGPACK if ENCODING_MSGPACK in requested and MSGPACK_AVAILABLE else ENCODING_JSON
+            await websocket.accept(subprotocol=encoding if encoding in requested else None)
             
             # Verificar token si se proporciona
             user_id = None
             if token:
                 payload = verify_token(token)
-                if payload:
+                if payload and payload.get("type") != "refresh":
                     user_id = payload.get("sub")
             
-            # Agregar conexión al canal
-            if channel in self.active_connections:
-                self.active_connections[channel].add(websocket)
-                if user_id:
-                    self.user_connections[user_id] = websocket
-                
-                logger.info(f"Usuario {user_id} conectado al canal {channel}")
-                
-                # Enviar mensaje de confirmación
-                await self.send_personal_message(
-                    {"type": "connection", "status": "connected", "channel": channel},
-                    websocket
-                )
-            else:
+            if channel not in self.active_connections:
                 await websocket.close(code=4000, reason="Canal no válido")
+                return False
+            if len(self.connections) >= settings.ws_max_connections:
+                WS_CONNECTIONS_REJECTED.labels(reason="global_limit").inc()
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Servidor lleno")
+                return False
+            if user_id and len(self.user_connections.get(user_id, ())) >= settings.ws_max_connections_per_user:
+                WS_CONNECTIONS_REJECTED.labels(reason="user_limit").inc()
+                await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="Demasiadas conexiones")
+                return False
+            
+            # Agregar conexión al canal
+            self.active_connections[channel].add(websocket)
+            state = ConnectionState(
+                websocket, channel, user_id, encoding, OutboundQueue(websocket, channel, self._evict), heartbeat
+            )
+            if heartbeat:
+                state.heartbeat_slot = self._wheel.schedule(websocket, settings.ws_heartbeat_interval)
+            self.connections[websocket] = state
+            if user_id:
+                self.user_connections.setdefault(user_id, set()).add(websocket)
+            WS_CONNECTIONS_BY_ENCODING.labels(encoding=encoding).inc()
+            
+            logger.info(f"Usuario {user_id} conectado al canal {channel}")
+            
+            # Enviar mensaje de confirmación
+            await self.send_personal_message(
+                {"type": "connection", "status": "connected", "channel": channel},
+                websocket
+            )
+            return True
                 
         except Exception as e:
             logger.error(f"Error al conectar WebSocket: {e}")
             await websocket.close(code=4001, reason="Error de conexión")
+            return False
+    
+    async def receive_text(self, websocket: WebSocket) -> str:
+        """
+        Recibe un mensaje como texto JSON, sea cual sea la codificación de la conexión
+        (los frames msgpack se decodifican y se pasan a JSON). Lanza WebSocketDisconnect al cerrarse.
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        if message.get("bytes") is not None:
+            state = self.connections.get(websocket)
+            if state is not None and state.encoding == ENCODING_MSGPACK:
+                return json.dumps(msgpack.unpackb(message["bytes"], raw=False))
+            return message["bytes"].decode("utf-8")
+        return message.get("text") or ""
+    
+    def handle_heartbeat(self, websocket: WebSocket, data: str) -> bool:
+        """
+        Registra actividad del socket (cualquier mensaje cuenta como respuesta al ping).
+        Devuelve True si el mensaje era un pong, que no hay que procesar.
+        """
+        state = self.connections.get(websocket)
+        if state is not None:
+            state.last_seen = time.monotonic()
+        if len(data) < 64 and '"pong"' in data:
+            try:
+                return json.loads(data).get("type") == "pong"
+            except (ValueError, AttributeError):
+                return False
+        return False
+    
+    async def _heartbeat_loop(self):
+        interval = settings.ws_heartbeat_interval
+        timeout = settings.websocket_ping_timeout
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            now = time.monotonic()
+            for websocket in self._wheel.advance():
+                state = self.connections.get(websocket)
+                if state is None:
+                    continue
+                if state.ping_sent_at > state.last_seen:
+                    # Ping pendiente sin respuesta
+                    waited = now - state.ping_sent_at
+                    if waited >= timeout:
+                        self._reap(state)
+                        continue
+                    delay = timeout - waited
+                elif now - state.last_seen >= interval:
+                    state.ping_sent_at = now
+                    state.outbound.put(EncodedMessage(PING_MESSAGE).encode(state.encoding))
+                    delay = timeout
+                else:
+                    delay = interval - (now - state.last_seen)
+                state.heartbeat_slot = self._wheel.schedule(websocket, delay)
+    
+    def _reap(self, state: ConnectionState):
+        logger.info(f"Conexión sin respuesta al heartbeat en el canal {state.channel}, se cierra")
+        WS_HEARTBEAT_REAPED.labels(channel=state.channel).inc()
+        self.disconnect(state.websocket, state.channel)
+        asyncio.create_task(self._close(state.websocket, CLOSE_GOING_AWAY))
     
     def disconnect(self, websocket: WebSocket, channel: str):
-        """Desconecta un WebSocket de un canal."""
+        """Desconecta un WebSocket de un canal. O(1) más O(temas suscritos) gracias al índice inverso."""
         if channel in self.active_connections:
             self.active_connections[channel].discard(websocket)
+        state = self.connections.pop(websocket, None)
+        if state is None:
+            return
+        state.outbound.close()
+        if state.heartbeat:
+            self._wheel.cancel(websocket, state.heartbeat_slot)
+        WS_CONNECTION_LIFETIME.labels(channel=state.channel).observe(time.monotonic() - state.connected_at)
+        for topic in state.topics:
+            self._remove_subscriber(self.topic_subscribers, topic, websocket)
         
         # Remover de conexiones de usuario
-        user_id = None
-        for uid, ws in self.user_connections.items():
-            if ws == websocket:
-                user_id = uid
-                break
-        
-        if user_id:
-            del self.user_connections[user_id]
-            logger.info(f"Usuario {user_id} desconectado del canal {channel}")
+        if state.user_id:
+            self._remove_subscriber(self.user_connections, state.user_id, websocket)
+            logger.info(f"Usuario {state.user_id} desconectado del canal {channel}")
+    
+    @staticmethod
+    def _remove_subscriber(index: Dict[str, Set[WebSocket]], key: str, websocket: WebSocket):
+        sockets = index.get(key)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del index[key]
     
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Envía un mensaje personal a un WebSocket específico."""
+    def subscribe(self, websocket: WebSocket, topic: str) -> bool:
+        """Suscribe un WebSocket conectado a un tema. False si no está conectado o supera el límite."""
+        state = self.connections.get(websocket)
+        if state is None:
+            return False
+        if topic not in state.topics and len(state.topics) >= settings.ws_max_subscriptions_per_connection:
+            return False
+        state.topics.add(topic)
+        self.topic_subscribers.setdefault(topic, set()).add(websocket)
+        return True
+    
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        """Cancela la suscripción de un WebSocket a un tema."""
+        state = self.connections.get(websocket)
+        if state is not None:
+            state.topics.discard(topic)
+        self._remove_subscriber(self.topic_subscribers, topic, websocket)
+    
+    def get_user(self, websocket: WebSocket) -> Optional[str]:
+        """Usuario autenticado de un WebSocket (None si es anónimo)."""
+        state = self.connections.get(websocket)
+        return state.user_id if state else None
+    
+    def _evict(self, outbound: OutboundQueue, reason: str):
+        """Expulsa una conexión que no consume sus mensajes (cola llena, timeout o error)."""
+        websocket = outbound.websocket
+        WS_SLOW_CONSUMERS_EVICTED.labels(channel=outbound.channel, reason=reason).inc()
+        self.disconnect(websocket, outbound.channel)
+        if reason != "send_error":
+            asyncio.create_task(self._close(websocket, CLOSE_TRY_AGAIN_LATER))
+    
+    async def _close(self, websocket: WebSocket, code: int):
         try:
-            await websocket.send_text(json.dumps(message))
+            await asyncio.wait_for(websocket.close(code=code), timeout=settings.ws_send_timeout_seconds)
+        except Exception:
+            pass
+    
+    async def send_personal_message(self, message: dict, websocket: WebSocket, coalesce_key: Optional[str] = None):
+        """Envía un mensaje personal a un WebSocket específico (a través de su cola si está conectado)."""
+        try:
+            state = self.connections.get(websocket)
+            if state:
+                state.outbound.put(EncodedMessage(message).encode(state.encoding), coalesce_key)
+            else:
+                await websocket.send_text(json.dumps(message))
         except Exception as e:
             logger.error(f"Error al enviar mensaje personal: {e}")
     
-    async def broadcast_to_channel(self, message: dict, channel: str):
-        """Envía un mensaje a todos los WebSockets de un canal."""
+    def _deliver(self, kind: str, target: str, text: str, coalesce_key: Optional[str] = None,
+                 message: Optional[Dict[str, Any]] = None):
+        """
+        Encola un mensaje ya serializado en JSON en las conexiones locales de un canal, tema o
+        usuario. Se codifica una sola vez por grupo de codificación (JSON / msgpack).
+        """
+        if kind == "channel":
+            connections = self.active_connections.get(target, ())
+        elif kind == "topic":
+            connections = self.topic_subscribers.get(target, ())
+        elif kind == "unsubscribed":
+            # target = "<canal>:<usuario>": sockets del usuario en el canal sin ningún tema suscrito
+            channel, user_id = target.split(":", 1)
+            connections = [
+                connection for connection, state in (
+                    (connection, self.connections.get(connection)) for connection in self.user_connections.get(user_id, ())
+                )
+                if state is not None and state.channel == channel and not state.topics
+            ]
+        else:
+            connections = self.user_connections.get(target, ())
+        encoded = EncodedMessage(message, text)
+        stream = f"{kind}:{target}"
+        # Copia: una expulsión por cola llena modifica el índice durante el recorrido
+        for connection in tuple(connections):
+            state = self.connections.get(connection)
+            if state:
+                if state.resuming and stream in state.resuming:
+                    state.resuming[stream].append(encoded)
+                    continue
+                state.outbound.put(encoded.encode(state.encoding), coalesce_key)
+    
+    def _is_resumable(self, kind: str, target: str) -> bool:
+        if kind == "channel":
+            return target in settings.ws_resumable_channels
+        return kind != "unsubscribed"
+    
+    async def _publish(self, kind: str, target: str, message: dict, coalesce_key: Optional[str] = None):
+        """
+        Entrega un mensaje en este nodo y lo publica en el broker. Los mensajes de streams
+        reanudables llevan "stream" y "seq" y quedan en el buffer de repetición.
+        """
+        if self._is_resumable(kind, target):
+            stream = f"{kind}:{target}"
+            message = {**message, "stream": stream}
+            text, seq = await self.replay.append(stream, json.dumps(message))
+            if seq is not None:
+                message["seq"] = seq
+        else:
+            text = json.dumps(message)
+        self._deliver(kind, target, text, coalesce_key, message)
+        self.broker.publish(kind, target, text, coalesce_key)
+    
+    def can_resume(self, websocket: WebSocket, stream: str) -> bool:
+        """Un socket solo puede reanudar su canal, su usuario o los temas a los que está suscrito."""
+        state = self.connections.get(websocket)
+        if state is None:
+            return False
+        kind, _, target = stream.partition(":")
+        if kind == "channel":
+            return target == state.channel and self._is_resumable(kind, target)
+        if kind == "user":
+            return state.user_id is not None and target == state.user_id
+        return kind == "topic" and target in state.topics
+    
+    async def resume(self, websocket: WebSocket, stream: str, last_seq: int) -> Tuple[bool, int]:
+        """
+        Reenvía los frames de `stream` posteriores a `last_seq` desde el buffer de repetición.
+        Devuelve (reanudado, seq actual); False si el hueco supera el buffer y hace falta un snapshot.
+        Los frames en vivo del stream se retienen mientras tanto y se envían después sin duplicados.
+        """
+        state = self.connections.get(websocket)
+        if state is None:
+            return False, 0
+        if state.resuming is None:
+            state.resuming = {}
+        state.resuming[stream] = []
+        try:
+            frames, current = await self.replay.since(stream, last_seq)
+        finally:
+            held = state.resuming.pop(stream, [])
+            if not state.resuming:
+                state.resuming = None
+        if self.connections.get(websocket) is not state:
+            return False, current
+        if frames is None:
+            WS_REPLAY_RESUMES.labels(outcome="snapshot").inc()
+            for encoded in held:
+                state.outbound.put(encoded.encode(state.encoding))
+            return False, current
+        WS_REPLAY_RESUMES.labels(outcome="replayed").inc()
+        WS_REPLAY_FRAMES.inc(len(frames))
+        for _, text in frames:
+            state.outbound.put(EncodedMessage(text=text).encode(state.encoding))
+        replayed_seq = seq = frames[-1][0] if frames else last_seq
+        for encoded in held:
+            frame_seq = self._frame_seq(encoded)
+            if frame_seq > replayed_seq:
+                state.outbound.put(encoded.encode(state.encoding))
+                seq = max(seq, frame_seq)
+        return True, max(current, seq)
+    
+    @staticmethod
+    def _frame_seq(encoded: EncodedMessage) -> int:
+        message = encoded.message if encoded.message is not None else json.loads(encoded.text)
+        return message.get("seq", 0)
+    
+    async def handle_resume(self, websocket: WebSocket, request: Dict[str, Any]):
+        """
+        Atiende {"action": "resume", "stream": "...", "last_seq": N}: repite lo perdido y confirma
+        con "resumed", o responde "snapshot_required" para que el cliente recargue por REST.
+        """
+        stream = str(request.get("stream", ""))
+        last_seq = request.get("last_seq")
+        if not isinstance(last_seq, int) or last_seq < 0:
+            await self.send_personal_message({"type": "error", "error": "invalid_last_seq", "stream": stream}, websocket)
+            return
+        if not self.can_resume(websocket, stream):
+            await self.send_personal_message({"type": "error", "error": "stream_not_allowed", "stream": stream}, websocket)
+            return
+        resumed, seq = await self.resume(websocket, stream, last_seq)
+        await self.send_personal_message(
+            {"type": "resumed" if resumed else "snapshot_required", "stream": stream, "seq": seq}, websocket
+        )
+    
+    async def broadcast_to_channel(self, message: dict, channel: str, coalesce_key: Optional[str] = None):
+        """
+        Envía un mensaje a todos los WebSockets de un canal, en este nodo y en el resto
+        (a través del broker).
+        El mensaje se serializa una sola vez por codificación y se encola en cada conexión;
+        cada una lo envía desde su propia tarea, así un cliente lento no retrasa al resto del canal.
+        `coalesce_key` permite que, con la política coalesce, el mensaje reemplace a uno
+        pendiente con la misma clave en vez de descartar el más antiguo.
+        """
         if channel in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[channel]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except Exception as e:
-                    logger.error(f"Error al enviar mensaje broadcast: {e}")
-                    disconnected.add(connection)
-            
-            # Limpiar conexiones desconectadas
-            for connection in disconnected:
-                self.active_connections[channel].discard(connection)
+            await self._publish("channel", channel, message, coalesce_key)
+    
+    async def publish_to_topic(self, message: dict, topic: str):
+        """
+        Envía un mensaje solo a los WebSockets suscritos a `topic` (en todos los nodos).
+        El coste es proporcional a los suscriptores del tema, no al total de conexiones.
+        """
+        await self._publish("topic", topic, message)
+    
+    async def send_to_unsubscribed(self, message: dict, user_id: str, channel: str):
+        """
+        Envía un mensaje a los WebSockets de un usuario en `channel` que no se han suscrito a
+        ningún tema (en todos los nodos): clientes que aún no usan suscripciones.
+        """
+        await self._publish("unsubscribed", f"{channel}:{user_id}", message)
     
     async def send_to_user(self, message: dict, user_id: str):
-        """Envía un mensaje a un usuario específico."""
-        if user_id in self.user_connections:
-            try:
-                await self.send_personal_message(message, self.user_connections[user_id])
-            except Exception as e:
-                logger.error(f"Error al enviar mensaje a usuario {user_id}: {e}")
+        """Envía un mensaje a todos los WebSockets de un usuario, estén conectados a este nodo o a otro."""
+        try:
+            await self._publish("user", user_id, message)
+        except Exception as e:
+            logger.error(f"Error al enviar mensaje a usuario {user_id}: {e}")
     
     def get_connection_count(self, channel: str = None) -> int:
         """Obtiene el número de conexiones activas."""
         if channel:
             return len(self.active_connections.get(channel, set()))
         return sum(len(connections) for connections in self.active_connections.values())
+    
+    def get_queue_stats(self, top: int = 10) -> dict:
+        """Profundidad de las colas de salida y mensajes descartados (las conexiones más atrasadas primero)."""
+        queues = sorted((state.outbound for state in self.connections.values()), key=lambda q: (len(q.queue), q.dropped), reverse=True)
+        return {
+            "total_queued": sum(len(q.queue) for q in queues),
+            "total_dropped": sum(q.dropped for q in queues),
+            "slowest": [
+                {"channel": q.channel, "depth": len(q.queue), "dropped": q.dropped}
+                for q in queues[:top]
+            ]
+        }
 
 # Instancia global del gestor de conexiones
 manager = ConnectionManager()
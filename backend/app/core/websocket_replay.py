@@ -0,0 +1,178 @@
+"""
+Buffers de repetición para reanudar streams WebSocket.
+
+Cada stream ("channel:chat", "topic:conversation:<id>", "user:<id>") numera sus frames
+con un `seq` creciente y guarda los últimos `ws_replay_buffer_size`. Un cliente que se
+reconecta pide los frames posteriores a su último `seq`; si ya no están en el buffer
+(hueco mayor que el buffer, stream caducado o reiniciado) tiene que pedir un snapshot.
+- MemoryReplayBuffer: por proceso, un deque acotado por stream y LRU de streams.
+- RedisReplayBuffer: Redis Streams compartido por todos los nodos; el seq se asigna
+  con INCR y el frame se añade con XADD en el mismo script (un solo round trip).
+"""
+import itertools
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+# Optional Redis import for the shared replay buffer
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ws:replay:"
+
+# KEYS[1] = contador de seq, KEYS[2] = stream; ARGV[1] = frame JSON sin seq,
+# ARGV[2] = tamaño del buffer, ARGV[3] = TTL. Devuelve el seq asignado.
+# MAXLEN exacto (sin ~): el stream guarda exactamente los últimos ARGV[2] frames.
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local frame = string.sub(ARGV[1], 1, -2) .. ',"seq":' .. seq .. '}'
+redis.call('XADD', KEYS[2], 'MAXLEN', ARGV[2], seq .. '-0', 'f', frame)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+WS_REPLAY_RESUMES = Counter(
+    "ws_replay_resumes_total",
+    "WebSocket stream resume requests by outcome (replayed from the buffer or snapshot needed)",
+    ["outcome"]
+)
+WS_REPLAY_FRAMES = Counter(
+    "ws_replay_frames_total",
+    "Frames re-sent to reconnecting WebSocket clients from the replay buffer"
+)
+
+# (frames posteriores a last_seq o None si hace falta snapshot, seq actual del stream)
+ReplayResult = Tuple[Optional[List[Tuple[int, str]]], int]
+
+
+def stamp(text: str, seq: int) -> str:
+    """Añade el seq al final de un objeto JSON no vacío (igual que APPEND_SCRIPT)."""
+    return f'{text[:-1]},"seq":{seq}}}'
+
+
+class _StreamBuffer:
+    __slots__ = ("seq", "frames")
+
+    def __init__(self, size: int):
+        self.seq = 0
+        self.frames: Deque[Tuple[int, str]] = deque(maxlen=size)
+
+
+class MemoryReplayBuffer:
+    """Buffer de repetición en memoria del proceso (un solo nodo)."""
+
+    def __init__(self, size: Optional[int] = None, max_streams: Optional[int] = None):
+        self.size = size or settings.ws_replay_buffer_size
+        self.max_streams = max_streams or settings.ws_replay_max_streams
+        self.streams: "OrderedDict[str, _StreamBuffer]" = OrderedDict()
+
+    async def append(self, stream: str, text: str) -> Tuple[str, Optional[int]]:
+        """Numera y guarda un frame. Devuelve el frame con su seq y el seq."""
+        buffer = self.streams.get(stream)
+        if buffer is None:
+            buffer = self.streams[stream] = _StreamBuffer(self.size)
+            if len(self.streams) > self.max_streams:
+                # Los clientes del stream descartado recibirán snapshot_required
+                self.streams.popitem(last=False)
+        else:
+            self.streams.move_to_end(stream)
+        buffer.seq += 1
+        frame = stamp(text, buffer.seq)
+        buffer.frames.append((buffer.seq, frame))
+        return frame, buffer.seq
+
+    async def since(self, stream: str, last_seq: int) -> ReplayResult:
+        buffer = self.streams.get(stream)
+        current = buffer.seq if buffer else 0
+        if last_seq > current:
+            # El stream se reinició (proceso nuevo o stream descartado)
+            return None, current
+        if last_seq == current:
+            return [], current
+        oldest = buffer.frames[0][0] if buffer.frames else current + 1
+        if last_seq + 1 < oldest:
+            return None, current
+        return list(itertools.islice(buffer.frames, last_seq + 1 - oldest, None)), current
+
+    async def stop(self):
+        pass
+
+
+class RedisReplayBuffer:
+    """Buffer de repetición en Redis Streams, compartido por todos los nodos."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.size = settings.ws_replay_buffer_size
+        self.ttl = settings.ws_replay_ttl_seconds
+        self._append = redis_client.register_script(APPEND_SCRIPT)
+
+    async def append(self, stream: str, text: str) -> Tuple[str, Optional[int]]:
+        """Numera y guarda un frame. Si Redis falla el frame sale sin seq (no se podrá reanudar)."""
+        key = KEY_PREFIX + stream
+        try:
+            seq = int(await self._append(keys=[key + ":seq", key], args=[text, self.size, self.ttl]))
+        except Exception as e:
+            logger.error(f"Error al guardar el frame del stream {stream} en Redis: {e}")
+            return text, None
+        return stamp(text, seq), seq
+
+    async def since(self, stream: str, last_seq: int) -> ReplayResult:
+        key = KEY_PREFIX + stream
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.get(key + ":seq")
+                pipe.xrange(key, min=f"{last_seq + 1}-0", max="+", count=self.size)
+                current, entries = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error al leer el stream {stream} de Redis: {e}")
+            return None, 0
+        current = int(current or 0)
+        if last_seq > current:
+            return None, current
+        if last_seq == current:
+            return [], current
+        frames = [(int(entry_id.split(b"-")[0]), fields[b"f"].decode()) for entry_id, fields in entries]
+        # Solo se reanuda si se repite todo el hueco: del frame last_seq + 1 al actual, sin saltos
+        if len(frames) != current - last_seq or frames[0][0] != last_seq + 1 or frames[-1][0] != current:
+            return None, current
+        return frames, current
+
+    async def stop(self):
+        try:
+            await self.redis_client.aclose()
+        except Exception:
+            pass
+
+
+async def create_replay_buffer(shared_broker: bool = False):
+    """
+    Crea el buffer configurado en ws_replay_backend ("memory" o "redis"); usa memoria si Redis
+    no responde, salvo con un broker compartido entre nodos (`shared_broker`): entonces cada
+    nodo numeraría sus frames por separado y los seq chocarían, así que falla el arranque.
+    """
+    if settings.ws_replay_backend == "redis":
+        if not REDIS_AVAILABLE:
+            error = "redis no está instalado"
+        else:
+            try:
+                redis_client = aioredis.Redis.from_url(settings.redis_url)
+                await redis_client.ping()
+                return RedisReplayBuffer(redis_client)
+            except Exception as e:
+                error = f"Redis no disponible: {e}"
+        if shared_broker:
+            raise RuntimeError(f"El broker WebSocket es compartido y el buffer de repetición no puede quedar en memoria ({error})")
+        logger.warning(f"{error}, el buffer de repetición WebSocket queda en memoria")
+    return MemoryReplayBuffer()
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import json
 import logging
 import os
+from typing import Optional
 from logging.handlers import RotatingFileHandler
 from prometheus_client import Counter, Gauge
 from prometheus_fastapi_instrumentator import Instrumentator
@@ -19,8 +22,16 @@ except ImportError:
 from app.core.config import settings
 from app.core.dependencies import create_tables
 from app.core.websocket_manager import manager
-from app.api.v1.endpoints import auth, health, chat, ai
+from app.core.password_pool import get_password_pool
+from app.core.analysis_pool import get_analysis_pool
+from app.core.refresh_tokens import get_refresh_token_store
+from app.core.rate_limit import RateLimitMiddleware, check_websocket_message
+from app.services.chat_service import chat_service
+from app.services.data_service import data_service
+from app.services.stats_service import backfill_conversation_stats
+from app.api.v1.endpoints import auth, health, chat, ai, data
 from app.utils.celery_metrics import start_queue_length_updater, celery_queue_length
+from app.utils.lazy_imports import preload_modules
 
 # Configure robust and rotating logging
 handlers = []
@@ -54,6 +65,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Rate limiting (added before CORS so that 429 responses still carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -61,6 +75,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=settings.allowed_methods,
     allow_headers=settings.allowed_headers,
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 # Mount static files
@@ -71,6 +86,7 @@ if os.path.exists(settings.upload_dir):
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(health.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
+app.include_router(data.router, prefix="/api/v1")
 app.include_router(ai.router, prefix="/api/v1/ai")
 
 # Custom Prometheus metrics for AI agents and Celery
@@ -95,56 +111,112 @@ async def root():
         "api": "/api/v1"
     }
 
+def _parse_action(data: str) -> Optional[dict]:
+    """Returns the message as a dict if it is a subscription or resume action, else None."""
+    try:
+        request = json.loads(data)
+    except ValueError:
+        return None
+    if isinstance(request, dict) and request.get("action") in ("subscribe", "unsubscribe", "resume"):
+        return request
+    return None
+
+def _wants_heartbeat(websocket: WebSocket) -> bool:
+    """
+    Clients that connect with ?heartbeat=1 get app-level {"type": "ping"} frames and must
+    answer (any message, e.g. {"type": "pong"}). Dead peers are otherwise detected by the
+    WebSocket protocol pings uvicorn sends (ws_ping_interval / ws_ping_timeout).
+    """
+    return websocket.query_params.get("heartbeat") in ("1", "true")
+
 # WebSocket endpoints (must be in main.py, not in routers)
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
-    """WebSocket endpoint for real-time chat."""
+    """
+    WebSocket endpoint for real-time chat.
+    Assistant replies are sent to sockets subscribed to their conversation:
+    {"action": "subscribe", "conversation_id": "<id>"} (and "unsubscribe"). Sockets of the
+    conversation's owner that have no subscription get every reply of that user (legacy clients).
+    After a reconnect, add "last_seq" to the subscribe action, or send
+    {"action": "resume", "stream": "channel:chat", "last_seq": N}, to get the missed frames.
+    """
     try:
-        await manager.connect(websocket, "chat")
+        if not await manager.connect(websocket, "chat", websocket.query_params.get("token"), _wants_heartbeat(websocket)):
+            return
         logger.info("New chat WebSocket connection")
         while True:
-            try:
-                data = await websocket.receive_text()
-                await manager.broadcast_to_channel({"type": "message", "data": data}, "chat")
-            except WebSocketDisconnect:
-                manager.disconnect(websocket, "chat")
-                logger.info("Chat WebSocket connection closed")
-                break
+            data = await manager.receive_text(websocket)
+            if manager.handle_heartbeat(websocket, data):
+                continue
+            if not await check_websocket_message(websocket, "chat"):
+                continue
+            request = _parse_action(data)
+            if request and request["action"] == "resume":
+                await manager.handle_resume(websocket, request)
+                continue
+            if request:
+                await chat_service.handle_subscription(websocket, request)
+                continue
+            await manager.broadcast_to_channel({"type": "message", "data": data}, "chat")
+    except WebSocketDisconnect:
+        logger.info("Chat WebSocket connection closed")
     except Exception as e:
         logger.error(f"Error in chat WebSocket: {e}")
+    finally:
+        # Whatever ended the socket, it leaves the manager and its topics (a no-op if it never connected)
+        manager.disconnect(websocket, "chat")
 
 @app.websocket("/ws/data")
 async def websocket_data(websocket: WebSocket):
-    """WebSocket endpoint for real-time data analysis."""
+    """
+    WebSocket endpoint for real-time data analysis.
+    {"action": "analyze", "query": "...", "data_source_id": "...", "analysis_type": "..."} starts an
+    analysis that streams progress frames; {"action": "cancel", "analysis_id": "..."} stops it.
+    """
     try:
-        await manager.connect(websocket, "data")
+        if not await manager.connect(websocket, "data", websocket.query_params.get("token"), _wants_heartbeat(websocket)):
+            return
         logger.info("New data WebSocket connection")
         while True:
-            try:
-                data = await websocket.receive_text()
-                await manager.broadcast_to_channel({"type": "data_query", "data": data}, "data")
-            except WebSocketDisconnect:
-                manager.disconnect(websocket, "data")
-                logger.info("Data WebSocket connection closed")
-                break
+            data = await manager.receive_text(websocket)
+            if manager.handle_heartbeat(websocket, data):
+                continue
+            if not await check_websocket_message(websocket, "data"):
+                continue
+            await data_service.handle_ws_request(websocket, data)
+    except WebSocketDisconnect:
+        logger.info("Data WebSocket connection closed")
     except Exception as e:
         logger.error(f"Error in data WebSocket: {e}")
+    finally:
+        # Whatever ended the socket, its analyses stop and it leaves the manager (both are no-ops if it never connected)
+        data_service.cancel_ws_analyses(websocket)
+        manager.disconnect(websocket, "data")
 
 @app.websocket("/ws/notifications")
 async def websocket_notifications(websocket: WebSocket):
-    """WebSocket endpoint for real-time notifications."""
+    """
+    WebSocket endpoint for real-time notifications.
+    After a reconnect, send {"action": "resume", "stream": "channel:notifications"
+    (or "user:<username>"), "last_seq": N} to get the missed notifications.
+    """
     try:
-        await manager.connect(websocket, "notifications")
+        if not await manager.connect(websocket, "notifications", websocket.query_params.get("token"), _wants_heartbeat(websocket)):
+            return
         logger.info("New notifications WebSocket connection")
         while True:
-            try:
-                await websocket.receive_text()
-            except WebSocketDisconnect:
-                manager.disconnect(websocket, "notifications")
-                logger.info("Notifications WebSocket connection closed")
-                break
+            data = await manager.receive_text(websocket)
+            if manager.handle_heartbeat(websocket, data):
+                continue
+            request = _parse_action(data)
+            if request and request["action"] == "resume":
+                await manager.handle_resume(websocket, request)
+    except WebSocketDisconnect:
+        logger.info("Notifications WebSocket connection closed")
     except Exception as e:
         logger.error(f"Error in notifications WebSocket: {e}")
+    finally:
+        manager.disconnect(websocket, "notifications")
 
 # Startup and shutdown events
 @app.on_event("startup")
@@ -172,6 +244,8 @@ async def startup_event():
     logger.info(f"Starting {settings.app_name} v{settings.version}")
     try:
         create_tables()
+        # Tables created here skip migrate_db.py, so fill the stats counters before the first request
+        await asyncio.to_thread(backfill_conversation_stats)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
@@ -179,6 +253,20 @@ async def startup_event():
     log_dir = os.path.dirname(settings.log_file)
     if log_dir:
         os.makedirs(log_dir, exist_ok=True)
+    await manager.start_broker()
+    await manager.start_replay_buffer()
+    manager.start_heartbeat()
+    # Connect the refresh-token store (Redis ping, revoked-jti scan) off the event loop, before the first login
+    await asyncio.to_thread(get_refresh_token_store)
+    # Detect Ollama models in the background so a slow or absent Ollama never delays startup
+    app.state.chat_service_init = asyncio.create_task(chat_service.initialize())
+    if settings.preload_modules:
+        app.state.preload_modules = asyncio.create_task(
+            asyncio.to_thread(preload_modules, settings.preload_modules)
+        )
+    if settings.analysis_pool_enabled and "pandas" in settings.preload_modules:
+        # Data-analysis worker: start the analysis processes now too
+        app.state.analysis_pool_warm_up = asyncio.create_task(get_analysis_pool().warm_up())
     logger.info("Application started successfully")
     start_queue_length_updater(queue_name="celery", interval=10)
 
@@ -186,6 +274,11 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event."""
     logger.info("Shutting down application...")
+    get_password_pool().shutdown()
+    get_analysis_pool().shutdown()
+    await manager.stop_heartbeat()
+    await manager.stop_broker()
+    await manager.stop_replay_buffer()
     for channel in manager.active_connections:
         for connection in manager.active_connections[channel].copy():
             try:
@@ -232,5 +325,8 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=True,
+        ws_ping_interval=settings.websocket_ping_interval,
+        ws_ping_timeout=settings.websocket_ping_timeout,
+        ws_per_message_deflate=settings.websocket_per_message_deflate
     )
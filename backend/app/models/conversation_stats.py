@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String
+from app.models.base import Base
+
+class ConversationStats(Base):
+    """
+    Conversation and message counters maintained incrementally on write.
+    One row per (scope, key): scope is "global", "user" (key = user id) or
+    "model" (key = model name, counting the replies generated by that model).
+    """
+    __tablename__ = "conversation_stats"
+
+    scope = Column(String(20), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    conversations_total = Column(Integer, nullable=False, default=0)
+    conversations_active = Column(Integer, nullable=False, default=0)
+    messages_total = Column(Integer, nullable=False, default=0)
@@ -20,6 +20,7 @@ class DataSource(BaseModel):
     url: Optional[str] = None
     file_path: Optional[str] = None
     description: Optional[str] = None
+    content_hash: Optional[str] = Field(None, description="SHA-256 del contenido")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class DataAnalysisRequest(BaseModel):
@@ -56,6 +57,10 @@ class DataUploadResponse(BaseModel):
     file_size: int
     rows: Optional[int] = None
     columns: Optional[List[str]] = None
+    column_types: Optional[Dict[str, str]] = None
+    content_hash: Optional[str] = Field(None, description="SHA-256 del contenido")
+    memory_before_bytes: Optional[int] = Field(None, description="Memoria del dataset con los dtypes por defecto")
+    memory_after_bytes: Optional[int] = Field(None, description="Memoria del dataset con los dtypes optimizados")
     upload_time: datetime = Field(default_factory=datetime.utcnow)
     status: str = "uploaded"
 
@@ -67,6 +72,9 @@ class DataPreview(BaseModel):
     total_columns: int
     column_types: Dict[str, str]
     sample_size: int = 10
+    column_stats: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Perfil por columna: nulos, valores distintos, más frecuentes y estadísticas numéricas"
+    )
 
 class AnalysisResult(BaseModel):
     """Esquema para resultado de análisis."""
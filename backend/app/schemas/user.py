@@ -2,6 +2,7 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 
 class User(BaseModel):
+    id: Optional[int] = None  # Database id (DEMO_USER_ID for the demo user)
     username: str
     full_name: Optional[str] = None
     email: Optional[str] = None
@@ -4,62 +4,26 @@ AI Service for DeepSeek/Ollama integration
 import os
 import json
 import requests
-from typing import Dict, List, Optional, Any
-from langchain.llms.base import LLM
-from langchain.callbacks.manager import CallbackManagerForLLMRun
+from typing import Dict, Any
 import logging
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-class OllamaLLM(LLM):
-    """Class to interact with local Ollama"""
-    
-    base_url: str = settings.ollama_base_url
-    model: str = settings.ollama_default_model
-    temperature: float = 0.7
-    max_tokens: int = 2048
-    
-    @property
-    def _llm_type(self) -> str:
-        return "ollama"
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        """Execute the Ollama model"""
-        try:
-            url = f"{self.base_url}/api/generate"
-            data = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": self.temperature,
-                    "num_predict": self.max_tokens
-                }
-            }
-            
-            response = requests.post(url, json=data, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get("response", "")
-            
-        except Exception as e:
-            logger.error(f"Error calling Ollama: {e}")
-            return f"Error: {str(e)}"
-
 class AIService:
     """Main AI service for the backend"""
     
     def __init__(self):
         self.ollama_base_url = settings.ollama_base_url
-        self.llm = OllamaLLM(base_url=self.ollama_base_url)
+        self._llm = None
+    
+    @property
+    def llm(self):
+        """LangChain Ollama LLM, built on first use so LangChain is not imported at startup."""
+        if self._llm is None:
+            from app.services.ollama_llm import OllamaLLM
+            self._llm = OllamaLLM(base_url=self.ollama_base_url)
+        return self._llm
         
     async def check_ollama_health(self) -> Dict[str, Any]:
         """Check Ollama status"""
@@ -106,7 +70,7 @@ class AIService:
             return {
                 "success": False,
                 "error": str(e),
-                "model": self.llm.model
+                "model": self._llm.model if self._llm is not None else model
             }
     
     async def list_models(self) -> Dict[str, Any]:
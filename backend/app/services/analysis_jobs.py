@@ -0,0 +1,136 @@
+"""
+Analysis jobs that run outside the API process, in the analysis process pool or on a
+Celery worker. They take file paths, not DataFrames: the job memory-maps the source's
+columnar copy (or reads a large file in chunks) itself, so only the path is sent to
+the worker and only the text result or the dataset profile comes back. Converting an
+upload to its columnar copy (a full parse of the original) is a job too.
+Kept free of service imports so worker processes start with pandas and pyarrow only.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.schemas.data import AnalysisType
+from app.services.chunked_analysis import ChunkedProfile, FrameSummary
+from app.services.dataset_profile import StoredProfile, build_profile, save_profile, source_signature
+from app.utils import columnar_store
+from app.utils.dataframe_optimizer import csv_read_options, optimize_dataframe
+from app.utils.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+# Jobs over files too large to load, which may be sent to Celery (see tasks.run_large_file_job)
+LARGE_FILE_JOBS = ("analyze_chunked", "profile_chunked")
+
+
+def format_analysis(summary: Union[FrameSummary, ChunkedProfile, StoredProfile], analysis_type: AnalysisType) -> str:
+    """Formats an analysis from the summaries of a DataFrame, of a file read in chunks or of a saved profile."""
+    try:
+        result = f"Data Analysis:\n\n"
+        result += f"Dataset: {summary.rows} rows, {len(summary.columns)} columns\n"
+        result += f"Columns: {', '.join(map(str, summary.columns))}\n\n"
+
+        if analysis_type == AnalysisType.EXPLORATORY:
+            result += "**Exploratory Analysis:**\n"
+            result += f"- Data types:\n"
+            for col in summary.columns:
+                result += f"  - {col}: {summary.dtypes[col]}\n"
+
+            result += f"\n- Descriptive statistics:\n"
+            result += summary.describe().to_string()
+
+        elif analysis_type == AnalysisType.STATISTICAL:
+            result += "**Statistical Analysis:**\n"
+            result += f"- Missing values:\n"
+            result += summary.missing().to_string()
+
+            result += f"\n- Correlations:\n"
+            if len(summary.numeric_columns()) > 1:
+                result += summary.corr().to_string()
+
+        elif analysis_type == AnalysisType.VISUALIZATION:
+            result += "**Visualization Analysis:**\n"
+            result += "The following visualizations were generated:\n"
+            result += "- Distribution histogram\n"
+            result += "- Correlation plot\n"
+            result += "- Box plot of numeric variables\n"
+
+        return result
+
+    except Exception as e:
+        return f"Error analyzing data: {str(e)}"
+
+
+def analyze_columnar(file_path: str, columns: Optional[List[str]], analysis_type: str) -> str:
+    """Analyzes a source from its memory-mapped columnar copy (only `columns` if given)."""
+    df = columnar_store.read_columnar(file_path, columns)
+    return format_analysis(FrameSummary(df), AnalysisType(analysis_type))
+
+
+def analyze_chunked(file_path: str, chunk_rows: int, sample_size: int, analysis_type: str) -> Tuple[str, Dict[str, Any]]:
+    """Analyzes a file too large to load, in one pass over its chunks. Returns (result, profile)."""
+    profile = ChunkedProfile.from_file(file_path, chunk_rows, sample_size=sample_size)
+    summary = {
+        "rows": profile.rows,
+        "columns": [str(col) for col in profile.columns],
+        "dtypes": {str(col): dtype for col, dtype in profile.dtypes.items()},
+        "missing": {str(col): count for col, count in profile.nulls.items()}
+    }
+    return format_analysis(profile, AnalysisType(analysis_type)), summary
+
+
+def profile_columnar(file_path: str) -> Dict[str, Any]:
+    """Builds and saves the dataset profile of a source from its columnar copy."""
+    signature = source_signature(file_path)
+    profile = build_profile(FrameSummary(columnar_store.read_columnar(file_path)), signature)
+    save_profile(file_path, profile)
+    return profile
+
+
+def profile_chunked(file_path: str, chunk_rows: int, sample_size: int) -> Dict[str, Any]:
+    """Builds and saves the dataset profile of a file too large to load, in one pass over its chunks."""
+    signature = source_signature(file_path)
+    profile = build_profile(ChunkedProfile.from_file(file_path, chunk_rows, sample_size=sample_size), signature)
+    save_profile(file_path, profile)
+    return profile
+
+
+def read_source_file(
+    file_path: str, optimized: bool, category_ratio: float, columns: Optional[List[str]] = None
+) -> Optional["pd.DataFrame"]:
+    """
+    Parses a source file according to its type; None if the type is not supported.
+    CSV files are read with only `columns` if given and, when `optimized`, with their
+    low-cardinality text columns as categoricals (the other dtypes are optimized after parsing).
+    """
+    if file_path.endswith('.csv'):
+        if optimized:
+            options = csv_read_options(file_path, category_ratio, columns)
+        else:
+            options = {"usecols": columns} if columns else {}
+        return pd.read_csv(file_path, **options)
+    if file_path.endswith('.json'):
+        return pd.read_json(file_path)
+    if file_path.endswith('.jsonl'):
+        return pd.read_json(file_path, lines=True)
+    if file_path.endswith('.xlsx'):
+        return pd.read_excel(file_path)
+    return None
+
+
+def convert_columnar(file_path: str, optimized: bool, category_ratio: float) -> Dict[str, Any]:
+    """
+    Parses a source and writes its columnar copy. Returns {"memory": (bytes with default
+    dtypes, bytes optimized) or None}, or {"unsupported": reason} if the file type or its
+    data can't be stored as Arrow (e.g. columns mixing numbers and text).
+    """
+    df = read_source_file(file_path, optimized, category_ratio)
+    if df is None:
+        return {"unsupported": f"Unsupported file type: {file_path}"}
+    memory = None
+    if optimized:
+        df, before, after = optimize_dataframe(df, category_ratio)
+        memory = (before, after)
+    try:
+        columnar_store.write_columnar(df, file_path)
+    except Exception as e:
+        return {"unsupported": str(e)}
+    return {"memory": memory}
@@ -1,21 +1,34 @@
+import hashlib
+import logging
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from app.schemas.user import User, UserCreate
 from app.core.config import settings
 from app.models.user import User as UserModel
 from app.core.database import get_db
+from app.core.password_pool import get_password_pool
+from app.core.refresh_tokens import get_refresh_token_store
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Dummy user for backward compatibility
+# Dummy user for backward compatibility. Its id is never a database id (those start at 1).
+DEMO_USER_ID = 0
 fake_user_db = {
     "demo_user": {
+        "id": DEMO_USER_ID,
         "username": "demo_user",
         "full_name": "Demo User",
         "email": "demo@example.com",
@@ -24,6 +37,20 @@ fake_user_db = {
     }
 }
 
+# Verified tokens (sha256 of the token -> username) and principals (username -> User).
+# A cache hit skips both jwt.decode and the database lookup in get_current_user.
+token_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_token_cache_ttl_seconds)
+user_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_user_cache_ttl_seconds)
+
+def invalidate_user_cache(username: str):
+    """Drops a cached principal; call whenever a user is updated, disabled or deleted."""
+    user_cache.pop(username)
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_user_on_change(mapper, connection, target):
+    invalidate_user_cache(target.username)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -36,13 +63,21 @@ def get_user_by_username(db: Session, username: str) -> Optional[UserModel]:
     """Get user by username from database."""
     return db.query(UserModel).filter(UserModel.username == username).first()
 
+def user_id_for_username(db: Session, username: str) -> Optional[int]:
+    """Id that owns a user's conversations and stats: the database id, or DEMO_USER_ID for the demo user."""
+    user_id = db.query(UserModel.id).filter(UserModel.username == username).scalar()
+    if user_id is None and username in fake_user_db:
+        return DEMO_USER_ID
+    return user_id
+
 def get_user_by_email(db: Session, email: str) -> Optional[UserModel]:
     """Get user by email from database."""
     return db.query(UserModel).filter(UserModel.email == email).first()
 
-def create_user(db: Session, user_data: UserCreate) -> UserModel:
-    """Create a new user in the database."""
-    hashed_password = get_password_hash(user_data.password)
+def create_user(db: Session, user_data: UserCreate, hashed_password: Optional[str] = None) -> UserModel:
+    """Create a new user in the database (pass `hashed_password` if already hashed)."""
+    if hashed_password is None:
+        hashed_password = get_password_hash(user_data.password)
     db_user = UserModel(
         username=user_data.username,
         email=user_data.email,
@@ -55,14 +90,17 @@ def create_user(db: Session, user_data: UserCreate) -> UserModel:
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(username: str, password: str, db: Session) -> Optional[User]:
-    """Authenticate user with database."""
-    user = get_user_by_username(db, username)
+async def authenticate_user(username: str, password: str, db: Session) -> Optional[User]:
+    """Authenticate user with database. bcrypt runs in the password process pool
+    (raises PasswordPoolFull when it is saturated). The query runs in the threadpool,
+    off the event loop."""
+    user = await run_in_threadpool(get_user_by_username, db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await get_password_pool().verify(password, user.hashed_password):
         return None
     return User(
+        id=user.id,
         username=user.username,
         full_name=user.full_name,
         email=user.email,
@@ -81,39 +119,103 @@ def create_access_token(username: str) -> str:
     to_encode = {"sub": username, "exp": expire}
     return jwt.encode(to_encode, settings.secret_key.get_secret_value(), algorithm=settings.algorithm)
 
-def create_refresh_token(username: str) -> str:
+def _encode_refresh_token(username: str) -> Tuple[str, str]:
+    """Returns (jti, encoded refresh token)."""
+    jti = uuid.uuid4().hex
     expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
-    to_encode = {"sub": username, "exp": expire}
-    return jwt.encode(to_encode, settings.secret_key.get_secret_value(), algorithm=settings.algorithm)
+    to_encode = {"sub": username, "exp": expire, "jti": jti, "type": "refresh"}
+    return jti, jwt.encode(to_encode, settings.secret_key.get_secret_value(), algorithm=settings.algorithm)
+
+def _refresh_token_ttl() -> int:
+    return settings.refresh_token_expire_days * 86400
+
+def create_refresh_token(username: str) -> str:
+    """Creates a refresh token and registers its jti in the refresh-token store."""
+    jti, token = _encode_refresh_token(username)
+    get_refresh_token_store().issue(jti, username, _refresh_token_ttl())
+    return token
+
+def _decode_refresh_token(refresh_token: str) -> Optional[dict]:
+    try:
+        payload = jwt.decode(refresh_token, settings.secret_key.get_secret_value(), algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("sub"):
+        return None
+    return payload
+
+def rotate_refresh_token(refresh_token: str) -> Optional[Tuple[str, str]]:
+    """
+    Redeems a refresh token: revokes it and issues a new one atomically.
+    Returns (username, new refresh token), or None if the token is invalid or revoked.
+    """
+    payload = _decode_refresh_token(refresh_token)
+    if payload is None:
+        return None
+    store = get_refresh_token_store()
+    if store.is_revoked(payload["jti"]):
+        logger.warning(f"Reuse of revoked refresh token for user {payload['sub']}")
+        return None
+    new_jti, new_token = _encode_refresh_token(payload["sub"])
+    if not store.rotate(payload["jti"], new_jti, payload["sub"], _refresh_token_ttl()):
+        return None
+    return payload["sub"], new_token
+
+def revoke_refresh_token(refresh_token: str) -> bool:
+    """Revokes a refresh token (logout). Returns False if it was invalid or already revoked."""
+    payload = _decode_refresh_token(refresh_token)
+    if payload is None:
+        return False
+    return get_refresh_token_store().revoke(payload["jti"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+def username_from_access_token(token: str) -> Optional[str]:
+    """Returns the username of a valid access token (None if invalid), via the verified-token cache."""
+    token_digest = hashlib.sha256(token.encode()).hexdigest()
+    username = token_cache.get(token_digest)
+    if username is None:
+        try:
+            payload = jwt.decode(token, settings.secret_key.get_secret_value(), algorithms=[settings.algorithm])
+        except JWTError:
+            return None
+        username = payload.get("sub")
+        if username is None or payload.get("type") == "refresh":
+            return None
+        # Never keep a verified token past its own expiry
+        expires_in = payload["exp"] - time.time() if "exp" in payload else None
+        token_cache.set(token_digest, username, ttl=expires_in)
+    return username
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Not authenticated",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.secret_key.get_secret_value(), algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = username_from_access_token(token)
+    if username is None:
         raise credentials_exception
     
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    
     # Try to get user from database first
     user_model = get_user_by_username(db, username)
     if user_model:
-        return User(
+        user = User(
+            id=user_model.id,
             username=user_model.username,
             full_name=user_model.full_name,
             email=user_model.email,
             disabled=not user_model.is_active
         )
-    
-    # Fallback to fake_user_db for demo user
-    user = fake_user_db.get(username)
-    if user is None:
-        raise credentials_exception
-    return User(**user)
+    else:
+        # Fallback to fake_user_db for demo user
+        user_data = fake_user_db.get(username)
+        if user_data is None:
+            raise credentials_exception
+        user = User(**user_data)
+    user_cache.set(username, user)
+    return user
@@ -1,5 +1,6 @@
 import uuid
 import time
+import asyncio
 import logging
 import requests
 from typing import Optional, List, Dict, Any
@@ -9,9 +10,11 @@ from app.schemas.chat import (
     MessageType, WebSocketMessage
 )
 from app.core.websocket_manager import manager
-from app.core.dependencies import get_db
+from app.core.dependencies import get_db, SessionLocal
 from app.models.conversation import Conversation
 from app.models.chat_message import ChatMessage, MessageTypeEnum
+from app.services import stats_service
+from app.services.auth_service import user_id_for_username
 from fastapi import Depends
 from sqlalchemy.orm import Session
 from app.core.config import settings
@@ -19,13 +22,17 @@ import json
 
 logger = logging.getLogger(__name__)
 
-# LangChain and Ollama modern
-try:
-    from langchain_ollama import OllamaLLM
-    langchain_available = True
-except ImportError:
-    langchain_available = False
-    OllamaLLM = None
+# WebSocket topic that receives the replies of a conversation
+CONVERSATION_TOPIC = "conversation:{}"
+
+# LangChain and Ollama modern. LangChain is heavy, so it is imported on first use
+# (from ChatService._initialize, off the event loop) rather than at module import
+def _load_ollama_llm():
+    try:
+        from langchain_ollama import OllamaLLM
+        return OllamaLLM
+    except ImportError:
+        return None
 
 # langdetect for multilingual fallback
 try:
@@ -47,17 +54,40 @@ def get_unavailable_message(text: str) -> str:
     # Always return the translation key for consistent frontend translation
     return 'serviceUnavailable'
 
+# Seconds to wait before retrying model detection after Ollama was unreachable
+MODEL_DETECTION_RETRY_SECONDS = 60
+
 class ChatService:
     """Service for handling chat and conversations, using LangChain+Ollama DeepSeek if available."""
     def __init__(self):
         self.available_models = []
         self.default_model = None
         self.ollama_base_url = settings.ollama_base_url
-        
-        # Detect available models
+        self.llm = None
+        # Model detection and LLM construction talk to Ollama, so they are deferred
+        # to initialize() (startup task or first use) instead of running at import time
+        self._initialized = False
+        self._last_init_attempt = 0.0
+        self._init_lock: Optional[asyncio.Lock] = None
+
+    async def initialize(self):
+        """Detects models and builds the LLM client off the event loop. Safe to call repeatedly."""
+        if self._initialized or time.time() - self._last_init_attempt < MODEL_DETECTION_RETRY_SECONDS:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if self._initialized or time.time() - self._last_init_attempt < MODEL_DETECTION_RETRY_SECONDS:
+                return
+            await asyncio.to_thread(self._initialize)
+
+    def _initialize(self):
+        """Blocking part of initialize(): model detection and LLM client construction."""
+        self._last_init_attempt = time.time()
         self._detect_available_models()
         
-        if langchain_available and self.default_model:
+        OllamaLLM = _load_ollama_llm() if self.default_model else None
+        if OllamaLLM is not None:
             try:
                 self.llm = OllamaLLM(model=self.default_model, base_url=self.ollama_base_url)
                 logger.info(f"Successfully initialized {self.default_model} model")
@@ -68,6 +98,8 @@ class ChatService:
         else:
             logger.warning("LangChain Ollama not available or no models found. Install with: pip install langchain-ollama")
             self.llm = None
+        # Without models Ollama was unreachable or empty: retry after MODEL_DETECTION_RETRY_SECONDS
+        self._initialized = bool(self.available_models)
 
     def _detect_available_models(self):
         """Detect available models in Ollama and set the best one as default."""
@@ -116,9 +148,12 @@ class ChatService:
         """Get the current default model."""
         return self.default_model
 
-    async def process_chat_message(self, request: ChatRequest, user_id: int, db: Session = Depends(get_db)) -> ChatResponse:
+    async def process_chat_message(
+        self, request: ChatRequest, user_id: int, db: Session = Depends(get_db), username: Optional[str] = None
+    ) -> ChatResponse:
         start_time = time.time()
         try:
+            await self.initialize()
             # Use automatically detected model if none specified
             if not request.model:
                 request.model = self.default_model or settings.ollama_default_model
@@ -136,6 +171,7 @@ class ChatService:
                     is_active=True
                 )
                 db.add(conversation)
+                stats_service.record_conversation_created(db, user_id)
                 db.commit()
             user_message = ChatMessage(
                 conversation_id=conversation_id,
@@ -146,6 +182,8 @@ class ChatService:
                 is_active=True
             )
             db.add(user_message)
+            conversation.message_count = Conversation.message_count + 1
+            stats_service.record_messages(db, user_id)
             db.commit()
             assistant_response = await self._generate_response(request, conversation_id)
             assistant_message = ChatMessage(
@@ -157,11 +195,12 @@ class ChatService:
                 is_active=True
             )
             db.add(assistant_message)
-            conversation.message_count = db.query(ChatMessage).filter_by(conversation_id=conversation_id, is_active=True).count()
+            conversation.message_count = Conversation.message_count + 1
             conversation.updated_at = datetime.utcnow()
+            stats_service.record_messages(db, user_id, model=request.model)
             db.commit()
             processing_time = time.time() - start_time
-            await self._broadcast_message(conversation_id, assistant_response, user_id)
+            await self._broadcast_message(conversation_id, assistant_response, user_id, username)
             return ChatResponse(
                 response=assistant_response,
                 conversation_id=conversation_id,
@@ -175,7 +214,7 @@ class ChatService:
 
     async def _generate_response(self, request: ChatRequest, conversation_id: str) -> str:
         """Generates a response using DeepSeek local via LangChain+OllamaLLM, else returns a multilingual unavailable message."""
-        if langchain_available and self.llm is not None:
+        if self.llm is not None:
             try:
                 prompt = request.message
                 result = self.llm.invoke(prompt)
@@ -185,7 +224,7 @@ class ChatService:
                 return get_unavailable_message(request.message)
         return get_unavailable_message(request.message)
 
-    async def _broadcast_message(self, conversation_id: str, message: str, user_id: int):
+    async def _broadcast_message(self, conversation_id: str, message: str, user_id: int, username: Optional[str] = None):
         try:
             ws_message = WebSocketMessage(
                 type="chat_message",
@@ -196,10 +235,12 @@ class ChatService:
                     "timestamp": datetime.utcnow().isoformat()
                 }
             )
-            await manager.broadcast_to_channel(
-                ws_message.dict(),
-                "chat"
-            )
+            payload = ws_message.model_dump(mode="json")
+            # Only sockets subscribed to this conversation receive the reply...
+            await manager.publish_to_topic(payload, CONVERSATION_TOPIC.format(conversation_id))
+            if username:
+                # ...and the owner's /ws/chat sockets that don't use subscriptions yet (legacy clients)
+                await manager.send_to_unsubscribed(payload, username, "chat")
         except Exception as e:
             logger.error(f"Error sending message via WebSocket: {e}")
 
@@ -229,21 +270,17 @@ class ChatService:
         conversation = db.query(Conversation).filter_by(id=conversation_id, user_id=user_id, is_active=True).first()
         if conversation:
             conversation.is_active = False
+            # updated_at marks the deletion time for the retention purge job
+            conversation.updated_at = datetime.utcnow()
             db.query(ChatMessage).filter_by(conversation_id=conversation_id).update({"is_active": False})
+            stats_service.record_conversation_deleted(db, user_id)
             db.commit()
             return True
         return False
 
-    def get_conversation_stats(self) -> Dict[str, Any]:
-        total_conversations = len(self.conversations)
-        total_messages = sum(len(messages) for messages in self.messages.values())
-        active_conversations = sum(1 for conv in self.conversations.values() if conv.is_active)
-        return {
-            "total_conversations": total_conversations,
-            "active_conversations": active_conversations,
-            "total_messages": total_messages,
-            "average_messages_per_conversation": total_messages / total_conversations if total_conversations > 0 else 0
-        }
+    def get_conversation_stats(self, db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Conversation stats read from incrementally maintained counters (no table scans)."""
+        return stats_service.get_conversation_stats(db, user_id)
 
     def rename_conversation(self, conversation_id: str, user_id: int, new_title: str, db: Session) -> bool:
         """Renames a conversation if the user is the owner."""
@@ -255,5 +292,72 @@ class ChatService:
             return True
         return False
 
+    def _owns_conversation(self, conversation_id: str, username: str) -> bool:
+        """Whether `conversation_id` is an active conversation of `username` (same ids as the REST endpoints)."""
+        db = SessionLocal()
+        try:
+            user_id = user_id_for_username(db, username)
+            if user_id is None:
+                return False
+            return db.query(Conversation.id).filter_by(
+                id=conversation_id, user_id=user_id, is_active=True
+            ).first() is not None
+        finally:
+            db.close()
+
+    def _load_history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return [m.model_dump(mode="json") for m in self.get_conversation_history(conversation_id, db)]
+        finally:
+            db.close()
+
+    async def handle_subscription(self, websocket, request: Dict[str, Any]):
+        """
+        Handles {"action": "subscribe"|"unsubscribe", "conversation_id": "..."} sent on /ws/chat.
+        Only authenticated sockets can subscribe, and only to their own conversations.
+        With "last_seq" the replies missed since then are replayed; if they are no longer
+        buffered, a "snapshot" frame with the conversation history is sent instead.
+        """
+        action = request.get("action")
+        conversation_id = str(request.get("conversation_id", ""))
+        topic = CONVERSATION_TOPIC.format(conversation_id)
+        if action == "unsubscribe":
+            manager.unsubscribe(websocket, topic)
+            await manager.send_personal_message({"type": "unsubscribed", "conversation_id": conversation_id}, websocket)
+            return
+        username = manager.get_user(websocket)
+        if username is None:
+            error = "unauthorized"
+        else:
+            # Checked against the user the socket authenticated as (the token's subject)
+            if not await asyncio.to_thread(self._owns_conversation, conversation_id, username):
+                error = "conversation_not_found"
+            elif not manager.subscribe(websocket, topic):
+                error = "too_many_subscriptions"
+            else:
+                await manager.send_personal_message({"type": "subscribed", "conversation_id": conversation_id}, websocket)
+                last_seq = request.get("last_seq")
+                if isinstance(last_seq, int) and last_seq >= 0:
+                    await self._resume_conversation(websocket, conversation_id, topic, last_seq)
+                return
+        await manager.send_personal_message(
+            {"type": "error", "error": error, "conversation_id": conversation_id}, websocket
+        )
+
+    async def _resume_conversation(self, websocket, conversation_id: str, topic: str, last_seq: int):
+        stream = f"topic:{topic}"
+        resumed, seq = await manager.resume(websocket, stream, last_seq)
+        if resumed:
+            await manager.send_personal_message({"type": "resumed", "stream": stream, "seq": seq}, websocket)
+            return
+        # Gap larger than the replay buffer: send the history once instead of every client
+        # falling back to the REST history endpoint at the same time
+        messages = await asyncio.to_thread(self._load_history, conversation_id)
+        await manager.send_personal_message(
+            {"type": "snapshot", "stream": stream, "seq": seq, "conversation_id": conversation_id, "messages": messages},
+            websocket
+        )
+
 # Global instance of chat service
 chat_service = ChatService()
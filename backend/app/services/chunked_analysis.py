@@ -0,0 +1,291 @@
+"""
+Out-of-core analysis: summaries of a dataset computed in a single pass over `chunksize`
+iterators, with memory bounded by the number of columns instead of the number of rows.
+
+ChunkedProfile keeps mergeable accumulators per numeric column pair (count, means,
+sums of squared deviations and co-deviations, combined with Chan's parallel update,
+i.e. Welford across chunks), min/max, null counts and a bounded reservoir sample for
+the percentiles. It exposes the same summaries as FrameSummary (an in-memory DataFrame),
+so DataService formats both the same way:
+- counts, means, std, min, max, null counts and correlations (pairwise complete, as
+  DataFrame.corr) are exact;
+- 25%/50%/75% are exact up to `sample_size` non-null values per column and estimated
+  from a uniform sample above that;
+- distinct counts and most frequent values (and unique/top/freq for datasets without
+  numeric columns) are exact up to `max_distinct` distinct values per column; beyond
+  that, values first seen after the limit are not counted.
+"""
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.dataframe_optimizer import source_dtypes
+from app.utils.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DESCRIBE_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+OBJECT_DESCRIBE_INDEX = ["count", "unique", "top", "freq"]
+CHUNKABLE_EXTENSIONS = (".csv", ".jsonl")
+
+
+def iter_chunks(file_path: str, chunksize: int) -> Iterator["pd.DataFrame"]:
+    """Reads a CSV or JSON Lines file `chunksize` rows at a time."""
+    if file_path.endswith(".csv"):
+        reader = pd.read_csv(file_path, chunksize=chunksize)
+    elif file_path.endswith(".jsonl"):
+        reader = pd.read_json(file_path, lines=True, chunksize=chunksize)
+    else:
+        raise ValueError(f"Chunked reading not supported for {file_path}")
+    with reader:
+        yield from reader
+
+
+def _is_numeric_dtype(dtype: str) -> bool:
+    # Same as select_dtypes(include=['number']): bool is not a number
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _merge_dtype(current: Optional[str], new: str) -> str:
+    """dtype a full read would give to a column seen with `current` and then `new`."""
+    if current is None or current == new:
+        return new
+    if _is_numeric_dtype(current) and _is_numeric_dtype(new):
+        return "float64"
+    return "object"
+
+
+class FrameSummary:
+    """Summaries of an in-memory DataFrame."""
+
+    def __init__(self, df: "pd.DataFrame"):
+        self.df = df
+        self.rows = len(df)
+        self.columns = df.columns.tolist()
+        # As read from the source, whatever dtypes the loader optimized them to
+        self.dtypes = source_dtypes(df)
+
+    def describe(self) -> "pd.DataFrame":
+        # Numeric columns only, or count/unique/top/freq of every column, as ChunkedProfile
+        # (describe() would also summarize parsed dates)
+        if self.numeric_columns():
+            return self.df.describe(include=['number'])
+        return self.df.astype(object).describe()
+
+    def missing(self) -> "pd.Series":
+        return self.df.isnull().sum()
+
+    def numeric_columns(self) -> List[str]:
+        return self.df.select_dtypes(include=['number']).columns.tolist()
+
+    def corr(self) -> "pd.DataFrame":
+        return self.df[self.numeric_columns()].corr()
+
+    def distinct(self) -> Dict[Any, Tuple[Optional[int], bool]]:
+        """Distinct non-null values per column, and whether the count is exact."""
+        result = {}
+        for col in self.columns:
+            try:
+                result[col] = (int(self.df[col].nunique()), True)
+            except TypeError:
+                # Unhashable values (lists, dicts from JSON)
+                result[col] = (None, False)
+        return result
+
+    def top(self, k: int) -> Dict[Any, List[Tuple[Any, int]]]:
+        """The `k` most frequent non-null values per column, with their counts."""
+        result = {}
+        for col in self.columns:
+            try:
+                counts = self.df[col].value_counts().head(k)
+            except TypeError:
+                result[col] = []
+                continue
+            result[col] = [(value, int(count)) for value, count in counts.items()]
+        return result
+
+    def head(self, n: int) -> "pd.DataFrame":
+        return self.df.head(n)
+
+
+class ChunkedProfile:
+    """Single-pass, mergeable summaries of a dataset read in chunks."""
+
+    def __init__(self, sample_size: int = 100000, max_distinct: int = 10000, seed: int = 0):
+        self.sample_size = sample_size
+        self.max_distinct = max_distinct
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.columns: List[str] = []
+        self.dtypes: Dict[str, str] = {}
+        self.nulls: Dict[str, int] = {}
+        # Numeric candidates (numeric in the first chunk) and pairwise accumulators over them;
+        # [i, j] is over the rows where both i and j are present
+        self.candidates: List[str] = []
+        self.n = self.mean = self.m2 = self.co = None
+        self.minimum = self.maximum = None
+        self.seen: Optional["np.ndarray"] = None
+        self.samples: List["np.ndarray"] = []
+        # Value counts per column, up to max_distinct distinct values
+        self.counts: Dict[str, Counter] = {}
+        self.first_rows: Optional["pd.DataFrame"] = None
+
+    @classmethod
+    def from_file(cls, file_path: str, chunksize: int, **kwargs) -> "ChunkedProfile":
+        profile = cls(**kwargs)
+        for chunk in iter_chunks(file_path, chunksize):
+            profile.update(chunk)
+        return profile
+
+    def update(self, chunk: "pd.DataFrame"):
+        if not self.columns:
+            self.columns = chunk.columns.tolist()
+            self.first_rows = chunk.head(100)
+            self.candidates = chunk.select_dtypes(include=['number']).columns.tolist()
+            self._init_numeric(len(self.candidates))
+        self.rows += len(chunk)
+        for col, count in chunk.isnull().sum().items():
+            self.nulls[col] = self.nulls.get(col, 0) + int(count)
+        for col in self.columns:
+            self.dtypes[col] = _merge_dtype(self.dtypes.get(col), str(chunk[col].dtype))
+        if self.candidates:
+            values = np.column_stack([
+                chunk[col].to_numpy(dtype="float64", na_value=np.nan) if _is_numeric_dtype(self.dtypes[col])
+                else np.full(len(chunk), np.nan)
+                for col in self.candidates
+            ])
+            self._update_numeric(values)
+        self._update_counts(chunk)
+
+    def _init_numeric(self, k: int):
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.co = np.zeros((k, k))
+        self.minimum = np.full(k, np.inf)
+        self.maximum = np.full(k, -np.inf)
+        self.seen = np.zeros(k, dtype=np.int64)
+        self.samples = [np.empty(0) for _ in range(k)]
+
+    def _update_numeric(self, values: "np.ndarray"):
+        present = ~np.isnan(values)
+        weights = present.astype("float64")
+        n = weights.T @ weights
+        # Centre each column on its own chunk mean so the sums below stay small
+        counts = present.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shift = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        centred = np.where(present, values - shift, 0.0)
+        sx = centred.T @ weights            # [i, j]: sum of centred i over rows with i and j
+        sxx = (centred ** 2).T @ weights
+        sxy = centred.T @ centred
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(n > 0, sx / n, 0.0)
+            mean = shift[:, None] + delta
+            m2 = np.where(n > 0, sxx - sx * delta, 0.0)
+            co = np.where(n > 0, sxy - sx * delta.T, 0.0)
+        self._merge_moments(n, mean, m2, co)
+
+        if len(values):
+            self.minimum = np.minimum(self.minimum, np.where(present, values, np.inf).min(axis=0))
+            self.maximum = np.maximum(self.maximum, np.where(present, values, -np.inf).max(axis=0))
+        for i in range(values.shape[1]):
+            self._sample(i, values[present[:, i], i])
+
+    def _merge_moments(self, n, mean, m2, co):
+        """Chan et al. parallel combination of two sets of pairwise moments."""
+        total = self.n + n
+        delta = mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(total > 0, self.n * n / total, 0.0)
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0.0)
+        self.m2 = self.m2 + m2 + delta ** 2 * weight
+        self.co = self.co + co + delta * delta.T * weight
+        self.n = total
+
+    def _sample(self, i: int, values: "np.ndarray"):
+        """Reservoir sampling (algorithm R), vectorised per chunk."""
+        seen = self.seen[i]
+        sample = self.samples[i]
+        room = self.sample_size - len(sample)
+        if room > 0 and len(values):
+            head = values[:room]
+            sample = np.concatenate([sample, head])
+            values = values[len(head):]
+            seen += len(head)
+        if len(values):
+            # Value number t (1-based) replaces a random slot with probability sample_size / t
+            positions = self.rng.integers(0, np.arange(seen + 1, seen + len(values) + 1))
+            keep = positions < self.sample_size
+            sample[positions[keep]] = values[keep]
+            seen += len(values)
+        self.samples[i] = sample
+        self.seen[i] = seen
+
+    def _update_counts(self, chunk: "pd.DataFrame"):
+        for col in self.columns:
+            counter = self.counts.setdefault(col, Counter())
+            try:
+                counts = chunk[col].dropna().value_counts(sort=False)
+            except TypeError:
+                continue
+            for value, count in counts.items():
+                if value in counter or len(counter) < self.max_distinct:
+                    counter[value] += int(count)
+
+    def numeric_columns(self) -> List[str]:
+        return [col for col in self.candidates if _is_numeric_dtype(self.dtypes[col])]
+
+    def missing(self) -> "pd.Series":
+        return pd.Series({col: self.nulls[col] for col in self.columns}, dtype="int64")
+
+    def describe(self) -> "pd.DataFrame":
+        numeric = self.numeric_columns()
+        if not numeric:
+            return self._describe_objects()
+        stats = {}
+        for col in numeric:
+            i = self.candidates.index(col)
+            count = self.n[i, i]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                std = np.sqrt(self.m2[i, i] / (count - 1)) if count > 1 else np.nan
+            quartiles = np.percentile(self.samples[i], [25, 50, 75]) if count else [np.nan] * 3
+            stats[col] = [
+                count,
+                self.mean[i, i] if count else np.nan,
+                std,
+                self.minimum[i] if count else np.nan,
+                *quartiles,
+                self.maximum[i] if count else np.nan,
+            ]
+        return pd.DataFrame(stats, index=DESCRIBE_INDEX, columns=numeric, dtype="float64")
+
+    def _describe_objects(self) -> "pd.DataFrame":
+        stats = {}
+        for col in self.columns:
+            counter = self.counts.get(col, Counter())
+            top, freq = counter.most_common(1)[0] if counter else (np.nan, np.nan)
+            stats[col] = [self.rows - self.nulls[col], len(counter), top, freq]
+        return pd.DataFrame(stats, index=OBJECT_DESCRIBE_INDEX, columns=self.columns, dtype="object")
+
+    def distinct(self) -> Dict[Any, Tuple[Optional[int], bool]]:
+        return {col: (len(self.counts.get(col, ())), len(self.counts.get(col, ())) < self.max_distinct) for col in self.columns}
+
+    def top(self, k: int) -> Dict[Any, List[Tuple[Any, int]]]:
+        return {col: self.counts.get(col, Counter()).most_common(k) for col in self.columns}
+
+    def head(self, n: int) -> "pd.DataFrame":
+        return self.first_rows.head(n) if self.first_rows is not None else pd.DataFrame()
+
+    def corr(self) -> "pd.DataFrame":
+        numeric = self.numeric_columns()
+        index = [self.candidates.index(col) for col in numeric]
+        m2 = self.m2[np.ix_(index, index)]
+        co = self.co[np.ix_(index, index)]
+        n = self.n[np.ix_(index, index)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            divisor = np.sqrt(m2 * m2.T)
+            corr = np.where((n > 1) & (divisor > 0), co / divisor, np.nan)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(np.diag(n > 1) & (np.diag(m2) > 0), 1.0, np.nan))
+        return pd.DataFrame(corr, index=numeric, columns=numeric)
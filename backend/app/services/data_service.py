@@ -1,8 +1,12 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
 import uuid
 import time
 import logging
-import pandas as pd
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Set, Tuple
 from datetime import datetime
 import json
 import os
@@ -15,14 +19,65 @@ except ImportError:
     REDIS_AVAILABLE = False
     redis = None
 
+from prometheus_client import Counter, Gauge, Histogram
+from pydantic import ValidationError
+
 from app.schemas.data import (
     DataAnalysisRequest, DataAnalysisResponse, DataSource,
-    AnalysisType, WebSocketDataMessage
+    AnalysisType, WebSocketDataMessage, DataUploadResponse, DataPreview
 )
+from app.core.config import settings
 from app.core.websocket_manager import manager
+from app.core.analysis_pool import AnalysisPoolFull, AnalysisTimeoutError, get_analysis_pool, run_celery
+from app.services.analysis_jobs import (
+    analyze_chunked, analyze_columnar, convert_columnar, format_analysis, profile_chunked, profile_columnar,
+    read_source_file
+)
+from app.services.chunked_analysis import CHUNKABLE_EXTENSIONS, FrameSummary
+from app.services.dataset_profile import StoredProfile, load_profile
+from app.utils import columnar_store
+from app.utils.byte_lru_cache import ByteLRUCache
+from app.utils.dataframe_codec import chunk_key, decode_header, decode_value, encode_value
+from app.utils.dataframe_optimizer import optimize_dataframe, source_dtypes
+from app.utils.lazy_imports import lazy_import
+from app.utils.upload_sniffer import create_sniffer
+
+# pandas is heavy: imported on first use so workers that never analyze data don't load it
+pd = lazy_import("pandas")
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_RESULT_CACHE = Counter(
+    "analysis_result_cache_total",
+    "Analysis result cache lookups by tier (memory, redis) and outcome (hit, miss)",
+    ["tier", "outcome"]
+)
+ANALYSIS_RESULT_CACHE_BYTES = Gauge(
+    "analysis_result_cache_bytes",
+    "Bytes of analysis results held in the in-process result cache"
+)
+DATAFRAME_MEMORY_BYTES = Counter(
+    "dataframe_memory_bytes_total",
+    "Memory of loaded datasets with default dtypes (before) and after optimization (after)",
+    ["stage"]
+)
+DATAFRAME_MEMORY_RATIO = Histogram(
+    "dataframe_memory_ratio",
+    "Optimized / default memory of each loaded dataset",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+UPLOAD_EXTENSIONS = (".csv", ".json", ".jsonl", ".xlsx")
+
+class UploadTooLargeError(ValueError):
+    """The upload is larger than settings.max_file_size."""
+
+class UnknownColumnsError(ValueError):
+    """An analysis asked for columns the data source doesn't have."""
+
+# progress(analysis_id, stage, partial): stages are loading, profiling, computing and done
+ProgressCallback = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+
 class DataService:
     """Service for data analysis with optional Redis caching for scalability."""
     
@@ -36,8 +91,7 @@ class DataService:
                 self.redis_client = redis.Redis(
                     host=os.getenv('REDIS_HOST', 'localhost'),
                     port=int(os.getenv('REDIS_PORT', 6379)),
-                    db=0,
-                    decode_responses=True
+                    db=0
                 )
                 # Test connection
                 self.redis_client.ping()
@@ -52,23 +106,43 @@ class DataService:
         
         # Fallback to in-memory storage if Redis is not available
         self.data_sources: Dict[str, DataSource] = {}
-        self.analyses: Dict[str, DataAnalysisResponse] = {}
+        # Most recent analyses, oldest dropped beyond settings.analysis_history_size
+        self.analyses: "OrderedDict[str, DataAnalysisResponse]" = OrderedDict()
         self.data_cache: Dict[str, pd.DataFrame] = {}
+        # Analyses running for each /ws/data socket, by analysis id (for cancellation)
+        self.ws_analyses: Dict[Any, Dict[str, asyncio.Task]] = {}
+        # Columnar conversions running, by file path (concurrent first loads wait for the same one)
+        self.columnar_builds: Dict[str, asyncio.Task] = {}
+        # Sources whose data can't be stored as Arrow: not converted again on every load
+        self.columnar_unsupported: Set[str] = set()
+        # Analysis results by (source content hash, request digest); Redis is the shared second tier
+        self.result_cache = ByteLRUCache(settings.analysis_result_cache_max_bytes, sizeof=lambda text: len(text.encode()))
+        # file path -> (mtime_ns, size, sha256): the content is only re-hashed when the file changes
+        self.content_hashes: Dict[str, Tuple[int, int, str]] = {}
+        # file path -> (bytes with default dtypes, bytes optimized) of its last full load
+        self.memory_stats: Dict[str, Tuple[int, int]] = {}
+        # Dataset profiles being built, by file path (concurrent requests wait for the same build)
+        self.profile_builds: Dict[str, asyncio.Task] = {}
     
     def _get_cache_key(self, prefix: str, key: str) -> str:
         """Generate cache key with prefix."""
         return f"data_service:{prefix}:{key}"
     
     def _cache_set(self, key: str, value: Any, expire: int = 3600) -> bool:
-        """Set value in cache (Redis or memory)."""
+        """Set value in cache (Redis or memory). In Redis, values go in a typed envelope (DataFrames as Arrow)."""
         try:
             if self.redis_available and self.redis_client:
-                if isinstance(value, pd.DataFrame):
-                    # Convert DataFrame to JSON for Redis storage
-                    value_json = value.to_json()
-                    return self.redis_client.setex(key, expire, value_json)
-                else:
-                    return self.redis_client.setex(key, expire, json.dumps(value))
+                header, chunks = encode_value(
+                    value,
+                    compression=settings.cache_dataframe_compression or None,
+                    chunk_size=settings.cache_chunk_size_bytes
+                )
+                # Header and chunks are written together so readers never see a partial frame
+                pipe = self.redis_client.pipeline(transaction=True)
+                for index, chunk in enumerate(chunks):
+                    pipe.setex(chunk_key(key, index), expire, chunk)
+                pipe.setex(key, expire, header)
+                return all(pipe.execute())
             else:
                 # Fallback to in-memory cache
                 self.data_cache[key] = value
@@ -81,13 +155,16 @@ class DataService:
         """Get value from cache (Redis or memory)."""
         try:
             if self.redis_available and self.redis_client:
-                value = self.redis_client.get(key)
-                if value:
-                    # Try to parse as DataFrame first, then as JSON
-                    try:
-                        return pd.read_json(value)
-                    except:
-                        return json.loads(value)
+                raw = self.redis_client.get(key)
+                header = decode_header(raw) if raw else None
+                if header is None:
+                    return None
+                chunks = []
+                if header.get("chunks"):
+                    chunks = self.redis_client.mget([chunk_key(key, i) for i in range(header["chunks"])])
+                    if any(chunk is None for chunk in chunks):
+                        return None
+                return decode_value(header, chunks)
             else:
                 # Fallback to in-memory cache
                 return self.data_cache.get(key)
@@ -95,20 +172,37 @@ class DataService:
             logger.error(f"Error getting from cache: {e}")
             return None
     
-    async def process_data_analysis(self, request: DataAnalysisRequest) -> DataAnalysisResponse:
-        """Processes a data analysis request."""
+    async def process_data_analysis(
+        self,
+        request: DataAnalysisRequest,
+        progress: Optional[ProgressCallback] = None,
+        analysis_id: Optional[str] = None
+    ) -> DataAnalysisResponse:
+        """
+        Processes a data analysis request. The computation runs in the analysis process pool
+        (or on Celery for files too large to load), never on the event loop; sources without a
+        columnar copy are loaded and analyzed in worker threads. With `progress`, each stage is reported
+        (with partial results) and the result is returned only to the caller; without it the
+        result is broadcast to the data channel.
+        """
         start_time = time.time()
+        analysis_id = analysis_id or str(uuid.uuid4())
+        
+        async def report(stage: str, partial: Optional[Dict[str, Any]] = None):
+            if progress is not None:
+                await progress(analysis_id, stage, partial or {})
         
         try:
-            analysis_id = str(uuid.uuid4())
-            
             # Load data if a source is specified
-            data = None
-            if request.data_source_id and request.data_source_id in self.data_sources:
-                data = await self._load_data(request.data_source_id)
-            
-            # Generate analysis
-            result = await self._generate_analysis(request, data)
+            await report("loading")
+            data_source = self.data_sources.get(request.data_source_id) if request.data_source_id else None
+            cache_key = await self._result_cache_key(request, data_source)
+            result = await self._get_cached_result(cache_key)
+            cached = result is not None
+            if not cached:
+                result, cacheable = await self._compute_result(request, data_source, report)
+                if cacheable:
+                    await self._store_result(cache_key, result)
             
             processing_time = time.time() - start_time
             
@@ -123,15 +217,18 @@ class DataService:
                 timestamp=datetime.utcnow(),
                 metadata={
                     "user_id": request.user_id,
-                    "parameters": request.parameters
+                    "parameters": request.parameters,
+                    "cached": cached
                 }
             )
             
             # Save analysis
-            self.analyses[analysis_id] = response
+            self._record_analysis(response)
             
-            # Send result via WebSocket
-            await self._broadcast_analysis_result(response)
+            await report("done", {"processing_time": processing_time, "cached": cached})
+            if progress is None:
+                # Send result via WebSocket
+                await self._broadcast_analysis_result(response)
             
             return response
             
@@ -139,6 +236,149 @@ class DataService:
             logger.error(f"Error processing data analysis: {e}")
             raise
     
+    async def _compute_result(
+        self,
+        request: DataAnalysisRequest,
+        data_source: Optional[DataSource],
+        report: Callable[..., Awaitable[None]]
+    ) -> Tuple[str, bool]:
+        """Computes an analysis, reporting its stages. Returns (result, whether it can be cached)."""
+        columns = self._requested_columns(request)
+        stored = await self._get_profile(data_source) if data_source is not None else None
+        if stored is not None:
+            # Served from the dataset profile: no data is read
+            if columns:
+                stored = stored.select(self._check_columns(columns, stored.columns))
+            await report("profiling", {"rows": stored.rows, "columns": stored.columns})
+            await report("computing", {
+                "dtypes": {str(col): dtype for col, dtype in stored.dtypes.items()},
+                "missing": {str(col): int(count) for col, count in stored.missing().items()}
+            })
+            return await asyncio.to_thread(format_analysis, stored, request.analysis_type), True
+        
+        if data_source is not None and self._use_chunked(data_source):
+            # Too large to load: summarized in one pass over the file, chunk by chunk
+            await report("profiling", {"chunked": True})
+            result, profile = await self._run_large_file_job(
+                analyze_chunked,
+                data_source.file_path,
+                settings.analysis_chunk_rows,
+                settings.analysis_sample_size,
+                request.analysis_type.value
+            )
+            await report("computing", profile)
+            return result, True
+        if data_source is not None and data_source.file_path and await self._ensure_columnar(data_source.file_path):
+            # The job memory-maps the columnar copy itself; here only its metadata is read
+            profile = await asyncio.to_thread(self._columnar_profile, data_source.file_path, columns)
+            read_columns = profile.pop("columns")
+            await report("profiling", {"rows": profile.pop("rows"), "columns": read_columns})
+            await report("computing", profile)
+            result = await self._run_job(
+                analyze_columnar, data_source.file_path, read_columns if columns else None, request.analysis_type.value
+            )
+            return result, True
+        
+        data = await self._load_data(request.data_source_id, columns) if data_source is not None else None
+        if data is not None:
+            await report("profiling", {"rows": len(data), "columns": data.columns.tolist()})
+            profile = await asyncio.to_thread(self._profile_dataframe, data)
+            await report("computing", profile)
+        else:
+            await report("computing")
+        
+        # Generate analysis
+        result = await self._generate_analysis(request, data)
+        # Nothing loaded (missing or unreadable file): that general answer is not cached for the content
+        return result, data is not None
+    
+    def _record_analysis(self, response: DataAnalysisResponse):
+        self.analyses[response.id] = response
+        while len(self.analyses) > settings.analysis_history_size:
+            self.analyses.popitem(last=False)
+    
+    async def _result_cache_key(self, request: DataAnalysisRequest, data_source: Optional[DataSource]) -> Optional[Tuple[str, str]]:
+        """
+        (source content hash, request digest), or None if the result can't be cached.
+        The query is normalized (case, whitespace) and the parameters are order-independent.
+        """
+        if not settings.analysis_result_cache_enabled or data_source is None or not data_source.file_path:
+            return None
+        content_hash = await asyncio.to_thread(self._content_hash, data_source)
+        if content_hash is None:
+            return None
+        request_key = json.dumps({
+            "analysis_type": request.analysis_type.value,
+            "query": " ".join(request.query.lower().split()),
+            "parameters": request.parameters or {}
+        }, sort_keys=True, default=str)
+        return content_hash, hashlib.sha256(request_key.encode()).hexdigest()
+    
+    def _content_hash(self, data_source: DataSource) -> Optional[str]:
+        """SHA-256 of the source file, re-hashed only when its size or mtime changes."""
+        path = data_source.file_path
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self.content_hashes.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        if known is not None and known[2] != content_hash:
+            self._invalidate_results(known[2])
+        self.content_hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        data_source.content_hash = content_hash
+        return content_hash
+    
+    def _invalidate_results(self, content_hash: str):
+        """Drops the cached results of a content that changed (Redis entries left by other workers expire)."""
+        dropped = self.result_cache.pop_where(lambda key: key[0] == content_hash)
+        ANALYSIS_RESULT_CACHE_BYTES.set(self.result_cache.bytes)
+        if self.redis_available and self.redis_client:
+            try:
+                pattern = self._get_cache_key("result", f"{content_hash}:*")
+                for key in self.redis_client.scan_iter(match=pattern, count=500):
+                    self.redis_client.delete(key)
+            except Exception as e:
+                logger.error(f"Error invalidating cached results: {e}")
+        logger.info(f"Source content {content_hash[:12]} changed, dropped {dropped} cached results")
+    
+    async def _get_cached_result(self, cache_key: Optional[Tuple[str, str]]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        result = self.result_cache.get(cache_key)
+        ANALYSIS_RESULT_CACHE.labels(tier="memory", outcome="hit" if result is not None else "miss").inc()
+        if result is not None or not self._result_redis_tier():
+            return result
+        result = await asyncio.to_thread(self._cache_get, self._get_cache_key("result", ":".join(cache_key)))
+        ANALYSIS_RESULT_CACHE.labels(tier="redis", outcome="hit" if result is not None else "miss").inc()
+        if result is not None:
+            self.result_cache.set(cache_key, result)
+            ANALYSIS_RESULT_CACHE_BYTES.set(self.result_cache.bytes)
+        return result
+    
+    async def _store_result(self, cache_key: Optional[Tuple[str, str]], result: str):
+        if cache_key is None:
+            return
+        self.result_cache.set(cache_key, result)
+        ANALYSIS_RESULT_CACHE_BYTES.set(self.result_cache.bytes)
+        if self._result_redis_tier():
+            await asyncio.to_thread(
+                self._cache_set,
+                self._get_cache_key("result", ":".join(cache_key)),
+                result,
+                settings.analysis_result_cache_ttl_seconds
+            )
+    
+    def _result_redis_tier(self) -> bool:
+        # Without Redis, _cache_set would fall back to the unbounded data_cache dict
+        return settings.analysis_result_cache_redis and self.redis_available
+    
     async def _generate_analysis(self, request: DataAnalysisRequest, data: Optional[pd.DataFrame]) -> str:
         """Generates analysis based on the query and data."""
         try:
@@ -146,8 +386,8 @@ class DataService:
             # For now, we simulate basic analyses
             
             if data is not None:
-                # Analysis with real data
-                result = self._analyze_dataframe(data, request.query, request.analysis_type)
+                # Analysis with real data (pandas work, off the event loop)
+                result = await asyncio.to_thread(self._analyze_dataframe, data, request.query, request.analysis_type)
             else:
                 # Analysis without data (general queries)
                 result = self._generate_general_analysis(request.query, request.analysis_type)
@@ -160,41 +400,106 @@ class DataService:
     
     def _analyze_dataframe(self, df: pd.DataFrame, query: str, analysis_type: AnalysisType) -> str:
         """Performs analysis on a DataFrame."""
+        return format_analysis(FrameSummary(df), analysis_type)
+    
+    def _profile_dataframe(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Partial result sent before computing: column types and missing values."""
+        return {
+            "dtypes": {str(col): dtype for col, dtype in source_dtypes(df).items()},
+            "missing": {str(col): int(count) for col, count in df.isnull().sum().items()}
+        }
+    
+    def _columnar_profile(self, file_path: str, columns: Optional[List[str]]) -> Dict[str, Any]:
+        """rows, columns and the _profile_dataframe partial, from the columnar copy's metadata."""
+        return columnar_store.read_profile(
+            file_path, self._check_columns(columns, columnar_store.read_schema(file_path))
+        )
+    
+    async def _run_job(self, fn, *args):
+        """Runs an analysis job in the process pool, or in a worker thread if the pool is disabled."""
+        timeout = settings.analysis_timeout_seconds
+        if settings.analysis_pool_enabled:
+            return await get_analysis_pool().run(fn, *args, timeout=timeout)
         try:
-            result = f"Data Analysis:\n\n"
-            result += f"Dataset: {len(df)} rows, {len(df.columns)} columns\n"
-            result += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-            
-            if analysis_type == AnalysisType.EXPLORATORY:
-                result += "**Exploratory Analysis:**\n"
-                result += f"- Data types:\n"
-                for col in df.columns:
-                    result += f"  - {col}: {df[col].dtype}\n"
-                
-                result += f"\n- Descriptive statistics:\n"
-                result += df.describe().to_string()
-                
-            elif analysis_type == AnalysisType.STATISTICAL:
-                result += "**Statistical Analysis:**\n"
-                result += f"- Missing values:\n"
-                result += df.isnull().sum().to_string()
-                
-                result += f"\n- Correlations:\n"
-                numeric_cols = df.select_dtypes(include=['number']).columns
-                if len(numeric_cols) > 1:
-                    result += df[numeric_cols].corr().to_string()
-                
-            elif analysis_type == AnalysisType.VISUALIZATION:
-                result += "**Visualization Analysis:**\n"
-                result += "The following visualizations were generated:\n"
-                result += "- Distribution histogram\n"
-                result += "- Correlation plot\n"
-                result += "- Box plot of numeric variables\n"
-            
-            return result
-            
-        except Exception as e:
-            return f"Error analyzing data: {str(e)}"
+            return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+        except asyncio.TimeoutError:
+            raise AnalysisTimeoutError(f"Analysis did not finish within {timeout}s")
+    
+    async def _run_large_file_job(self, fn, *args):
+        """Runs a job over a file too large to load: on Celery if enabled, otherwise as any other job."""
+        if settings.analysis_celery_enabled:
+            # Imported here: the API process only needs Celery when it dispatches to it
+            from app.services.tasks import run_large_file_job
+            return await run_celery(run_large_file_job, fn.__name__, *args, timeout=settings.analysis_timeout_seconds)
+        return await self._run_job(fn, *args)
+    
+    async def _get_profile(self, data_source: DataSource) -> Optional[StoredProfile]:
+        """
+        The dataset profile of a source, built if it is missing or the file changed since.
+        None if profiles are disabled or the source has no columnar copy to build it from.
+        """
+        if not settings.dataset_profiles_enabled or not data_source.file_path:
+            return None
+        path = data_source.file_path
+        profile = await asyncio.to_thread(load_profile, path)
+        if profile is None:
+            # Shielded: a cancelled analysis doesn't cancel a build other requests wait for
+            profile = await asyncio.shield(self._profile_build(data_source))
+        return StoredProfile(profile) if profile is not None else None
+    
+    def _profile_build(self, data_source: DataSource) -> asyncio.Task:
+        """The running profile build of a source, started if there is none."""
+        path = data_source.file_path
+        build = self.profile_builds.get(path)
+        if build is None:
+            build = asyncio.create_task(self._build_profile(data_source))
+            self.profile_builds[path] = build
+            build.add_done_callback(lambda task: self._profile_build_done(path, task))
+        return build
+    
+    def _profile_build_done(self, path: str, task: asyncio.Task):
+        self.profile_builds.pop(path, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error building the dataset profile of {path}: {task.exception()}")
+    
+    async def _build_profile(self, data_source: DataSource) -> Optional[Dict[str, Any]]:
+        path = data_source.file_path
+        start_time = time.time()
+        if self._use_chunked(data_source):
+            profile = await self._run_large_file_job(
+                profile_chunked, path, settings.analysis_chunk_rows, settings.analysis_sample_size
+            )
+        elif await self._ensure_columnar(path):
+            profile = await self._run_job(profile_columnar, path)
+        else:
+            return None
+        logger.info(f"Built the dataset profile of {path} in {time.time() - start_time:.2f}s")
+        return profile
+    
+    async def get_preview(self, data_source_id: str) -> Optional[DataPreview]:
+        """First rows, column types and per-column statistics of a source, from its dataset profile."""
+        data_source = self.data_sources.get(data_source_id)
+        stored = await self._get_profile(data_source) if data_source is not None else None
+        if stored is None:
+            return None
+        preview = stored.profile["preview"]
+        return DataPreview(
+            data_source_id=data_source_id,
+            preview_data=preview,
+            total_rows=stored.rows,
+            total_columns=len(stored.columns),
+            column_types={str(col): dtype for col, dtype in stored.dtypes.items()},
+            sample_size=len(preview),
+            column_stats=stored.column_profiles
+        )
+    
+    
+    def _use_chunked(self, data_source: DataSource) -> bool:
+        """Whether a source is too large to load and must be analyzed in chunks."""
+        path = data_source.file_path
+        if not path or not path.endswith(CHUNKABLE_EXTENSIONS) or not os.path.exists(path):
+            return False
+        return os.path.getsize(path) > settings.analysis_chunked_threshold_bytes
     
     def _generate_general_analysis(self, query: str, analysis_type: AnalysisType) -> str:
         """Generates general analysis without specific data."""
@@ -215,75 +520,364 @@ class DataService:
             
         return result
     
-    async def _load_data(self, data_source_id: str) -> Optional[pd.DataFrame]:
-        """Loads data from a source with Redis caching."""
+    async def _load_data(self, data_source_id: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Loads data from a source (only `columns` if given). The columnar conversion, if
+        needed, runs in the analysis pool; the load itself in a worker thread.
+        """
+        data_source = self.data_sources.get(data_source_id)
+        columnar = False
+        if data_source and data_source.file_path:
+            try:
+                columnar = await self._ensure_columnar(data_source.file_path)
+            except (AnalysisPoolFull, AnalysisTimeoutError):
+                raise
+            except Exception as e:
+                logger.error(f"Error loading data: {e}")
+                return None
+        return await asyncio.to_thread(self._load_data_sync, data_source_id, columns, columnar)
+    
+    def _load_data_sync(
+        self, data_source_id: str, columns: Optional[List[str]] = None, columnar: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """
+        Loads a source from its memory-mapped columnar copy if it has one (`columnar`);
+        without pyarrow (or if the frame can't be stored as Arrow), parses the original file
+        with Redis caching.
+        """
         try:
-            cache_key = self._get_cache_key("data", data_source_id)
-            cached_data = self._cache_get(cache_key)
-            if cached_data is not None:
-                return cached_data
-            
             data_source = self.data_sources.get(data_source_id)
-            if not data_source:
-                return None
+            if columnar:
+                return columnar_store.read_columnar(data_source.file_path, self._check_columns(
+                    columns, columnar_store.read_schema(data_source.file_path)
+                ))
             
-            # Load data according to type
-            if data_source.file_path:
-                if data_source.file_path.endswith('.csv'):
-                    df = pd.read_csv(data_source.file_path)
-                elif data_source.file_path.endswith('.json'):
-                    df = pd.read_json(data_source.file_path)
-                elif data_source.file_path.endswith('.xlsx'):
-                    df = pd.read_excel(data_source.file_path)
-                else:
-                    logger.error(f"Unsupported file type: {data_source.file_path}")
-                    return None
-                
-                # Cache data with Redis
-                self._cache_set(cache_key, df, expire=7200)  # 2 hours cache
-                return df
+            cache_key = self._get_cache_key("data", data_source_id)
+            df = self._cache_get(cache_key)
+            if df is not None:
+                return df[self._check_columns(columns, df.columns.tolist())] if columns else df
+            if columns:
+                # Only the needed columns are read, cached apart from the full frame
+                cache_key = self._get_cache_key("data", f"{data_source_id}:{','.join(columns)}")
+                df = self._cache_get(cache_key)
+                if df is not None:
+                    return df
+            if not data_source or not data_source.file_path:
+                return None
+            df = self._read_source(data_source.file_path, columns)
+            if df is None:
+                return None
             
-            return None
+            # Cache data with Redis
+            self._cache_set(cache_key, df, expire=7200)  # 2 hours cache
+            return df
             
+        except UnknownColumnsError:
+            raise
         except Exception as e:
             logger.error(f"Error loading data: {e}")
             return None
     
+    def _read_source(self, file_path: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Parses a source file according to its type (only `columns` if given). In the
+        "optimized" loader mode each column gets its smallest exact dtype (see dataframe_optimizer).
+        """
+        optimized = settings.data_loader_mode == "optimized"
+        if columns and file_path.endswith('.csv'):
+            self._check_columns(columns, pd.read_csv(file_path, nrows=0).columns.tolist())
+        df = read_source_file(file_path, optimized, settings.data_loader_category_ratio, columns)
+        if df is None:
+            logger.error(f"Unsupported file type: {file_path}")
+            return None
+        if columns:
+            df = df[self._check_columns(columns, df.columns.tolist())]
+        if optimized:
+            df = self._optimize_dataframe(df, file_path if not columns else None)
+        return df
+    
+    def _optimize_dataframe(self, df: pd.DataFrame, file_path: Optional[str]) -> pd.DataFrame:
+        """Applies the optimized dtypes; full loads of a file record its memory before and after."""
+        df, before, after = optimize_dataframe(df, settings.data_loader_category_ratio)
+        self._record_memory(file_path, before, after)
+        return df
+    
+    def _record_memory(self, file_path: Optional[str], before: int, after: int):
+        DATAFRAME_MEMORY_BYTES.labels(stage="before").inc(before)
+        DATAFRAME_MEMORY_BYTES.labels(stage="after").inc(after)
+        if before:
+            DATAFRAME_MEMORY_RATIO.observe(after / before)
+        if file_path is not None:
+            self.memory_stats[file_path] = (before, after)
+            logger.info(f"Loaded {file_path}: {before / 1e6:.1f} MB with default dtypes, {after / 1e6:.1f} MB optimized")
+    
+    async def _ensure_columnar(self, file_path: str) -> bool:
+        """
+        Makes sure `file_path` has an up-to-date columnar copy, parsing the original once.
+        False if columnar storage is disabled or unavailable, or the data can't be stored as Arrow
+        (e.g. columns mixing numbers and text): such sources keep loading from the original file.
+        The parse runs in the analysis pool (it would hold the GIL of the API process for seconds);
+        concurrent callers wait for the same conversion.
+        """
+        if not settings.columnar_store_enabled or not columnar_store.PYARROW_AVAILABLE:
+            return False
+        if file_path in self.columnar_unsupported:
+            return False
+        if columnar_store.is_fresh(file_path):
+            return True
+        build = self.columnar_builds.get(file_path)
+        if build is None:
+            build = asyncio.create_task(self._convert_columnar(file_path))
+            self.columnar_builds[file_path] = build
+            build.add_done_callback(lambda _: self.columnar_builds.pop(file_path, None))
+        # Shielded: a cancelled analysis doesn't cancel a conversion other requests wait for
+        return await asyncio.shield(build)
+    
+    async def _convert_columnar(self, file_path: str) -> bool:
+        if not os.path.exists(file_path):
+            return False
+        start_time = time.time()
+        outcome = await self._run_job(
+            convert_columnar, file_path, settings.data_loader_mode == "optimized", settings.data_loader_category_ratio
+        )
+        if "unsupported" in outcome:
+            logger.warning(f"Could not store {file_path} as Arrow, loading it from the original: {outcome['unsupported']}")
+            self.columnar_unsupported.add(file_path)
+            return False
+        if outcome["memory"] is not None:
+            self._record_memory(file_path, *outcome["memory"])
+        logger.info(f"Converted {file_path} to columnar format in {time.time() - start_time:.2f}s")
+        return True
+    
+    def _requested_columns(self, request: DataAnalysisRequest) -> Optional[List[str]]:
+        """Columns an analysis is restricted to (parameters["columns"]), or None for all of them."""
+        columns = (request.parameters or {}).get("columns")
+        if columns is None:
+            return None
+        if not isinstance(columns, list) or not all(isinstance(col, str) for col in columns):
+            raise ValueError("parameters.columns must be a list of column names")
+        return columns
+    
+    def _check_columns(self, columns: Optional[List[str]], available: List[str]) -> Optional[List[str]]:
+        """`columns` in file order (as read_csv's usecols returns them), so every loader gives the same output."""
+        if columns is None:
+            return None
+        unknown = [col for col in columns if col not in available]
+        if unknown:
+            raise UnknownColumnsError(f"Unknown columns: {', '.join(unknown)}")
+        requested = set(columns)
+        return [col for col in available if col in requested]
+    
+    def _result_message(self, response: DataAnalysisResponse) -> Dict[str, Any]:
+        ws_message = WebSocketDataMessage(
+            type="analysis_result",
+            data={
+                "analysis_id": response.id,
+                "query": response.query,
+                "result": response.result,
+                "analysis_type": response.analysis_type.value,
+                "processing_time": response.processing_time,
+                "timestamp": response.timestamp.isoformat()
+            }
+        )
+        return ws_message.model_dump(mode="json")
+    
     async def _broadcast_analysis_result(self, response: DataAnalysisResponse):
         """Sends analysis result via WebSocket."""
         try:
-            ws_message = WebSocketDataMessage(
-                type="analysis_result",
-                data={
-                    "analysis_id": response.id,
-                    "query": response.query,
-                    "result": response.result,
-                    "analysis_type": response.analysis_type.value,
-                    "processing_time": response.processing_time,
-                    "timestamp": response.timestamp.isoformat()
-                }
-            )
-            
-            await manager.broadcast_to_channel(
-                ws_message.dict(),
-                "data"
-            )
-            
+            await manager.broadcast_to_channel(self._result_message(response), "data")
         except Exception as e:
             logger.error(f"Error sending result via WebSocket: {e}")
     
+    async def _send_ws(self, websocket, message_type: str, data: Dict[str, Any], coalesce_key: Optional[str] = None):
+        # The socket may have disconnected while the analysis was running
+        if websocket in manager.connections:
+            message = WebSocketDataMessage(type=message_type, data=data).model_dump(mode="json")
+            await manager.send_personal_message(message, websocket, coalesce_key)
+    
+    async def handle_ws_request(self, websocket, data: str):
+        """
+        Handles a message sent on /ws/data:
+        {"action": "analyze", "query": "...", "data_source_id": ..., "analysis_type": ...} starts an
+        analysis (plain text is taken as the query) and {"action": "cancel", "analysis_id": "..."}
+        cancels one. Each analysis streams analysis_progress frames and ends with analysis_result,
+        analysis_error or analysis_cancelled; several can run at once on the same socket.
+        """
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            payload = {"action": "analyze", "query": data}
+        action = payload.pop("action", "analyze")
+        running = self.ws_analyses.setdefault(websocket, {})
+        
+        if action == "cancel":
+            analysis_id = str(payload.get("analysis_id", ""))
+            task = running.get(analysis_id)
+            if task is None:
+                await self._send_ws(websocket, "analysis_error", {"analysis_id": analysis_id, "error": "unknown_analysis"})
+            else:
+                task.cancel()
+            return
+        if action != "analyze":
+            await self._send_ws(websocket, "analysis_error", {"error": "unknown_action", "action": action})
+            return
+        if len(running) >= settings.ws_max_analyses_per_connection:
+            await self._send_ws(websocket, "analysis_error", {"error": "too_many_analyses"})
+            return
+        try:
+            request = DataAnalysisRequest(**payload)
+        except ValidationError as e:
+            await self._send_ws(websocket, "analysis_error", {"error": "invalid_request", "detail": e.errors(include_url=False)})
+            return
+        
+        analysis_id = str(uuid.uuid4())
+        await self._send_ws(websocket, "analysis_started", {"analysis_id": analysis_id, "query": request.query})
+        running[analysis_id] = asyncio.create_task(self._run_ws_analysis(websocket, analysis_id, request))
+    
+    async def _run_ws_analysis(self, websocket, analysis_id: str, request: DataAnalysisRequest):
+        async def progress(analysis_id: str, stage: str, partial: Dict[str, Any]):
+            # With the coalesce policy a backed-up socket only keeps the latest stage
+            await self._send_ws(
+                websocket, "analysis_progress",
+                {"analysis_id": analysis_id, "stage": stage, "partial": partial},
+                coalesce_key=f"analysis:{analysis_id}"
+            )
+        
+        try:
+            response = await self.process_data_analysis(request, progress=progress, analysis_id=analysis_id)
+            if websocket in manager.connections:
+                await manager.send_personal_message(self._result_message(response), websocket)
+        except asyncio.CancelledError:
+            # A worker thread that is already computing finishes in the background; its result is dropped
+            await self._send_ws(websocket, "analysis_cancelled", {"analysis_id": analysis_id})
+            raise
+        except Exception as e:
+            await self._send_ws(websocket, "analysis_error", {"analysis_id": analysis_id, "error": str(e)})
+        finally:
+            running = self.ws_analyses.get(websocket)
+            if running is not None:
+                running.pop(analysis_id, None)
+                if not running:
+                    del self.ws_analyses[websocket]
+    
+    def cancel_ws_analyses(self, websocket):
+        """Cancels every analysis started by a /ws/data socket (on disconnect)."""
+        for task in self.ws_analyses.pop(websocket, {}).values():
+            task.cancel()
+    
     def add_data_source(self, data_source: DataSource) -> str:
         """Adds a new data source with Redis caching."""
         data_source.id = str(uuid.uuid4())
         
         # Store in Redis cache
         cache_key = self._get_cache_key("source", data_source.id)
-        self._cache_set(cache_key, data_source.dict(), expire=86400)  # 24 hours
+        self._cache_set(cache_key, data_source.model_dump(mode="json"), expire=86400)  # 24 hours
         
         # Also keep in memory for backward compatibility
         self.data_sources[data_source.id] = data_source
         return data_source.id
     
+    async def save_upload(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        description: Optional[str] = None,
+        content_length: Optional[int] = None
+    ) -> DataUploadResponse:
+        """
+        Streams an upload to settings.upload_dir and registers it as a data source.
+        The body is never held in memory: each chunk is checked against max_file_size,
+        hashed and written as it arrives, and CSV / JSON Lines files are sniffed on the way
+        (rows, columns and their types) so the file is not read a second time.
+        """
+        name = os.path.basename(filename or "")
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in UPLOAD_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {extension or name}")
+        if content_length is not None and content_length > settings.max_file_size:
+            raise UploadTooLargeError(f"File exceeds the {settings.max_file_size} byte limit")
+        
+        file_path = os.path.join(settings.upload_dir, f"{uuid.uuid4().hex}{extension}")
+        part_path = file_path + ".part"
+        digest = hashlib.sha256()
+        sniffer = create_sniffer(extension)
+        size = 0
+        
+        def write(f, chunk: bytes):
+            # Hashing, sniffing and writing all scan the chunk: none of it runs on the event loop
+            digest.update(chunk)
+            if sniffer is not None:
+                sniffer.feed(chunk)
+            f.write(chunk)
+        
+        def discard(f):
+            f.close()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        
+        f = await asyncio.to_thread(open, part_path, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > settings.max_file_size:
+                    raise UploadTooLargeError(f"File exceeds the {settings.max_file_size} byte limit")
+                await asyncio.to_thread(write, f, chunk)
+            await asyncio.to_thread(f.close)
+            if size == 0:
+                raise ValueError("Empty file")
+            os.replace(part_path, file_path)
+        except BaseException:
+            await asyncio.to_thread(discard, f)
+            raise
+        
+        columns, column_types, rows = sniffer.result() if sniffer is not None else (None, None, None)
+        content_hash = digest.hexdigest()
+        # Hashed while streaming: the result cache doesn't need to read the file again
+        stat = os.stat(file_path)
+        self.content_hashes[file_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        data_source = DataSource(
+            name=name, type=extension[1:], file_path=file_path, description=description, content_hash=content_hash
+        )
+        # add_data_source writes to Redis: run it off the event loop
+        data_source_id = await asyncio.to_thread(self.add_data_source, data_source)
+        await self._ingest(data_source)
+        logger.info(f"Uploaded {name} ({size} bytes, {rows} rows) as data source {data_source_id}")
+        memory_before, memory_after = self.memory_stats.get(file_path, (None, None))
+        return DataUploadResponse(
+            id=data_source_id,
+            filename=name,
+            file_path=file_path,
+            file_size=size,
+            rows=rows,
+            columns=columns,
+            column_types=column_types,
+            content_hash=content_hash,
+            memory_before_bytes=memory_before,
+            memory_after_bytes=memory_after
+        )
+    
+    async def _ingest(self, data_source: DataSource):
+        """
+        Ingestion of a new upload: the file is parsed once into its columnar copy and its
+        dataset profile is built, so analyses and previews don't read it again. Files too
+        large to load are profiled in the background, without holding the upload response.
+        """
+        if self._use_chunked(data_source):
+            if settings.dataset_profiles_enabled:
+                self._profile_build(data_source)
+            return
+        try:
+            # Parse the file once now, so analyses memory-map the columnar copy
+            await self._ensure_columnar(data_source.file_path)
+            await self._get_profile(data_source)
+        except Exception as e:
+            # The upload stands: the conversion and the profile are retried by the first analysis
+            logger.warning(f"Could not convert or profile {data_source.file_path} at ingestion: {e}")
+    
     def get_data_source(self, data_source_id: str) -> Optional[DataSource]:
         """Gets a data source from cache or memory."""
         # Try Redis cache first
@@ -321,6 +915,7 @@ class DataService:
     def get_analysis_stats(self) -> Dict[str, Any]:
         """Gets analysis statistics."""
         total_analyses = len(self.analyses)
+        pool = get_analysis_pool()
         total_data_sources = len(self.data_sources)
         
         analysis_types = {}
@@ -332,7 +927,21 @@ class DataService:
             "total_analyses": total_analyses,
             "total_data_sources": total_data_sources,
             "analysis_types": analysis_types,
-            "average_processing_time": sum(a.processing_time or 0 for a in self.analyses.values()) / total_analyses if total_analyses > 0 else 0
+            "average_processing_time": sum(a.processing_time or 0 for a in self.analyses.values()) / total_analyses if total_analyses > 0 else 0,
+            "result_cache": {
+                "entries": len(self.result_cache),
+                "bytes": self.result_cache.bytes,
+                "hits": self.result_cache.hits,
+                "misses": self.result_cache.misses,
+                "hit_rate": self.result_cache.hit_rate,
+                "evictions": self.result_cache.evictions
+            },
+            "pool": {
+                "enabled": settings.analysis_pool_enabled,
+                "workers": pool.max_workers,
+                "queue_depth": pool.queue_depth,
+                "utilization": pool.utilization
+            }
         }
 
 # Global instance of data service
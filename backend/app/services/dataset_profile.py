@@ -0,0 +1,161 @@
+"""
+Dataset profiles: every summary an analysis needs, computed once per source content and
+saved as a JSON sidecar next to the upload (<file>.profile.json).
+Per column: dtype, null count, distinct count, most frequent values and, for numeric
+columns, count/mean/std/min/quartiles/max; plus the correlation matrix and the first
+rows for previews. StoredProfile exposes a loaded profile with the same interface as
+FrameSummary and ChunkedProfile, so analyses are formatted from it without touching the
+data. A profile records the size and mtime of the file it was computed from and is
+ignored once the file changes.
+"""
+import json
+import math
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.services.chunked_analysis import DESCRIBE_INDEX, OBJECT_DESCRIBE_INDEX
+from app.utils.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+PROFILE_VERSION = 2
+PROFILE_SUFFIX = ".profile.json"
+TOP_K = 5
+PREVIEW_ROWS = 10
+
+
+def profile_path(file_path: str) -> str:
+    return file_path + PROFILE_SUFFIX
+
+
+def source_signature(file_path: str) -> Dict[str, int]:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _json_value(value: Any) -> Any:
+    """numpy scalars to Python, NaN to None, anything else JSON can't hold to str."""
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _float(value: Optional[float]) -> float:
+    return float("nan") if value is None else value
+
+
+def build_profile(summary, signature: Dict[str, int]) -> Dict[str, Any]:
+    """Profile of a FrameSummary or ChunkedProfile; `signature` identifies the source file it describes."""
+    numeric = summary.numeric_columns()
+    describe = summary.describe() if numeric else None
+    missing = summary.missing()
+    distinct = summary.distinct()
+    top = summary.top(TOP_K)
+    columns = []
+    for col in summary.columns:
+        count, exact = distinct[col]
+        columns.append({
+            "name": _json_value(col),
+            "dtype": str(summary.dtypes[col]),
+            "missing": int(missing[col]),
+            "distinct": count,
+            "distinct_exact": exact,
+            "top": [[_json_value(value), int(freq)] for value, freq in top[col]],
+            "stats": {k: _json_value(describe.at[k, col]) for k in DESCRIBE_INDEX} if col in numeric else None
+        })
+    corr = summary.corr() if len(numeric) > 1 else None
+    head = summary.head(PREVIEW_ROWS)
+    return {
+        "version": PROFILE_VERSION,
+        "source": signature,
+        "rows": int(summary.rows),
+        "columns": columns,
+        "corr": [[_json_value(v) for v in row] for row in corr.to_numpy()] if corr is not None else None,
+        "preview": json.loads(head.to_json(orient="records", date_format="iso")) if len(head) else []
+    }
+
+
+def save_profile(file_path: str, profile: Dict[str, Any]):
+    path = profile_path(file_path)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, allow_nan=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_profile(file_path: str) -> Optional[Dict[str, Any]]:
+    """The saved profile of `file_path`, or None if there is none or the file changed since."""
+    try:
+        with open(profile_path(file_path)) as f:
+            profile = json.load(f)
+        if profile.get("version") != PROFILE_VERSION or profile.get("source") != source_signature(file_path):
+            return None
+        return profile
+    except (OSError, ValueError):
+        return None
+
+
+class StoredProfile:
+    """A saved profile, with the summary interface analyses are formatted from."""
+
+    def __init__(self, profile: Dict[str, Any]):
+        self.profile = profile
+        self.rows = profile["rows"]
+        self.column_profiles = profile["columns"]
+        self.columns = [c["name"] for c in self.column_profiles]
+        self.dtypes = {c["name"]: c["dtype"] for c in self.column_profiles}
+
+    def numeric_columns(self) -> List[Any]:
+        return [c["name"] for c in self.column_profiles if c["stats"] is not None]
+
+    def missing(self) -> "pd.Series":
+        return pd.Series({c["name"]: c["missing"] for c in self.column_profiles}, dtype="int64")
+
+    def describe(self) -> "pd.DataFrame":
+        numeric = [c for c in self.column_profiles if c["stats"] is not None]
+        if numeric:
+            return pd.DataFrame(
+                {c["name"]: [_float(c["stats"][k]) for k in DESCRIBE_INDEX] for c in numeric},
+                index=DESCRIBE_INDEX,
+                dtype="float64"
+            )
+        stats = {}
+        for c in self.column_profiles:
+            top, freq = c["top"][0] if c["top"] else (np.nan, np.nan)
+            stats[c["name"]] = [self.rows - c["missing"], c["distinct"], top, freq]
+        return pd.DataFrame(stats, index=OBJECT_DESCRIBE_INDEX, columns=self.columns, dtype="object")
+
+    def corr(self) -> "pd.DataFrame":
+        numeric = self.numeric_columns()
+        if self.profile["corr"] is None:
+            # Saved only with two or more numeric columns
+            return pd.DataFrame(np.nan, index=numeric, columns=numeric)
+        return pd.DataFrame(
+            [[_float(v) for v in row] for row in self.profile["corr"]], index=numeric, columns=numeric, dtype="float64"
+        )
+
+    def select(self, columns: List[Any]) -> "StoredProfile":
+        """
+        The profile restricted to `columns`, kept in file order like the loaders return them
+        (every summary is per column or per column pair).
+        """
+        requested = set(columns)
+        numeric = self.numeric_columns()
+        keep = [i for i, col in enumerate(numeric) if col in requested]
+        corr = self.profile["corr"]
+        profile = dict(
+            self.profile,
+            columns=[column for col, column in zip(self.columns, self.column_profiles) if col in requested],
+            corr=[[corr[i][j] for j in keep] for i in keep] if corr is not None and len(keep) > 1 else None
+        )
+        return StoredProfile(profile)
@@ -0,0 +1,54 @@
+"""
+LangChain wrapper for the local Ollama server.
+Kept in its own module so LangChain is only imported when an LLM is first used.
+"""
+import requests
+from typing import List, Optional, Any
+from langchain.llms.base import LLM
+from langchain.callbacks.manager import CallbackManagerForLLMRun
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class OllamaLLM(LLM):
+    """Class to interact with local Ollama"""
+    
+    base_url: str = settings.ollama_base_url
+    model: str = settings.ollama_default_model
+    temperature: float = 0.7
+    max_tokens: int = 2048
+    
+    @property
+    def _llm_type(self) -> str:
+        return "ollama"
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Execute the Ollama model"""
+        try:
+            url = f"{self.base_url}/api/generate"
+            data = {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "options": {
+                    "temperature": self.temperature,
+                    "num_predict": self.max_tokens
+                }
+            }
+            
+            response = requests.post(url, json=data, timeout=30)
+            response.raise_for_status()
+            
+            result = response.json()
+            return result.get("response", "")
+            
+        except Exception as e:
+            logger.error(f"Error calling Ollama: {e}")
+            return f"Error: {str(e)}"
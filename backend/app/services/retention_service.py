@@ -0,0 +1,163 @@
+"""
+Retention service: hard-deletes soft-deleted conversations and their messages
+once they are older than the configured retention window.
+"""
+import collections
+import enum
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.conversation import Conversation
+from app.models.chat_message import ChatMessage
+from app.services import stats_service
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ROWS_PURGED = Counter(
+    "retention_rows_purged_total",
+    "Rows hard-deleted by the retention purge job",
+    ["table"]
+)
+RETENTION_PURGE_DURATION = Histogram(
+    "retention_purge_duration_seconds",
+    "Duration of a retention purge run"
+)
+
+
+def _serialize_value(value: Any) -> Any:
+    """Make a column value JSON serializable."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+class NDJSONArchiver:
+    """Archives purged rows to a gzip-compressed NDJSON file (one file per run)."""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.path: Optional[str] = None
+        self._file = None
+
+    def _open(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self.path = os.path.join(self.archive_dir, f"conversations-{stamp}.ndjson.gz")
+        self._file = gzip.open(self.path, "xt", encoding="utf-8")
+
+    def write_rows(self, table: str, rows: List[Any]):
+        """Write rows and flush them, so they are on disk before being deleted."""
+        if self._file is None:
+            self._open()
+        for row in rows:
+            record = {c.name: _serialize_value(getattr(row, c.name)) for c in row.__table__.columns}
+            record["_table"] = table
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def purge_soft_deleted(
+    db: Session,
+    retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    archive_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Hard-deletes conversations soft-deleted more than `retention_days` ago, together
+    with their messages, committing in batches of `batch_size` rows to keep locks short.
+    Returns a report with the number of rows purged and the time taken.
+    """
+    retention_days = settings.event_retention_days if retention_days is None else retention_days
+    batch_size = batch_size or settings.retention_purge_batch_size
+    archive_dir = archive_dir or settings.retention_archive_dir
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    start_time = time.time()
+    archiver = NDJSONArchiver(archive_dir) if archive_dir else None
+    conversations_purged = 0
+    messages_purged = 0
+
+    try:
+        while True:
+            # delete_conversation() stamps updated_at, so it marks the deletion time
+            conversations = (
+                db.query(Conversation)
+                .filter(Conversation.is_active == False, Conversation.updated_at < cutoff)  # noqa: E712
+                .order_by(Conversation.updated_at.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not conversations:
+                break
+            conversation_ids = [c.id for c in conversations]
+            owners = {c.id: c.user_id for c in conversations}
+            if archiver:
+                archiver.write_rows("conversations", conversations)
+
+            while True:
+                query = db.query(ChatMessage) if archiver else db.query(ChatMessage.id, ChatMessage.conversation_id)
+                messages = (
+                    query.filter(ChatMessage.conversation_id.in_(conversation_ids))
+                    .order_by(ChatMessage.id.asc())
+                    .limit(batch_size)
+                    .all()
+                )
+                if not messages:
+                    break
+                if archiver:
+                    archiver.write_rows("chat_messages", messages)
+                db.query(ChatMessage).filter(
+                    ChatMessage.id.in_([m.id for m in messages])
+                ).delete(synchronize_session=False)
+                for user_id, count in collections.Counter(owners[m.conversation_id] for m in messages).items():
+                    stats_service.record_purged(db, user_id, messages=count)
+                db.commit()
+                messages_purged += len(messages)
+                RETENTION_ROWS_PURGED.labels(table="chat_messages").inc(len(messages))
+
+            db.query(Conversation).filter(
+                Conversation.id.in_(conversation_ids)
+            ).delete(synchronize_session=False)
+            for user_id, count in collections.Counter(owners.values()).items():
+                stats_service.record_purged(db, user_id, conversations=count)
+            db.commit()
+            db.expunge_all()
+            conversations_purged += len(conversation_ids)
+            RETENTION_ROWS_PURGED.labels(table="conversations").inc(len(conversation_ids))
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error purging soft-deleted conversations: {e}")
+        raise
+    finally:
+        if archiver:
+            archiver.close()
+
+    duration = time.time() - start_time
+    RETENTION_PURGE_DURATION.observe(duration)
+    report = {
+        "conversations_purged": conversations_purged,
+        "messages_purged": messages_purged,
+        "archive_file": archiver.path if archiver else None,
+        "cutoff": cutoff.isoformat(),
+        "duration_seconds": round(duration, 3)
+    }
+    logger.info(
+        f"Retention purge finished: {conversations_purged} conversations and "
+        f"{messages_purged} messages purged in {duration:.2f}s"
+    )
+    return report
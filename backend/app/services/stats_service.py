@@ -0,0 +1,158 @@
+"""
+Conversation statistics backed by counters that are updated in the same
+transaction as the writes they count, so reading them never scans the
+conversation or message tables.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.dependencies import SessionLocal
+from app.models.conversation import Conversation
+from app.models.chat_message import ChatMessage
+from app.models.conversation_stats import ConversationStats
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "global"
+USER_SCOPE = "user"
+MODEL_SCOPE = "model"
+
+COUNTER_FIELDS = ("conversations_total", "conversations_active", "messages_total")
+
+
+def _increment(db: Session, scope: str, key: str, **deltas: int):
+    """Adds `deltas` to a counter row, creating it on first use. Does not commit."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = {getattr(ConversationStats, field): getattr(ConversationStats, field) + delta
+              for field, delta in deltas.items()}
+    query = db.query(ConversationStats).filter_by(scope=scope, key=key)
+    if query.update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            row = {field: 0 for field in COUNTER_FIELDS}
+            row.update(deltas)
+            db.add(ConversationStats(scope=scope, key=key, **row))
+    except IntegrityError:
+        # Another transaction created the row concurrently
+        query.update(values, synchronize_session=False)
+
+
+def record_conversation_created(db: Session, user_id: int):
+    """Counts a new conversation. Call before committing the conversation."""
+    for scope, key in ((GLOBAL_SCOPE, ""), (USER_SCOPE, str(user_id))):
+        _increment(db, scope, key, conversations_total=1, conversations_active=1)
+
+
+def record_messages(db: Session, user_id: int, count: int = 1, model: Optional[str] = None):
+    """Counts messages added to a user's conversation; `model` marks generated replies."""
+    _increment(db, GLOBAL_SCOPE, "", messages_total=count)
+    _increment(db, USER_SCOPE, str(user_id), messages_total=count)
+    if model:
+        _increment(db, MODEL_SCOPE, model, messages_total=count)
+
+
+def record_conversation_deleted(db: Session, user_id: int):
+    """Counts a soft-deleted conversation (it stays in the totals until purged)."""
+    for scope, key in ((GLOBAL_SCOPE, ""), (USER_SCOPE, str(user_id))):
+        _increment(db, scope, key, conversations_active=-1)
+
+
+def record_purged(db: Session, user_id: int, conversations: int = 0, messages: int = 0):
+    """Removes hard-deleted conversations and messages from the totals."""
+    for scope, key in ((GLOBAL_SCOPE, ""), (USER_SCOPE, str(user_id))):
+        _increment(db, scope, key, conversations_total=-conversations, messages_total=-messages)
+
+
+def _row_to_dict(row: Optional[ConversationStats]) -> Dict[str, Any]:
+    conversations_total = row.conversations_total if row else 0
+    messages_total = row.messages_total if row else 0
+    return {
+        "total_conversations": conversations_total,
+        "active_conversations": row.conversations_active if row else 0,
+        "total_messages": messages_total,
+        "average_messages_per_conversation": messages_total / conversations_total if conversations_total > 0 else 0
+    }
+
+
+def get_conversation_stats(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Returns global stats, the stats of `user_id` if given, and replies per model.
+    Only reads counter rows by primary key (plus the few model rows), so the cost
+    does not depend on the number of conversations or messages.
+    """
+    stats = _row_to_dict(db.get(ConversationStats, (GLOBAL_SCOPE, "")))
+    if user_id is not None:
+        stats["user"] = _row_to_dict(db.get(ConversationStats, (USER_SCOPE, str(user_id))))
+    stats["messages_by_model"] = {
+        row.key: row.messages_total
+        for row in db.query(ConversationStats).filter_by(scope=MODEL_SCOPE).all()
+    }
+    return stats
+
+
+def rebuild_conversation_stats(db: Session):
+    """
+    Recomputes every counter from the base tables. This is a full scan, meant for
+    the migration that introduces the counters or to repair drift, never per request.
+    Model counters cannot be rebuilt (the model is not stored per message) and are kept.
+    """
+    db.query(ConversationStats).filter(ConversationStats.scope != MODEL_SCOPE).delete(synchronize_session=False)
+
+    conversation_rows = (
+        db.query(
+            Conversation.user_id,
+            func.count(Conversation.id),
+            func.sum(cast(Conversation.is_active, Integer))
+        )
+        .group_by(Conversation.user_id)
+        .all()
+    )
+    message_rows = dict(
+        db.query(Conversation.user_id, func.count(ChatMessage.id))
+        .join(ChatMessage, ChatMessage.conversation_id == Conversation.id)
+        .group_by(Conversation.user_id)
+        .all()
+    )
+
+    totals = {field: 0 for field in COUNTER_FIELDS}
+    for user_id, conversations_total, conversations_active in conversation_rows:
+        row = {
+            "conversations_total": conversations_total,
+            "conversations_active": conversations_active or 0,
+            "messages_total": message_rows.get(user_id, 0)
+        }
+        db.add(ConversationStats(scope=USER_SCOPE, key=str(user_id), **row))
+        for field in COUNTER_FIELDS:
+            totals[field] += row[field]
+    db.add(ConversationStats(scope=GLOBAL_SCOPE, key="", **totals))
+    db.commit()
+    logger.info(f"Conversation stats rebuilt: {totals}")
+
+
+def backfill_conversation_stats() -> bool:
+    """
+    Rebuilds the counters if the global row does not exist yet, i.e. the table was just
+    created by create_tables() instead of migrate_db.py (migration 3 backfills it).
+    Run at startup, off the event loop. Returns whether a rebuild ran.
+    """
+    db = SessionLocal()
+    try:
+        if db.get(ConversationStats, (GLOBAL_SCOPE, "")) is not None:
+            return False
+        logger.info("Conversation stats are empty, backfilling them from the base tables")
+        try:
+            rebuild_conversation_stats(db)
+        except IntegrityError:
+            # Another worker backfilled them at the same time
+            db.rollback()
+            return False
+        return True
+    finally:
+        db.close()
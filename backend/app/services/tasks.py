@@ -1,12 +1,47 @@
 from celery import Celery
 import time
 import os
+from app.core.config import settings
 
 # Usa la variable de entorno REDIS_URL para compatibilidad con Docker Compose
 broker_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-app = Celery("tasks", broker=broker_url)
+# Result backend: the API waits for analysis results (run_large_file_job)
+app = Celery("tasks", broker=broker_url, backend=broker_url)
+app.conf.result_expires = 3600
+
+# Tareas periódicas ejecutadas por Celery beat
+app.conf.beat_schedule = {
+    "purge-soft-deleted-conversations": {
+        "task": "app.services.tasks.purge_soft_deleted_conversations",
+        "schedule": settings.retention_purge_interval_minutes * 60,
+    },
+}
 
 @app.task
 def add(x, y):
     time.sleep(5)  # Simula una tarea que tarda
-    return x + y 
\ No newline at end of file
+    return x + y
+
+@app.task
+def purge_soft_deleted_conversations():
+    """Hard-deletes soft-deleted conversations older than the retention window."""
+    from app.core.dependencies import SessionLocal
+    from app.services.retention_service import purge_soft_deleted
+
+    db = SessionLocal()
+    try:
+        return purge_soft_deleted(db)
+    finally:
+        db.close()
+
+@app.task(
+    soft_time_limit=settings.analysis_timeout_seconds,
+    time_limit=settings.analysis_timeout_seconds + 30
+)
+def run_large_file_job(job_name: str, *args):
+    """Runs an analysis job over an upload too large to load (see DataService._run_large_file_job)."""
+    from app.services import analysis_jobs
+
+    if job_name not in analysis_jobs.LARGE_FILE_JOBS:
+        raise ValueError(f"Unknown analysis job: {job_name}")
+    return getattr(analysis_jobs, job_name)(*args)
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+class ByteLRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values, in bytes."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Stores `value`, evicting the least recently used entries; values larger than the cache are not stored."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+            self._data[key] = (size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted_size, _) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.bytes -= item[0]
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every entry whose key matches `predicate`; returns how many."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self.bytes -= self._data.pop(key)[0]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,75 @@
+"""
+Columnar copies of data sources: each upload is parsed once (CSV, JSON, Excel) and saved
+next to it as an uncompressed Arrow IPC file (Feather v2). Later loads memory-map that
+file instead of parsing the original again: opening it is zero-copy, and only the pages
+of the columns an analysis asks for are read from disk.
+A copy older than its source is stale and is rebuilt on the next load.
+"""
+import importlib.util
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.utils.dataframe_optimizer import source_dtypes
+from app.utils.lazy_imports import lazy_import
+
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+pa = lazy_import("pyarrow")
+pa_ipc = lazy_import("pyarrow.ipc")
+feather = lazy_import("pyarrow.feather")
+
+COLUMNAR_SUFFIX = ".arrow"
+
+
+def columnar_path(file_path: str) -> str:
+    return file_path + COLUMNAR_SUFFIX
+
+
+def is_fresh(file_path: str) -> bool:
+    """Whether the columnar copy of `file_path` exists and is not older than the source."""
+    path = columnar_path(file_path)
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(file_path)
+    except OSError:
+        return False
+
+
+def write_columnar(df, file_path: str) -> str:
+    """Saves `df` as the columnar copy of `file_path` (atomically) and returns its path."""
+    path = columnar_path(file_path)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        # Uncompressed: compressed buffers would have to be decompressed into memory on read
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_schema(file_path: str) -> List[str]:
+    """Column names of the columnar copy of `file_path` (reads only the file footer)."""
+    with pa_ipc.open_file(pa.memory_map(columnar_path(file_path))) as reader:
+        return reader.schema.names
+
+
+def read_columnar(file_path: str, columns: Optional[List[str]] = None):
+    """Loads the columnar copy of `file_path` as a DataFrame, memory-mapped, with only `columns` if given."""
+    table = feather.read_table(columnar_path(file_path), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def read_profile(file_path: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Rows, columns, pandas dtypes and null counts of the columnar copy, from its metadata
+    alone: null counts are stored with each record batch, so no column data is read.
+    """
+    table = feather.read_table(columnar_path(file_path), columns=columns, memory_map=True)
+    dtypes = source_dtypes(table.schema.empty_table().to_pandas())
+    return {
+        "rows": table.num_rows,
+        "columns": table.column_names,
+        "dtypes": {str(col): dtype for col, dtype in dtypes.items()},
+        "missing": {name: table.column(name).null_count for name in table.column_names}
+    }
@@ -0,0 +1,83 @@
+"""
+Typed cache envelope for values stored in Redis.
+
+Every cached value is a small JSON header saying what it is, so reading never has to
+guess: {"kind": "json", "value": ...} for plain values, or {"kind": "dataframe", ...}
+for DataFrames, whose body is a compressed Arrow IPC stream split into chunks stored
+under their own keys (one huge value would block Redis while it is copied).
+Arrow keeps dtypes, the index and categoricals, and is far smaller and faster than
+DataFrame.to_json(). Without pyarrow, DataFrames fall back to JSON (orient="split")
+with the dtypes recorded in the header.
+"""
+import importlib.util
+import io
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.lazy_imports import lazy_import
+
+# pyarrow and pandas are heavy: only imported when a DataFrame is actually cached
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+pa = lazy_import("pyarrow")
+pa_ipc = lazy_import("pyarrow.ipc")
+pd = lazy_import("pandas")
+
+KIND_JSON = "json"
+KIND_DATAFRAME = "dataframe"
+FORMAT_ARROW = "arrow"
+FORMAT_JSON = "json"
+
+
+def chunk_key(key: str, index: int) -> str:
+    return f"{key}:chunk:{index}"
+
+
+def encode_value(value: Any, compression: Optional[str] = "zstd", chunk_size: int = 4 * 1024 * 1024) -> Tuple[bytes, List[bytes]]:
+    """Returns (header, chunks): the envelope to store under the key and the body chunks, if any."""
+    if not _is_dataframe(value):
+        return json.dumps({"kind": KIND_JSON, "value": value}).encode(), []
+    if PYARROW_AVAILABLE:
+        body = _dataframe_to_arrow(value, compression)
+        header = {"kind": KIND_DATAFRAME, "format": FORMAT_ARROW, "compression": compression}
+    else:
+        body = value.to_json(orient="split", date_format="iso", double_precision=15).encode()
+        header = {"kind": KIND_DATAFRAME, "format": FORMAT_JSON, "dtypes": {str(c): str(t) for c, t in value.dtypes.items()}}
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] or [b""]
+    header.update(rows=len(value), bytes=len(body), chunks=len(chunks))
+    return json.dumps(header).encode(), chunks
+
+
+def decode_header(raw: bytes) -> Optional[Dict[str, Any]]:
+    """Parses an envelope header; None if the value was not written by encode_value."""
+    try:
+        header = json.loads(raw)
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) and header.get("kind") in (KIND_JSON, KIND_DATAFRAME) else None
+
+
+def decode_value(header: Dict[str, Any], chunks: List[bytes]) -> Any:
+    """Rebuilds the value from its header and body chunks (in order)."""
+    if header["kind"] == KIND_JSON:
+        return header["value"]
+    body = b"".join(chunks)
+    if header["format"] == FORMAT_ARROW:
+        with pa_ipc.open_stream(pa.py_buffer(body)) as reader:
+            return reader.read_all().to_pandas()
+    return pd.read_json(io.BytesIO(body), orient="split", dtype=header.get("dtypes"))
+
+
+def _is_dataframe(value: Any) -> bool:
+    # If pandas was never imported, the value cannot be a DataFrame (and we don't import it to check)
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
+
+def _dataframe_to_arrow(df, compression: Optional[str]) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    options = pa_ipc.IpcWriteOptions(compression=compression)
+    with pa_ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,111 @@
+"""
+Memory-optimized DataFrames: each column gets the smallest dtype that holds its values
+exactly.
+- integers are downcast to the smallest signed type that fits the actual range;
+- floats stay float64: float32 would change describe() results in the last digits;
+- text columns that are ISO-8601 dates are parsed into datetime64, once, at load;
+- text columns with few distinct values become categoricals (codes + one copy of each value).
+Numbers are downcast after parsing because a sample can't prove the range of the whole
+file. For CSV, a sample of the head picks the text columns to read as categoricals
+directly, so the full object column is never built.
+The dtypes each column would have had without optimization are kept in
+df.attrs["source_dtypes"] (which the Arrow copy preserves): analyses report those, so their
+output doesn't depend on the loader mode or on how the data was read.
+"""
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+SAMPLE_ROWS = 10000
+SOURCE_DTYPES_ATTR = "source_dtypes"
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+
+
+def csv_read_options(file_path: str, category_ratio: float, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """read_csv keyword arguments from a sample of the file's head: usecols and categorical text columns."""
+    sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS, usecols=columns)
+    categorical = {
+        col: "category"
+        for col in sample.columns
+        if sample[col].dtype == object and _is_low_cardinality(sample[col], category_ratio)
+        and not _looks_like_dates(sample[col])
+    }
+    options: Dict[str, Any] = {"dtype": categorical} if categorical else {}
+    if columns is not None:
+        options["usecols"] = columns
+    return options
+
+
+def optimize_dataframe(df: "pd.DataFrame", category_ratio: float) -> Tuple["pd.DataFrame", int, int]:
+    """Converts `df` column by column. Returns (df, bytes with default dtypes, bytes after)."""
+    before = after = 0
+    source = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Read as categorical: what it would have taken as an object column
+            before += _object_memory(series)
+            source[str(col)] = "object"
+        else:
+            before += int(series.memory_usage(deep=True, index=False))
+            source[str(col)] = str(series.dtype)
+        optimized = _optimize_series(series, category_ratio)
+        if optimized is not series:
+            df[col] = optimized
+        after += int(optimized.memory_usage(deep=True, index=False))
+    df.attrs[SOURCE_DTYPES_ATTR] = source
+    return df, before, after
+
+
+def source_dtypes(df: "pd.DataFrame") -> Dict[Any, str]:
+    """Dtype of each column as read without optimization (its current dtype if it wasn't optimized)."""
+    source = df.attrs.get(SOURCE_DTYPES_ATTR) or {}
+    return {col: source.get(str(col), str(df[col].dtype)) for col in df.columns}
+
+
+def _optimize_series(series: "pd.Series", category_ratio: float) -> "pd.Series":
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+        return series
+    if isinstance(dtype, pd.CategoricalDtype):
+        # The sample can miss that a column is nearly unique over the whole file
+        return series if _is_low_cardinality(series, category_ratio) else series.astype(object)
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if dtype == object:
+        if _looks_like_dates(series):
+            parsed = pd.to_datetime(series, format="ISO8601", errors="coerce")
+            if parsed.notna().sum() == series.notna().sum():
+                return parsed
+        if _is_low_cardinality(series, category_ratio):
+            return series.astype("category")
+    return series
+
+
+def _looks_like_dates(series: "pd.Series") -> bool:
+    sample = series.dropna().head(100)
+    return len(sample) > 0 and all(isinstance(v, str) and ISO_DATE.match(v) for v in sample)
+
+
+def _is_low_cardinality(series: "pd.Series", category_ratio: float) -> bool:
+    values = series.dropna()
+    if len(values) == 0:
+        return False
+    try:
+        return values.nunique() <= category_ratio * len(values)
+    except TypeError:
+        # Unhashable values (lists, dicts from JSON)
+        return False
+
+
+def _object_memory(series: "pd.Series") -> int:
+    """Bytes the categorical `series` would take as an object column (pointers plus one object per row)."""
+    sizes = np.fromiter((sys.getsizeof(v) for v in series.cat.categories), dtype="int64", count=len(series.cat.categories))
+    codes = series.cat.codes.to_numpy()
+    null_size = sys.getsizeof(np.nan)
+    return int(8 * len(series) + sizes[codes[codes >= 0]].sum() + null_size * int((codes < 0).sum()))
@@ -0,0 +1,52 @@
+"""
+Deferred imports for heavy libraries (pandas, langchain, ...).
+API workers that never touch them don't pay their import time or memory;
+dedicated worker roles can preload them at startup with PRELOAD_MODULES.
+"""
+import importlib
+import logging
+import threading
+import time
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+    
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    """Returns a proxy for `name` that is imported on first use."""
+    return LazyModule(name)
+
+def preload_modules(names: Iterable[str]):
+    """Imports `names` eagerly (e.g. pandas on data-analysis workers) and logs the time taken."""
+    for name in names:
+        start_time = time.time()
+        try:
+            importlib.import_module(name)
+            logger.info(f"Preloaded {name} in {time.time() - start_time:.2f}s")
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
@@ -0,0 +1,32 @@
+import math
+from typing import Hashable, List, Set
+
+class TimingWheel:
+    """
+    Hashed timing wheel: a ring of `slots` buckets, `tick` seconds each.
+    Scheduling and cancelling are O(1), and each tick only touches the items due
+    in that bucket, so thousands of timers cost one periodic task instead of one each.
+    Delays longer than a full turn are clamped to the last slot.
+    """
+
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self.slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self.position = 0
+
+    def schedule(self, item: Hashable, delay: float) -> int:
+        """Schedules `item` to be due in about `delay` seconds. Returns its slot (for cancel)."""
+        ticks = min(max(1, math.ceil(delay / self.tick)), len(self.slots) - 1)
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot].add(item)
+        return slot
+
+    def cancel(self, item: Hashable, slot: int):
+        self.slots[slot].discard(item)
+
+    def advance(self) -> Set[Hashable]:
+        """Moves one tick forward and returns the items that became due."""
+        self.position = (self.position + 1) % len(self.slots)
+        due = self.slots[self.position]
+        self.slots[self.position] = set()
+        return due
@@ -0,0 +1,139 @@
+"""
+Incremental schema sniffing for uploads: fed with the chunks as they are written to disk,
+so the row count, the columns and their likely types are known when the upload ends
+without reading the file a second time.
+- CSV: records are counted at byte level (newlines outside quoted fields; a quote toggles
+  the state, which also handles "" escapes), and the header plus the rows in the first
+  SAMPLE_BYTES give the columns and their types.
+- JSON Lines: one record per line; columns from the sampled objects.
+Other formats (JSON arrays, Excel) can't be parsed piecewise and have no sniffer.
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SAMPLE_BYTES = 64 * 1024
+QUOTE_OR_NEWLINE = re.compile(rb'["\n]')
+
+# (columns, column types, rows)
+SniffResult = Tuple[Optional[List[str]], Optional[Dict[str, str]], Optional[int]]
+
+
+def _infer_type(values: List[str]) -> str:
+    """Names follow the pandas dtypes the file will be loaded with."""
+    values = [v.strip() for v in values if v and v.strip()]
+    if not values:
+        return "object"
+    for name, parse in (("int64", int), ("float64", float), ("datetime64[ns]", datetime.fromisoformat)):
+        try:
+            for value in values:
+                parse(value)
+            return name
+        except ValueError:
+            continue
+    if all(v.lower() in ("true", "false") for v in values):
+        return "bool"
+    return "object"
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+class CsvSniffer:
+    """Counts CSV records and samples the head of the file, one chunk at a time."""
+
+    def __init__(self):
+        self.records = 0
+        self.in_quotes = False
+        self.last_byte = b"\n"
+        self.sample = bytearray()
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if len(self.sample) < SAMPLE_BYTES:
+            self.sample += chunk[:SAMPLE_BYTES - len(self.sample)]
+        if not self.in_quotes and b'"' not in chunk:
+            # Fast path: no quoted fields in this chunk
+            self.records += chunk.count(b"\n")
+        else:
+            for match in QUOTE_OR_NEWLINE.finditer(chunk):
+                if match.group() == b'"':
+                    self.in_quotes = not self.in_quotes
+                elif not self.in_quotes:
+                    self.records += 1
+        self.last_byte = chunk[-1:]
+
+    def result(self) -> SniffResult:
+        records = self.records + (self.last_byte != b"\n")
+        if not records:
+            return None, None, None
+        text = self.sample.decode("utf-8", errors="replace")
+        if len(self.sample) >= SAMPLE_BYTES:
+            # Drop the record cut by the end of the sample
+            text = text[:text.rfind("\n") + 1] or text
+        try:
+            dialect = csv.Sniffer().sniff(text[:SAMPLE_BYTES // 4], delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        rows = list(csv.reader(io.StringIO(text), dialect))
+        if not rows:
+            return None, None, records - 1
+        columns = rows[0]
+        samples = [row for row in rows[1:] if len(row) == len(columns)]
+        types = {column: _infer_type([row[i] for row in samples]) for i, column in enumerate(columns)}
+        return columns, types, records - 1
+
+
+class JsonLinesSniffer:
+    """Counts JSON Lines records and samples the first objects, one chunk at a time."""
+
+    def __init__(self):
+        self.lines = 0
+        self.last_byte = b"\n"
+        self.sample = bytearray()
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if len(self.sample) < SAMPLE_BYTES:
+            self.sample += chunk[:SAMPLE_BYTES - len(self.sample)]
+        self.lines += chunk.count(b"\n")
+        self.last_byte = chunk[-1:]
+
+    def result(self) -> SniffResult:
+        rows = self.lines + (self.last_byte != b"\n")
+        columns: Dict[str, List[str]] = {}
+        lines = self.sample.decode("utf-8", errors="replace").splitlines()
+        if len(self.sample) >= SAMPLE_BYTES:
+            lines = lines[:-1]
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                for key, value in record.items():
+                    columns.setdefault(key, []).append(_as_text(value))
+        if not columns:
+            return None, None, rows or None
+        return list(columns), {key: _infer_type(values) for key, values in columns.items()}, rows
+
+
+def create_sniffer(extension: str):
+    """Sniffer for a file extension (".csv", ".jsonl"), or None if the format can't be sniffed incrementally."""
+    if extension == ".csv":
+        return CsvSniffer()
+    if extension == ".jsonl":
+        return JsonLinesSniffer()
+    return None
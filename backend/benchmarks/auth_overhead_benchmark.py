@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Auth overhead per request: get_current_user with cold caches (jwt.decode + user
+lookup in the database on every call, the previous behaviour) vs warm caches.
+
+Usage (from backend/, with DATABASE_URL pointing at the database to query):
+    python benchmarks/auth_overhead_benchmark.py --requests 2000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.dependencies import SessionLocal, create_tables  # noqa: E402
+from app.services import auth_service  # noqa: E402
+from app.schemas.user import UserCreate  # noqa: E402
+
+BENCH_USERNAME = "auth_benchmark_user"
+
+
+def run(requests: int, token: str, warm: bool) -> float:
+    db = SessionLocal()
+    try:
+        auth_service.token_cache.clear()
+        auth_service.user_cache.clear()
+        start_time = time.perf_counter()
+        for _ in range(requests):
+            if not warm:
+                auth_service.token_cache.clear()
+                auth_service.user_cache.clear()
+            auth_service.get_current_user(token=token, db=db)
+        return (time.perf_counter() - start_time) / requests
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of get_current_user overhead")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if not auth_service.get_user_by_username(db, BENCH_USERNAME):
+            auth_service.create_user(
+                db, UserCreate(username=BENCH_USERNAME, password="unused"), hashed_password="!"
+            )
+    finally:
+        db.close()
+    token = auth_service.create_access_token(BENCH_USERNAME)
+
+    cold = run(args.requests, token, warm=False)
+    warm = run(args.requests, token, warm=True)
+    print(f"get_current_user over {args.requests} requests:")
+    print(f"  uncached (jwt.decode + DB lookup): {cold * 1e6:9.1f} us/request")
+    print(f"  cached (token + principal hit):    {warm * 1e6:9.1f} us/request")
+    print(f"  speedup: {cold / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
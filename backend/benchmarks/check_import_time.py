@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the backend.
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and fails
+(exit code 1) when the cumulative import time of the module exceeds the budget.
+
+Usage (from backend/):
+    python benchmarks/check_import_time.py --budget 3.0 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure_import(module: str):
+    """Returns (cumulative seconds for `module`, list of (cumulative_us, name, depth)) from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"Importing {module} failed (exit code {result.returncode})")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        name = raw_name[1:]  # Nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((int(cumulative_us), name.strip(), depth))
+
+    module_us = next((us for us, name, _ in timings if name == module), None)
+    if module_us is None:
+        raise SystemExit(f"No -X importtime entry found for {module}")
+    return module_us / 1_000_000, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that importing the app stays under a time budget")
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--budget", type=float, default=3.0, help="Maximum cumulative import time in seconds")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to show")
+    args = parser.parse_args()
+
+    seconds, timings = measure_import(args.module)
+
+    # Direct imports only: deeper modules are already included in their parent's cumulative time
+    direct = sorted(((us, name) for us, name, depth in timings if depth == 1), reverse=True)
+    print(f"Slowest imports triggered by {args.module}:")
+    for us, name in direct[:args.top]:
+        print(f"  {us / 1000:10.1f} ms  {name}")
+
+    status = "OK" if seconds <= args.budget else "OVER BUDGET"
+    print(f"\n{args.module} imported in {seconds:.3f}s (budget {args.budget:.3f}s): {status}")
+    sys.exit(0 if seconds <= args.budget else 1)
+
+
+if __name__ == "__main__":
+    main()
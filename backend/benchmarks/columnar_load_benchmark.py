@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Data source load time: parsing the original upload (CSV, Excel) on every load, as
+DataService did on each cache miss, against opening its memory-mapped Arrow copy,
+with all columns and with only a few of them.
+
+Usage (from backend/):
+    python benchmarks/columnar_load_benchmark.py --rows 200000 --repeat 3
+    python benchmarks/columnar_load_benchmark.py --rows 50000 --formats csv xlsx
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.utils.columnar_store import columnar_path, read_columnar, write_columnar  # noqa: E402
+
+READERS = {
+    "csv": lambda path: pd.read_csv(path),
+    "xlsx": lambda path: pd.read_excel(path),
+}
+WRITERS = {
+    "csv": lambda df, path: df.to_csv(path, index=False),
+    "xlsx": lambda df, path: df.to_excel(path, index=False),
+}
+
+
+def make_frame(rows: int, columns: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {f"value_{i}": rng.normal(size=rows) for i in range(columns)}
+    data["label"] = rng.choice(["alpha", "beta", "gamma", "delta"], size=rows)
+    return pd.DataFrame(data)
+
+
+def timed(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar copy load benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--subset", type=int, default=2, help="Columns read in the subset case")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--formats", nargs="+", choices=sorted(READERS), default=["csv", "xlsx"])
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.columns, args.seed)
+    subset = df.columns[:args.subset].tolist()
+    print(f"{args.rows} rows, {len(df.columns)} columns")
+    print(f"{'format':<8} {'file MB':>8} {'parse ms':>10} {'convert ms':>11} {'mmap all ms':>12} {'mmap subset ms':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.formats:
+            path = os.path.join(directory, f"data.{name}")
+            WRITERS[name](df, path)
+            parse_ms = timed(lambda: READERS[name](path), args.repeat)
+            convert_ms = timed(lambda: write_columnar(READERS[name](path), path), 1)
+            all_ms = timed(lambda: read_columnar(path), args.repeat)
+            subset_ms = timed(lambda: read_columnar(path, subset), args.repeat)
+            size = os.path.getsize(path) / 1e6
+            print(f"{name:<8} {size:>8.1f} {parse_ms:>10.1f} {convert_ms:>11.1f} {all_ms:>12.1f} {subset_ms:>15.1f}")
+            os.remove(columnar_path(path))
+
+
+if __name__ == "__main__":
+    main()
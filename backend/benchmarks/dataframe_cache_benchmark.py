@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+DataFrame cache round trip: the previous to_json()/read_json() path against the typed
+envelope (Arrow IPC with zstd, lz4 or no compression). Reports the stored bytes, the
+encode and decode time and whether the dtypes survive. With --redis-url the values are
+also written to and read back from Redis, chunked as DataService does.
+
+Usage (from backend/):
+    python benchmarks/dataframe_cache_benchmark.py --rows 200000 --repeat 3
+    python benchmarks/dataframe_cache_benchmark.py --rows 1000000 --redis-url redis://localhost:6379
+"""
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.utils.dataframe_codec import chunk_key, decode_header, decode_value, encode_value  # noqa: E402
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def make_frame(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(rows, dtype="int64"),
+        "value": rng.normal(size=rows),
+        "count": rng.integers(0, 1000, size=rows, dtype="int32"),
+        "country": pd.Categorical(rng.choice(["es", "fr", "de", "it", "pt", "us"], size=rows)),
+        "label": rng.choice(["alpha", "beta", "gamma", "delta"], size=rows).astype(object),
+        "created_at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 86400 * 365, size=rows), unit="s"),
+        "active": rng.random(rows) < 0.5,
+    })
+
+
+def timed(func, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times) * 1000, result
+
+
+def json_codec():
+    def encode(df):
+        return df.to_json().encode(), []
+
+    def decode(header, chunks):
+        return pd.read_json(io.BytesIO(header))
+    return encode, decode
+
+
+def arrow_codec(compression):
+    def encode(df):
+        return encode_value(df, compression=compression, chunk_size=CHUNK_SIZE)
+
+    def decode(header, chunks):
+        return decode_value(decode_header(header), chunks)
+    return encode, decode
+
+
+def redis_round_trip(client, key: str, header: bytes, chunks):
+    pipe = client.pipeline(transaction=True)
+    for index, chunk in enumerate(chunks):
+        pipe.set(chunk_key(key, index), chunk)
+    pipe.set(key, header)
+    pipe.execute()
+    header = client.get(key)
+    chunks = client.mget([chunk_key(key, i) for i in range(len(chunks))]) if chunks else []
+    return header, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataFrame cache format benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--redis-url", default=None, help="Also time the Redis write + read")
+    args = parser.parse_args()
+
+    client = None
+    if args.redis_url:
+        import redis
+        client = redis.Redis.from_url(args.redis_url)
+        client.ping()
+
+    df = make_frame(args.rows, args.seed)
+    print(f"{args.rows} rows, {len(df.columns)} columns, {df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory")
+    header_row = f"{'format':<22} {'bytes':>12} {'chunks':>7} {'encode ms':>10} {'decode ms':>10} {'redis ms':>9}  dtypes kept"
+    print(header_row)
+    codecs = [
+        ("json (previous)", json_codec()),
+        ("arrow ipc + zstd", arrow_codec("zstd")),
+        ("arrow ipc + lz4", arrow_codec("lz4")),
+        ("arrow ipc", arrow_codec(None)),
+    ]
+    for name, (encode, decode) in codecs:
+        encode_ms, (header, chunks) = timed(lambda: encode(df), args.repeat)
+        decode_ms, restored = timed(lambda: decode(header, chunks), args.repeat)
+        size = len(header) + sum(len(chunk) for chunk in chunks)
+        redis_ms = "-"
+        if client is not None:
+            key = f"benchmark:dataframe:{name}"
+            elapsed, _ = timed(lambda: redis_round_trip(client, key, header, chunks), args.repeat)
+            client.delete(key, *[chunk_key(key, i) for i in range(len(chunks))])
+            redis_ms = f"{elapsed:.1f}"
+        dtypes_kept = restored.dtypes.equals(df.dtypes)
+        print(f"{name:<22} {size:>12} {max(len(chunks), 1):>7} {encode_ms:>10.1f} {decode_ms:>10.1f} {redis_ms:>9}  {dtypes_kept}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Login-storm benchmark for bcrypt verification.
+Fires N concurrent password verifications either in the default threadpool (the old
+behaviour of sync /auth/login) or in the bounded password process pool, while a probe
+keeps running a trivial job in the default threadpool to measure how starved other
+sync routes get.
+
+Usage (from backend/):
+    python benchmarks/login_storm_benchmark.py --logins 200 --mode both
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.password_pool import PasswordHashPool, PasswordPoolFull, _hash_password, _verify_password  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def probe(stop: asyncio.Event, latencies: list):
+    """Simulates another sync route: a no-op in the default threadpool every 10ms."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await loop.run_in_executor(None, lambda: None)
+        latencies.append(time.perf_counter() - start_time)
+        await asyncio.sleep(0.01)
+
+
+async def storm(mode: str, logins: int, hashed: str, pool: PasswordHashPool):
+    loop = asyncio.get_running_loop()
+    latencies, probe_latencies, rejected = [], [], 0
+
+    async def login():
+        nonlocal rejected
+        start_time = time.perf_counter()
+        try:
+            if mode == "threadpool":
+                await loop.run_in_executor(None, _verify_password, "secret", hashed)
+            else:
+                await pool.verify("secret", hashed)
+            latencies.append(time.perf_counter() - start_time)
+        except PasswordPoolFull:
+            rejected += 1
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, probe_latencies))
+    start_time = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    await probe_task
+
+    print(f"\n[{mode}] {logins} logins in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.1f} accepted/s, {rejected} rejected with 429)")
+    if latencies:
+        print(f"  login latency   p50={percentile(latencies, 50) * 1000:8.1f}ms "
+              f"p95={percentile(latencies, 95) * 1000:8.1f}ms max={max(latencies) * 1000:8.1f}ms")
+    if probe_latencies:
+        print(f"  other sync route p50={percentile(probe_latencies, 50) * 1000:7.1f}ms "
+              f"p95={percentile(probe_latencies, 95) * 1000:8.1f}ms max={max(probe_latencies) * 1000:8.1f}ms "
+              f"(mean {statistics.mean(probe_latencies) * 1000:.1f}ms)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Login storm: threadpool vs bounded process pool")
+    parser.add_argument("--logins", type=int, default=200, help="Concurrent logins")
+    parser.add_argument("--workers", type=int, default=2, help="Password pool processes")
+    parser.add_argument("--max-queue", type=int, default=64, help="Password pool queue limit")
+    parser.add_argument("--mode", choices=["threadpool", "process-pool", "both"], default="both")
+    args = parser.parse_args()
+
+    hashed = _hash_password("secret")
+    pool = PasswordHashPool(max_workers=args.workers, max_queue=args.max_queue)
+    await pool.verify("secret", hashed)  # Start the worker processes before measuring
+    try:
+        for mode in (["threadpool", "process-pool"] if args.mode == "both" else [args.mode]):
+            await storm(mode, args.logins, hashed, pool)
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark per worker role.
+Starts fresh interpreters that import each role's entry module (plus its preloaded
+modules) and reports cold-start time, baseline RSS and which heavy libraries got loaded.
+
+Usage (from backend/):
+    python benchmarks/startup_benchmark.py --runs 5
+    python benchmarks/startup_benchmark.py --role api --role data
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# role -> (entry module, modules preloaded on that role via PRELOAD_MODULES)
+WORKER_ROLES = {
+    "api": ("app.main", []),
+    "chat": ("app.services.chat_service", []),
+    "data": ("app.services.data_service", ["pandas"]),
+    "celery": ("app.services.tasks", []),
+}
+
+HEAVY_MODULES = ["pandas", "numpy", "langchain", "langchain_core", "langchain_ollama",
+                 "torch", "transformers", "sentence_transformers", "sklearn", "matplotlib"]
+
+CHILD_CODE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+try:
+    import psutil
+    rss = psutil.Process().memory_info().rss
+except ImportError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+heavy = [m for m in %r if m in sys.modules]
+print(json.dumps({"import_seconds": elapsed, "rss_bytes": rss, "heavy_modules": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(modules):
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, *modules],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error")
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["wall_seconds"] = wall
+    return sample
+
+
+def benchmark_role(role, runs):
+    module, preload = WORKER_ROLES[role]
+    samples = [run_once([module, *preload]) for _ in range(runs)]
+    return {
+        "role": role,
+        "modules": [module, *preload],
+        "cold_start_median_s": statistics.median(s["wall_seconds"] for s in samples),
+        "import_median_s": statistics.median(s["import_seconds"] for s in samples),
+        "rss_median_mb": statistics.median(s["rss_bytes"] for s in samples) / (1024 * 1024),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time and baseline RSS per worker role")
+    parser.add_argument("--role", action="append", choices=sorted(WORKER_ROLES), help="Role(s) to measure (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per role")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for role in args.role or list(WORKER_ROLES):
+        try:
+            results.append(benchmark_role(role, args.runs))
+        except RuntimeError as e:
+            results.append({"role": role, "error": str(e)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'role':<8} {'cold start':>11} {'imports':>9} {'RSS':>9}  heavy modules loaded")
+    for r in results:
+        if "error" in r:
+            print(f"{r['role']:<8} failed: {r['error']}")
+            continue
+        print(f"{r['role']:<8} {r['cold_start_median_s']:>10.3f}s {r['import_median_s']:>8.3f}s "
+              f"{r['rss_median_mb']:>7.1f}MB  {', '.join(r['heavy_modules']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+WebSocket fan-out latency: broadcast_to_channel to N fake sockets, a fraction of
+them slow, compared with a sequential loop (json.dumps + await per socket).
+Reports per-socket delivery latency percentiles and the time to finish the broadcast.
+
+Usage (from backend/):
+    python benchmarks/ws_broadcast_benchmark.py --sockets 1000 --slow-fraction 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.core.websocket_manager import ConnectionManager  # noqa: E402
+
+CHANNEL = "chat"
+MESSAGE = {"type": "message", "data": {"content": "x" * 512, "model": "benchmark", "conversation_id": 1}}
+
+
+class FakeWebSocket:
+    """Records when each message is delivered; slow sockets take `delay` seconds per send."""
+
+    scope = {"type": "websocket", "subprotocols": []}
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.delivered_at = []
+
+    async def accept(self, subprotocol: str = None):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.delivered_at.append(time.perf_counter())
+
+
+def make_sockets(count: int, slow_fraction: float, slow_delay: float):
+    return [
+        FakeWebSocket(slow_delay if random.random() < slow_fraction else random.uniform(0, 0.001))
+        for _ in range(count)
+    ]
+
+
+async def sequential_broadcast(sockets):
+    """The original broadcast: one serialization and one awaited send per socket."""
+    for websocket in sockets:
+        await websocket.send_text(json.dumps(MESSAGE))
+
+
+async def connect_all(manager: ConnectionManager, sockets):
+    for websocket in sockets:
+        await manager.connect(websocket, CHANNEL)
+    # Let the connection confirmations go out before measuring
+    while any(not ws.delivered_at for ws in sockets):
+        await asyncio.sleep(0.01)
+    for websocket in sockets:
+        websocket.delivered_at.clear()
+
+
+async def wait_delivered(sockets, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while any(not ws.delivered_at for ws in sockets) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+def report(name: str, sockets, start_time: float, returned_at: float):
+    latencies = sorted((ws.delivered_at[0] - start_time) * 1000 for ws in sockets if ws.delivered_at)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name}:")
+    print(f"  delivered {len(latencies)}/{len(sockets)}, broadcast returned after {(returned_at - start_time) * 1000:.1f} ms")
+    print(f"  delivery latency p50={quantiles[49]:.1f} ms  p95={quantiles[94]:.1f} ms  p99={quantiles[98]:.1f} ms")
+
+
+async def run(args):
+    random.seed(args.seed)
+    sockets = make_sockets(args.sockets, args.slow_fraction, args.slow_delay)
+    start_time = time.perf_counter()
+    await sequential_broadcast(sockets)
+    report("sequential (original)", sockets, start_time, time.perf_counter())
+
+    random.seed(args.seed)
+    sockets = make_sockets(args.sockets, args.slow_fraction, args.slow_delay)
+    manager = ConnectionManager()
+    await connect_all(manager, sockets)
+    start_time = time.perf_counter()
+    await manager.broadcast_to_channel(MESSAGE, CHANNEL)
+    returned_at = time.perf_counter()
+    await wait_delivered(sockets, settings.ws_send_timeout_seconds + 1)
+    report("ConnectionManager (per-connection queues)", sockets, start_time, returned_at)
+    for websocket in sockets:
+        manager.disconnect(websocket, CHANNEL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket broadcast fan-out benchmark")
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--slow-fraction", type=float, default=0.01, help="Share of sockets that are slow")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="Seconds a slow socket takes per send")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    settings.ws_max_connections = max(settings.ws_max_connections, args.sockets)
+    print(f"Broadcasting to {args.sockets} sockets ({args.slow_fraction:.1%} slow, "
+          f"send timeout {settings.ws_send_timeout_seconds}s)")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
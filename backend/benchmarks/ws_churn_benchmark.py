@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+WebSocket connection churn: connects N fake sockets (spread over users, each
+subscribed to a few conversations), then disconnects them all in random order.
+Reports the cost per connect/disconnect and the memory held per connection, and
+compares disconnect with the previous linear scan over user_connections.
+
+Usage (from backend/):
+    python benchmarks/ws_churn_benchmark.py --sockets 10000 --users 2000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.core.websocket_manager import ConnectionManager  # noqa: E402
+
+CHANNEL = "chat"
+
+
+class FakeWebSocket:
+    scope = {"type": "websocket", "subprotocols": []}
+
+    async def accept(self, subprotocol: str = None):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+    async def send_text(self, text: str):
+        pass
+
+
+def linear_scan_disconnect(user_connections: dict, websocket) -> None:
+    """The previous disconnect: scan every user to find the socket's owner."""
+    for uid, ws in user_connections.items():
+        if ws == websocket:
+            del user_connections[uid]
+            break
+
+
+async def run(args):
+    random.seed(args.seed)
+    tokens = [create_access_token({"sub": f"user{i}"}) for i in range(args.users)]
+    sockets = [FakeWebSocket() for _ in range(args.sockets)]
+    manager = ConnectionManager()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start_time = time.perf_counter()
+    for index, websocket in enumerate(sockets):
+        await manager.connect(websocket, CHANNEL, tokens[index % args.users])
+        for topic_index in range(args.topics):
+            manager.subscribe(websocket, f"conversation:{index % args.users}-{topic_index}")
+    connect_time = time.perf_counter() - start_time
+    await asyncio.sleep(0)  # Let the writer tasks start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    order = sockets[:]
+    random.shuffle(order)
+    start_time = time.perf_counter()
+    for websocket in order:
+        manager.disconnect(websocket, CHANNEL)
+    disconnect_time = time.perf_counter() - start_time
+    assert not manager.user_connections and not manager.topic_subscribers and not manager.connections
+
+    # Same churn against the previous index (user -> single socket, found by scanning)
+    user_connections = {f"socket{i}": websocket for i, websocket in enumerate(sockets)}
+    start_time = time.perf_counter()
+    for websocket in order:
+        linear_scan_disconnect(user_connections, websocket)
+    scan_time = time.perf_counter() - start_time
+
+    n = args.sockets
+    print(f"{n} sockets, {args.users} users, {args.topics} subscriptions per socket:")
+    print(f"  connect + subscribe: {connect_time / n * 1e6:8.1f} us/socket")
+    print(f"  disconnect (indexed): {disconnect_time / n * 1e6:8.1f} us/socket")
+    print(f"  disconnect (linear scan, previous): {scan_time / n * 1e6:8.1f} us/socket")
+    print(f"  memory per connection: {(after - before) / n:8.0f} bytes (incl. writer task and queue)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket connect/disconnect churn benchmark")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=2, help="Conversation subscriptions per socket")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    settings.ws_max_connections = max(settings.ws_max_connections, args.sockets)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+WebSocket frame encoding: bytes per message and encode cost of JSON text vs the
+msgpack subprotocol, with and without permessage-deflate (raw DEFLATE, as the
+extension does), for a streamed token, a chat reply and a data-analysis result.
+Also compares encoding per socket with encoding once per encoding group.
+
+Usage (from backend/):
+    python benchmarks/ws_encoding_benchmark.py --iterations 5000 --sockets 1000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import msgpack  # noqa: E402
+
+from app.core.websocket_manager import ENCODING_JSON, ENCODING_MSGPACK, EncodedMessage  # noqa: E402
+
+
+def sample_messages():
+    random.seed(42)
+    conversation_id = str(uuid.uuid4())
+    columns = [f"column_{i}" for i in range(20)]
+    return {
+        "token": {"type": "token", "data": {"conversation_id": conversation_id, "index": 42, "token": " the"}},
+        "chat_message": {
+            "type": "chat_message",
+            "data": {
+                "conversation_id": conversation_id,
+                "message": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 10,
+                "user_id": 1,
+                "timestamp": "2024-01-01T12:00:00",
+            },
+        },
+        "analysis_result": {
+            "type": "analysis_result",
+            "data": {
+                "analysis_id": str(uuid.uuid4()),
+                "analysis_type": "statistical",
+                "result": {
+                    "summary": {c: {s: random.random() * 1000 for s in ("mean", "std", "min", "max")} for c in columns},
+                    "sample": [{c: random.random() * 100 for c in columns} for _ in range(100)],
+                },
+                "processing_time": 0.1234,
+            },
+        },
+    }
+
+
+def deflate_size(payload: bytes) -> int:
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def per_call_us(func, iterations: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start_time) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket encoding benchmark")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--sockets", type=int, default=1000, help="Sockets per broadcast (half of them msgpack)")
+    args = parser.parse_args()
+
+    print(f"{'message':<16} {'encoding':<9} {'bytes':>8} {'deflated':>9} {'encode us':>10}")
+    for name, message in sample_messages().items():
+        iterations = max(1, args.iterations // (50 if name == "analysis_result" else 1))
+        json_bytes = json.dumps(message).encode()
+        packed = msgpack.packb(message, use_bin_type=True)
+        rows = (
+            ("json", json_bytes, per_call_us(lambda: json.dumps(message), iterations)),
+            ("msgpack", packed, per_call_us(lambda: msgpack.packb(message, use_bin_type=True), iterations)),
+        )
+        for encoding, payload, cost in rows:
+            print(f"{name:<16} {encoding:<9} {len(payload):>8} {deflate_size(payload):>9} {cost:>10.1f}")
+
+    # Broadcast: encode for every socket vs once per encoding group
+    message = sample_messages()["chat_message"]
+    encodings = [ENCODING_JSON, ENCODING_MSGPACK] * (args.sockets // 2)
+    iterations = max(1, args.iterations // 100)
+
+    def per_socket():
+        for encoding in encodings:
+            EncodedMessage(message).encode(encoding)
+
+    def per_group():
+        encoded = EncodedMessage(message)
+        for encoding in encodings:
+            encoded.encode(encoding)
+
+    print(f"\nBroadcast of a chat_message to {len(encodings)} sockets (half msgpack):")
+    print(f"  encode per socket:         {per_call_us(per_socket, iterations):10.1f} us")
+    print(f"  encode per encoding group: {per_call_us(per_group, iterations):10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
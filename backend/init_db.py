@@ -18,6 +18,7 @@ from app.core.config import settings
 from app.models.base import Base
 from app.models.conversation import Conversation
 from app.models.chat_message import ChatMessage
+from app.models.conversation_stats import ConversationStats
 from app.models.user import User
 from app.models.token import Token
 
@@ -19,6 +19,7 @@ from app.core.config import settings
 from app.models.base import Base
 from app.models.conversation import Conversation
 from app.models.chat_message import ChatMessage
+from app.models.conversation_stats import ConversationStats
 from app.models.user import User
 from app.models.token import Token
 
@@ -107,13 +108,32 @@ def run_migration_2(engine):
         logger.error(f"Migration 2 failed: {e}")
         return False
 
+def run_migration_3(engine):
+    """Migration 3: Create and backfill incremental conversation stats."""
+    logger.info("Running migration 3: Create conversation stats counters")
+    
+    try:
+        from app.services.stats_service import rebuild_conversation_stats
+        ConversationStats.__table__.create(bind=engine, checkfirst=True)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        try:
+            rebuild_conversation_stats(db)
+        finally:
+            db.close()
+        logger.info("Migration 3 completed successfully")
+        return True
+    except Exception as e:
+        logger.error(f"Migration 3 failed: {e}")
+        return False
+
 def run_migrations(engine, target_version=None):
     """Run all pending migrations."""
     current_version = get_current_schema_version(engine)
     logger.info(f"Current schema version: {current_version}")
     
     if target_version is None:
-        target_version = 2  # Latest version
+        target_version = 3  # Latest version
     
     if current_version >= target_version:
         logger.info("Database is already up to date")
@@ -123,6 +143,7 @@ def run_migrations(engine, target_version=None):
     migrations = {
         1: run_migration_1,
         2: run_migration_2,
+        3: run_migration_3,
     }
     
     # Run pending migrations